@@ -1,9 +1,18 @@
 import streamlit as st
 import pandas as pd
 import json
+import time
 import requests
 
 BACKEND_URL = "http://127.0.0.1:8000/submissions"
+ANALYTICS_URL = "http://127.0.0.1:8000/analytics"
+# the table shows the most recent PAGE_SIZE reviews; summary views come from /analytics
+PAGE_SIZE = 500
+# Loaded rows are kept in the Streamlit session and reused for CACHE_TTL_SECONDS;
+# after that only rows newer than the last seen id are fetched (plus rows that
+# were still pending). At most MAX_CACHED_ROWS of the newest rows are kept.
+CACHE_TTL_SECONDS = 30
+MAX_CACHED_ROWS = 5000
 
 st.set_page_config(page_title="Admin Dashboard", layout="wide")
 st.title("📊 Admin Dashboard – Review Intelligence System")
@@ -22,17 +31,85 @@ def safe_parse_json(text):
         return {}
 
 # ------------------------------------
-# Fetch submissions
+# Fetch aggregates + recent submissions
 # ------------------------------------
-def load_submissions():
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def fetch_analytics(bucket="day"):
+    # aggregates are computed by the backend in SQL; the response is a few KB
+    resp = requests.get(ANALYTICS_URL, params={"bucket": bucket}, timeout=10)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def load_analytics(bucket="day"):
+    try:
+        return fetch_analytics(bucket)
+    except Exception as e:
+        st.error(f"Could not fetch analytics. Error: {str(e)}")
+        return {}
+
+
+def fetch_page(params):
+    resp = requests.get(BACKEND_URL, params=params, timeout=10)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def fetch_rows_after(after_id, max_rows=MAX_CACHED_ROWS):
+    """
+    Rows with id > after_id, oldest first (keyset pages with order=asc).
+    Returns None if there are more than max_rows, so the caller reloads instead.
+    """
+    rows, cursor = [], after_id
+    while True:
+        data = fetch_page({"order": "asc", "cursor": cursor, "limit": PAGE_SIZE})
+        rows.extend(data.get("submissions", []))
+        cursor = data.get("next_cursor")
+        if cursor is None:
+            return rows
+        if len(rows) >= max_rows:
+            return None
+
+
+def load_submissions(force=False):
+    """
+    Return the cached submissions DataFrame (oldest first), refreshing it when the
+    TTL has expired or force is set. A refresh only fetches and processes rows
+    after the last seen id, re-reading from the oldest row that was still
+    pending so finished analyses replace it. First load (or a gap larger than
+    MAX_CACHED_ROWS) fetches the newest page.
+    """
+    cache = st.session_state.get("submissions_cache")
+    now = time.monotonic()
+    if cache is not None and not force and now - cache["fetched_at"] < CACHE_TTL_SECONDS:
+        return cache["df"]
+
     try:
-        resp = requests.get(BACKEND_URL, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("submissions", [])
+        df = None
+        if cache is not None:
+            df = cache["df"]
+            pending = df.loc[df["status"] == "pending", "id"] if not df.empty else pd.Series(dtype=int)
+            after_id = int(pending.min()) - 1 if not pending.empty else cache["last_id"]
+            rows = fetch_rows_after(after_id)
+            if rows is None:
+                df = None
+            elif rows:
+                new = process_submissions(rows)
+                df = pd.concat([df[df["id"] <= after_id], new], ignore_index=True).tail(MAX_CACHED_ROWS)
+        if df is None:
+            # newest page (/submissions is newest first), kept oldest first like the increments
+            rows = fetch_page({"limit": PAGE_SIZE}).get("submissions", [])
+            df = process_submissions(rows[::-1])
     except Exception as e:
         st.error(f"Could not fetch submissions. Error: {str(e)}")
-        return []
+        return cache["df"] if cache is not None else pd.DataFrame()
+
+    st.session_state.submissions_cache = {
+        "df": df,
+        "last_id": int(df["id"].max()) if not df.empty else 0,
+        "fetched_at": now,
+    }
+    return df
 
 # ------------------------------------
 # Process submissions into DataFrame
@@ -43,43 +120,101 @@ def process_submissions(data):
 
     df = pd.DataFrame(data)
 
+    # rows queued with POST /submit?mode=async stay "pending" until analysed
+    if "status" not in df.columns:
+        df["status"] = "done"
+
+    if "ai_summary" in df.columns:
+        # the backend stores the analysis in typed columns: no JSON parsing needed
+        df["predicted_stars"] = df["predicted_stars"].astype("Int64").astype(str).replace("<NA>", "N/A")
+        df["explanation"] = df["explanation"].fillna("N/A")
+        df["summary"] = df["ai_summary"].fillna("N/A")
+        df["recommendations"] = df["ai_recommendations"]
+        df["ai_reply"] = df["ai_response"].fillna("")
+        return df
+
     # The backend returns BOTH keys, but admin should use ai_admin_json
     if "ai_admin_json" not in df.columns:
         # fallback – older backend versions
         df["ai_admin_json"] = df.get("admin_json", "{}")
 
-    # Parse nested JSON safely
-    df["parsed_admin"] = df["ai_admin_json"].apply(safe_parse_json)
+    # Parse nested JSON safely (once per row), then read the fields from the parsed dicts
+    parsed = [safe_parse_json(text) for text in df["ai_admin_json"]]
+    parsed = [p if isinstance(p, dict) else {} for p in parsed]
 
-    df["predicted_stars"] = df["parsed_admin"].apply(
-        lambda x: x.get("predicted_stars", "N/A")
-    ).astype(str)
-    df["explanation"] = df["parsed_admin"].apply(
-        lambda x: x.get("explanation", "N/A")
-    )
-    df["summary"] = df["parsed_admin"].apply(
-        lambda x: x.get("ai_summary", "N/A")
-    )
-    df["recommendations"] = df["parsed_admin"].apply(
-        lambda x: x.get("ai_recommendations", [])
-    )
-    df["ai_reply"] = df["parsed_admin"].apply(
-        lambda x: x.get("ai_reply", "")
-    )
+    df["predicted_stars"] = [str(p.get("predicted_stars", "N/A")) for p in parsed]
+    df["explanation"] = [p.get("explanation", "N/A") for p in parsed]
+    df["summary"] = [p.get("ai_summary", "N/A") for p in parsed]
+    df["recommendations"] = [p.get("ai_recommendations", []) for p in parsed]
+    df["ai_reply"] = [p.get("ai_reply", "") for p in parsed]
 
     return df
 
 
+# ------------------------------------
+# Summary views (from /analytics)
+# ------------------------------------
+def render_analytics(stats):
+    if not stats or not stats.get("total"):
+        return
+
+    st.subheader("📈 Overview")
+    agreement = stats.get("agreement", {})
+    status_counts = stats.get("status_counts", {})
+    cols = st.columns(4)
+    cols[0].metric("Total reviews", stats["total"])
+    cols[1].metric("Pending analysis", status_counts.get("pending", 0))
+    cols[2].metric("Exact match", f"{agreement['exact']:.0%}" if agreement.get("exact") is not None else "N/A")
+    cols[3].metric("Within ±1", f"{agreement['within_one']:.0%}" if agreement.get("within_one") is not None else "N/A")
+
+    left, right = st.columns(2)
+    with left:
+        st.caption("User rating vs predicted stars")
+        dist = pd.DataFrame({
+            "user rating": pd.Series(stats.get("rating_distribution", {})),
+            "predicted": pd.Series(stats.get("predicted_distribution", {})),
+        }).fillna(0).astype(int)
+        st.bar_chart(dist)
+    with right:
+        st.caption(f"Reviews per {stats.get('bucket', 'day')}")
+        timeline = pd.DataFrame(stats.get("timeline", []))
+        if not timeline.empty:
+            st.line_chart(timeline.set_index("bucket")["count"])
+
+    st.caption("Confusion: rows = user rating, columns = predicted stars")
+    st.dataframe(pd.DataFrame(stats.get("confusion", {})).T.sort_index().fillna(0).astype(int))
+
+    st.caption("Top recommendations")
+    st.dataframe(pd.DataFrame(stats.get("top_recommendations", [])), use_container_width=True)
+
+
 # ------------------------------------
 # MAIN UI
 # ------------------------------------
-submissions = load_submissions()
-df = process_submissions(submissions)
+bucket = st.sidebar.selectbox("Timeline bucket", ["day", "hour", "month"])
+refresh = st.sidebar.button("🔄 Refresh")
+if st.sidebar.button("♻️ Full reload"):
+    st.session_state.pop("submissions_cache", None)
+    refresh = True
+if refresh:
+    fetch_analytics.clear()
+
+render_analytics(load_analytics(bucket))
+
+df = load_submissions(force=refresh)
+cache = st.session_state.get("submissions_cache")
+if cache is not None:
+    st.sidebar.caption(
+        f"{len(df)} rows cached · last id {cache['last_id']} · "
+        f"updated {time.monotonic() - cache['fetched_at']:.0f}s ago (auto every {CACHE_TTL_SECONDS}s)"
+    )
 
 if df.empty:
     st.warning("No submissions found.")
 else:
-    st.subheader("📋 Stored Reviews")
+    st.subheader(f"📋 Latest {PAGE_SIZE} Reviews")
+    # cache is oldest first; show the newest rows on top
+    df = df.iloc[::-1].head(PAGE_SIZE)
     display_df = df[[
         "id",
         "rating",
@@ -88,11 +223,12 @@ else:
         "explanation",
         "summary",
         "ai_reply",
+        "status",
         "created_at"
     ]].copy()
     display_df["predicted_stars"] = display_df["predicted_stars"].astype(str)
     
     st.dataframe(display_df, use_container_width=True)
 
-    st.subheader("🧠 Parsed Admin JSON")
-    st.json(df["parsed_admin"].tolist(), expanded=False)
\ No newline at end of file
+    st.subheader("🧠 Analysis Fields")
+    st.json(df[["id", "predicted_stars", "explanation", "summary", "recommendations"]].to_dict("records"), expanded=False)
\ No newline at end of file
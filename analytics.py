@@ -0,0 +1,99 @@
+# analytics.py (SQL aggregates behind GET /analytics)
+import sqlite3
+from collections import Counter
+
+# length of the created_at prefix (ISO 8601) used as the time bucket
+TIME_BUCKETS = {"month": 7, "day": 10, "hour": 13}
+
+
+def _filters(created_from=None, created_to=None, analysed_only=True):
+    where, params = [], []
+    if analysed_only:
+        where.append("status = 'done'")
+    if created_from:
+        where.append("created_at >= ?")
+        params.append(created_from)
+    if created_to:
+        where.append("created_at <= ?")
+        params.append(created_to)
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+
+def compute_analytics(conn: sqlite3.Connection, created_from=None, created_to=None, bucket="day", top_n=10) -> dict:
+    """
+    Aggregate the submissions table in SQLite and return a small summary:
+    - status_counts: rows per status (pending/done/failed)
+    - rating_distribution / predicted_distribution: counts per star value
+    - confusion: {user_rating: {predicted_stars: count}} ("unknown" if not predicted)
+    - agreement: exact and within-one match rate of predicted vs user rating
+    - timeline: submissions per time bucket ("month", "day" or "hour")
+    - top_recommendations: most frequent ai_recommendations (case-insensitive)
+    Distributions and agreement cover analysed ('done') rows only and read the
+    typed predicted_stars column and submission_recommendations table (see
+    storage.init_db), so no JSON is parsed. Every query is a GROUP BY, so the
+    response size does not grow with the table.
+    """
+    length = TIME_BUCKETS[bucket]
+    all_where, all_params = _filters(created_from, created_to, analysed_only=False)
+    done_where, done_params = _filters(created_from, created_to)
+
+    status_counts = dict(conn.execute(
+        f"SELECT status, COUNT(*) FROM submissions{all_where} GROUP BY status", all_params
+    ).fetchall())
+
+    confusion = {}
+    ratings, predicted = Counter(), Counter()
+    exact = within_one = compared = 0
+    for rating, stars, count in conn.execute(
+        f"SELECT rating, predicted_stars, COUNT(*) FROM submissions{done_where} GROUP BY 1, 2", done_params
+    ):
+        stars_key = str(stars) if stars is not None else "unknown"
+        confusion.setdefault(str(rating), {})[stars_key] = count
+        ratings[str(rating)] += count
+        predicted[stars_key] += count
+        if rating is not None and stars is not None:
+            compared += count
+            exact += count if stars == rating else 0
+            within_one += count if abs(stars - rating) <= 1 else 0
+
+    timeline = [
+        {"bucket": period, "count": count}
+        for period, count in conn.execute(
+            f"SELECT substr(created_at, 1, {length}) AS period, COUNT(*) FROM submissions{all_where} "
+            "GROUP BY period ORDER BY period",
+            all_params,
+        )
+    ]
+
+    top_recommendations = [
+        {"recommendation": text, "count": count}
+        for text, count in conn.execute(
+            f"""
+            SELECT MIN(rec.recommendation), COUNT(*) AS n
+            FROM submission_recommendations AS rec
+            JOIN submissions ON submissions.id = rec.submission_id
+            {done_where}
+            GROUP BY lower(rec.recommendation)
+            ORDER BY n DESC, 1
+            LIMIT ?
+            """,
+            done_params + [top_n],
+        )
+    ]
+
+    return {
+        "total": sum(status_counts.values()),
+        "status_counts": status_counts,
+        "analysed": sum(ratings.values()),
+        "rating_distribution": dict(sorted(ratings.items())),
+        "predicted_distribution": dict(sorted(predicted.items())),
+        "confusion": confusion,
+        "agreement": {
+            "compared": compared,
+            "exact": (exact / compared) if compared else None,
+            "within_one": (within_one / compared) if compared else None,
+        },
+        "bucket": bucket,
+        "timeline": timeline,
+        "top_recommendations": top_recommendations,
+    }
@@ -0,0 +1,233 @@
+# batch_ingest.py (streaming JSONL ingestion behind POST /submit/batch)
+import os
+import json
+import time
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+
+from schemas import review_fields
+from storage import insert_submission_row, complete_submission_row
+from rate_limiter import RateLimiter
+
+# -------------------------
+# Configuration
+# -------------------------
+# Concurrent LLM calls per batch request
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "8"))
+# Quota shared by all batch requests in this process (0 disables a limit).
+# Interactive /submit calls are not throttled by it.
+BATCH_LLM_RPM = float(os.environ.get("BATCH_LLM_RPM", "15"))
+BATCH_LLM_TPM = float(os.environ.get("BATCH_LLM_TPM", "0"))
+BATCH_LLM_BURST = float(os.environ.get("BATCH_LLM_BURST", "1"))
+# Valid records stored per transaction (as 'pending'), and analysed results per transaction
+BATCH_WRITE_SIZE = int(os.environ.get("BATCH_WRITE_SIZE", "200"))
+# How long the result writer waits to fill a transaction after the first result arrives
+BATCH_WRITE_WINDOW_MS = float(os.environ.get("BATCH_WRITE_WINDOW_MS", "200"))
+# Records read ahead of the LLM workers; reading the body pauses when this is full
+BATCH_QUEUE_SIZE = int(os.environ.get("BATCH_QUEUE_SIZE", "1000"))
+# Longest accepted line; longer lines are reported as invalid and skipped
+BATCH_MAX_LINE_BYTES = int(os.environ.get("BATCH_MAX_LINE_BYTES", str(1024 * 1024)))
+
+BATCH_LIMITER = RateLimiter(rpm=BATCH_LLM_RPM, tpm=BATCH_LLM_TPM, burst=BATCH_LLM_BURST)
+BATCH_STATS = Counter()
+
+_DONE = object()
+
+
+async def iter_lines(chunks, max_line_bytes: int = BATCH_MAX_LINE_BYTES):
+    """
+    Split an async iterator of byte chunks into (line_number, bytes) pairs
+    without holding more than one line in memory. A line longer than
+    max_line_bytes is yielded once as None and the rest of it is skipped.
+    """
+    buf = bytearray()
+    line_no = 0
+    skipping = False
+    async for chunk in chunks:
+        buf += chunk
+        while True:
+            end = buf.find(b"\n")
+            if end < 0:
+                break
+            line_no += 1
+            yield line_no, (None if skipping else bytes(buf[:end]))
+            skipping = False
+            del buf[:end + 1]
+        if not skipping and len(buf) > max_line_bytes:
+            skipping = True
+            buf.clear()
+        elif skipping:
+            buf.clear()
+    if buf or skipping:
+        yield line_no + 1, (None if skipping else bytes(buf))
+
+
+def parse_record(line: bytes):
+    """Return (review, rating, None) for a valid JSONL record, or (None, None, message)."""
+    if line is None:
+        return None, None, f"Line longer than {BATCH_MAX_LINE_BYTES} bytes."
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        return None, None, f"Invalid JSON: {e}"
+    review, rating = review_fields(data)
+    if review is None:
+        return None, None, "Invalid rating or review."
+    return review, rating, None
+
+
+def _insert_pending(conn, records, created_at):
+    return [insert_submission_row(conn, rating, review, created_at, status="pending")
+            for _, review, rating in records]
+
+
+def _store_results(conn, results):
+    for item in results:
+        if item["status"] == "ok":
+            complete_submission_row(conn, item["id"], item["reply"], item["admin_obj"])
+        else:
+            conn.execute("UPDATE submissions SET status = 'failed', error = ? WHERE id = ?",
+                         (item["message"], item["id"]))
+
+
+async def ingest_jsonl(chunks, analyze, writer, workers: int = BATCH_WORKERS,
+                       limiter: RateLimiter = BATCH_LIMITER):
+    """
+    Ingest a JSONL/NDJSON stream of {"rating", "review"} records and yield one
+    outcome dict per line, in completion order, then a final summary:
+    - {"line", "status": "invalid", "message"}: rejected, nothing stored
+    - {"line", "status": "ok", "id", "predicted_stars"}: analysed and stored
+    - {"line", "status": "failed", "id", "message"}: stored with status 'failed'
+    - {"status": "done", "received", "ok", "invalid", "failed", "elapsed_seconds"}
+    Pipeline:
+    - reader: validates each line as it arrives and stores valid records as
+      'pending', BATCH_WRITE_SIZE per transaction (sooner if the workers are idle)
+    - `workers` tasks: analyze(review, rating, limiter) -> (AdminAnalysis,
+      admin_obj); analyze takes quota from limiter only for requests that
+      reach the LLM (not for cache hits or reused analyses)
+    - result writer: stores up to BATCH_WRITE_SIZE analysed rows per transaction,
+      collecting for at most BATCH_WRITE_WINDOW_MS after the first one
+    The reader waits while BATCH_QUEUE_SIZE records are queued, so memory is
+    bounded by that and not by the body size. Records still pending if the
+    stream is abandoned are picked up by the job queue on the next startup.
+    """
+    started = time.perf_counter()
+    work = asyncio.Queue(maxsize=max(1, BATCH_QUEUE_SIZE))
+    results = asyncio.Queue()
+    outcomes = asyncio.Queue()  # small dicts only, so a slow reader cannot stall ingestion
+    counts = Counter()
+
+    async def store_pending(records):
+        created_at = datetime.now(timezone.utc).isoformat()
+        ids = await writer.call(lambda conn: _insert_pending(conn, records, created_at))
+        for sid, (line_no, review, rating) in zip(ids, records):
+            await work.put((line_no, sid, review, rating))
+
+    async def reader():
+        records = []
+        try:
+            async for line_no, line in iter_lines(chunks):
+                if line is not None and not line.strip():
+                    continue
+                counts["received"] += 1
+                review, rating, message = parse_record(line)
+                if message:
+                    counts["invalid"] += 1
+                    outcomes.put_nowait({"line": line_no, "status": "invalid", "message": message})
+                    continue
+                records.append((line_no, review, rating))
+                if len(records) >= BATCH_WRITE_SIZE or work.empty():
+                    await store_pending(records)
+                    records = []
+            if records:
+                await store_pending(records)
+        finally:
+            for _ in range(workers):
+                await work.put(_DONE)
+
+    async def worker():
+        while True:
+            item = await work.get()
+            if item is _DONE:
+                return
+            line_no, sid, review, rating = item
+            try:
+                analysis, admin_obj = await analyze(review, rating, limiter)
+                results.put_nowait({"line": line_no, "id": sid, "status": "ok", "reply": analysis.ai_reply,
+                                    "admin_obj": admin_obj, "predicted_stars": analysis.predicted_stars})
+            except Exception as e:
+                print(f"LLM call exception (batch line {line_no}, submission {sid}):", e)
+                results.put_nowait({"line": line_no, "id": sid, "status": "failed",
+                                    "message": f"LLM failure: {str(e)}"})
+
+    async def result_writer():
+        while True:
+            batch = [await results.get()]
+            deadline = time.monotonic() + BATCH_WRITE_WINDOW_MS / 1000
+            while len(batch) < BATCH_WRITE_SIZE and batch[-1] is not _DONE:
+                try:
+                    batch.append(await asyncio.wait_for(results.get(), max(0.0, deadline - time.monotonic())))
+                except asyncio.TimeoutError:
+                    break
+            stop = batch[-1] is _DONE
+            batch = [item for item in batch if item is not _DONE]
+            if batch:
+                try:
+                    await writer.call(lambda conn: _store_results(conn, batch))
+                except Exception as e:
+                    print("DB write failed (batch results):", e)
+                    batch = [{"line": item["line"], "id": item["id"], "status": "failed",
+                              "message": "Failed to save result."} for item in batch]
+                for item in batch:
+                    counts[item["status"]] += 1
+                    outcome = {"line": item["line"], "status": item["status"], "id": item["id"]}
+                    if item["status"] == "ok":
+                        outcome["predicted_stars"] = item["predicted_stars"]
+                    else:
+                        outcome["message"] = item["message"]
+                    outcomes.put_nowait(outcome)
+            if stop:
+                return
+
+    async def run():
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+        writer_task = asyncio.create_task(result_writer())
+        try:
+            try:
+                await reader()
+            except Exception as e:
+                # e.g. the client disconnected mid-upload: finish what was already read
+                print("Batch ingest stopped reading:", e)
+                counts["aborted"] += 1
+            await asyncio.gather(*tasks)
+            results.put_nowait(_DONE)
+            await writer_task
+        finally:
+            for t in tasks + [writer_task]:
+                t.cancel()
+            outcomes.put_nowait(_DONE)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            outcome = await outcomes.get()
+            if outcome is _DONE:
+                break
+            yield outcome
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+        BATCH_STATS["requests"] += 1
+        for key in ("received", "ok", "invalid", "failed"):
+            BATCH_STATS[key] += counts[key]
+    yield {
+        "status": "done",
+        "received": counts["received"],
+        "ok": counts["ok"],
+        "invalid": counts["invalid"],
+        "failed": counts["failed"],
+        "aborted": bool(counts["aborted"]),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
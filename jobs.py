@@ -0,0 +1,123 @@
+# jobs.py (background worker pool for asynchronous review analysis)
+import os
+import asyncio
+
+# -------------------------
+# Configuration
+# -------------------------
+# Number of submissions analysed concurrently in the background. This is the
+# knob for the LLM backlog; it is independent of how many HTTP requests the
+# server accepts.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+
+
+class JobQueue:
+    """
+    In-process FIFO of jobs processed by JOB_WORKERS asyncio tasks.
+    - handler is an async callable(job_id, payload); it is responsible for
+      persisting its own result (success or failure)
+    - submit() never blocks, so the caller can answer immediately
+    - wait() lets a request long-poll until a given job has been handled
+    - jobs submitted with the same key while one is still queued ride along
+      with it: they do not take a queue slot, and when a worker picks the
+      first one up it runs the handler for all of them concurrently (so the
+      handler can share work between them, see main.analyze_review)
+    Workers are started lazily on the running event loop, like the
+    group-commit writer in storage.py.
+    """
+
+    def __init__(self, handler, workers=JOB_WORKERS):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self._queue = None
+        self._tasks = []
+        self._loop = None
+        self._events = {}
+        self._queued_keys = {}
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or all(task.done() for task in self._tasks):
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._events = {}
+            self._queued_keys = {}
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, job_id, payload, key=None) -> bool:
+        """
+        Queue one job; returns immediately. Returns False if the job was
+        attached to a queued job with the same key instead of taking a slot.
+        """
+        self._ensure_started()
+        self._events.setdefault(job_id, asyncio.Event())
+        self.submitted += 1
+        if key is not None and key in self._queued_keys:
+            self._queued_keys[key].append((job_id, payload))
+            self.coalesced += 1
+            return False
+        if key is not None:
+            self._queued_keys[key] = []
+        self._queue.put_nowait((job_id, payload, key))
+        return True
+
+    def is_tracked(self, job_id) -> bool:
+        """True if job_id is queued or running in this process."""
+        return job_id in self._events
+
+    async def wait(self, job_id, timeout: float) -> bool:
+        """
+        Wait up to timeout seconds for job_id to finish. Returns True if the
+        job finished (or is not tracked here), False on timeout.
+        """
+        event = self._events.get(job_id)
+        if event is None:
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self, job_id, payload):
+        try:
+            await self.handler(job_id, payload)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Background job {job_id} failed:", e)
+        finally:
+            event = self._events.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    async def _worker(self):
+        while True:
+            job_id, payload, key = await self._queue.get()
+            # jobs that joined while this one was queued; later ones queue normally
+            riders = self._queued_keys.pop(key, []) if key is not None else []
+            try:
+                await asyncio.gather(self._run(job_id, payload), *(self._run(j, p) for j, p in riders))
+            finally:
+                self._queue.task_done()
+
+    async def stop(self):
+        """Cancel the workers. Jobs still queued stay 'pending' in the database."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
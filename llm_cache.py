@@ -0,0 +1,185 @@
+# llm_cache.py (content-addressed response cache shared by the LLM clients)
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# -------------------------
+# Configuration
+# -------------------------
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") == "1"
+# Only deterministic (temperature 0) calls are cached unless this is set,
+# otherwise ensemble runs at temperature > 0 would all get the same answer.
+LLM_CACHE_ALL_TEMPERATURES = os.environ.get("LLM_CACHE_ALL_TEMPERATURES", "0") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # 0 = never expire
+# On-disk layer (survives restarts and evaluation re-runs). Set to "" to disable.
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB", os.path.join("data", "llm_cache.db"))
+LLM_CACHE_DB_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_DB_MAX_ENTRIES", "100000"))
+
+
+def make_key(**fields) -> str:
+    """
+    Build a content-addressed key from every field that influences the output
+    (provider, model, prompt, temperature, max_output_tokens, ...).
+    """
+    blob = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(temperature) -> bool:
+    """Return True if a call with this temperature may be served from cache."""
+    if not LLM_CACHE_ENABLED:
+        return False
+    try:
+        return LLM_CACHE_ALL_TEMPERATURES or float(temperature) == 0.0
+    except (TypeError, ValueError):
+        return False
+
+
+class LLMCache:
+    """
+    Two-level cache for raw LLM text:
+     - in-memory LRU (OrderedDict) bounded by max_entries
+     - optional SQLite store bounded by db_max_entries (oldest rows evicted first)
+    Entries older than ttl_seconds are treated as misses and dropped.
+    Thread-safe; hit/miss counters are available via stats().
+    """
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                 db_path=LLM_CACHE_DB, db_max_entries=LLM_CACHE_DB_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.db_max_entries = max(1, int(db_max_entries))
+        self._mem = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if db_path:
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_stored_at ON llm_cache(stored_at)")
+            self._db.commit()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - stored_at) > self.ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, value: str):
+        self._mem[key] = (stored_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str):
+        """Return the cached text for key, or None on a miss."""
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._mem[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, stored_at = row
+                    if not self._expired(stored_at):
+                        self._remember(key, stored_at, value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        """Store text under key in memory and (if enabled) on disk."""
+        if value is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+                self._puts_since_prune += 1
+                # prune in batches so the size check does not run on every put
+                if self._puts_since_prune >= 100:
+                    self._prune_disk()
+                self._db.commit()
+
+    def _prune_disk(self):
+        self._puts_since_prune = 0
+        if self.ttl_seconds > 0:
+            self._db.execute("DELETE FROM llm_cache WHERE stored_at < ?", (time.time() - self.ttl_seconds,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.db_max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY stored_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def clear(self):
+        """Drop every entry from both layers (counters are kept)."""
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+                "memory_entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk": self._db is not None,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> LLMCache:
+    """Return the process-wide cache instance (created on first use)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
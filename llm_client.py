@@ -1,34 +1,78 @@
 # llm_client.py (UPDATED generate_text)
 import os
 import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+import llm_cache
+
 load_dotenv()
 
 MOCK = os.environ.get("MOCK_LLM", "0") == "1"
 
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.1")
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://127.0.0.1:11434/api/generate")
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "8"))
 
-def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120) -> str:
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """Return the shared keep-alive session used for Ollama calls (created lazily)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, OLLAMA_POOL_SIZE))
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+# Returned (as JSON text) instead of calling Ollama when MOCK_LLM=1
+MOCK_RESPONSE = {
+    "predicted_stars": 4,
+    "explanation": "Mock response: Assumed positive experience for demonstration.",
+    "ai_summary": "The user provided a generic, positive review.",
+    "ai_recommendations": ["Acknowledge feedback.", "No action required."],
+    "ai_reply": "Thank you so much for your positive review! We are glad you enjoyed your experience. We have logged your feedback internally."
+}
+
+def stream_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120):
     """
-    Handles API calls to the LLM endpoint (configured for Ollama by default) or returns a mock response.
-    Tries streaming first; if response yields nothing, falls back to full body read.
+    Generator yielding response text pieces as Ollama produces them (one per
+    streamed JSON line). The joined text is cached once the stream completes;
+    a cache hit is yielded as a single piece.
     """
     if MOCK:
-        print("--- LLM CLIENT: Returning Mock Response (MOCK_LLM='1') ---")
-        return json.dumps({
-            "predicted_stars": 4,
-            "explanation": "Mock response: Assumed positive experience for demonstration.",
-            "ai_summary": "The user provided a generic, positive review.",
-            "ai_recommendations": ["Acknowledge feedback.", "No action required."],
-            "ai_reply": "Thank you so much for your positive review! We are glad you enjoyed your experience. We have logged your feedback internally."
-        })
+        print("--- LLM CLIENT: Streaming Mock Response (MOCK_LLM='1') ---")
+        text = json.dumps(MOCK_RESPONSE)
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+        return
 
     url = os.environ.get("OLLAMA_URL", OLLAMA_URL)
     model = os.environ.get("OLLAMA_MODEL", OLLAMA_MODEL)
 
+    # Identical deterministic requests are served from the response cache
+    cache_key = None
+    if llm_cache.is_cacheable(temperature):
+        cache_key = llm_cache.make_key(
+            provider="ollama",
+            url=url,
+            model=model,
+            prompt=prompt,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+        )
+        cached = llm_cache.get_cache().get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
     payload = {
         "model": model,
         "prompt": prompt,
@@ -40,40 +84,49 @@ def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0,
     }
 
     try:
-        # Try streaming
-        r = requests.post(url, json=payload, stream=True, timeout=timeout)
+        r = _get_session().post(url, json=payload, stream=True, timeout=timeout)
         r.raise_for_status()
-
-        full_text = ""
-        try:
-            for raw_line in r.iter_lines(decode_unicode=True, chunk_size=1024):
-                if not raw_line:
-                    continue
-                # attempt to parse JSON chunk
-                try:
-                    chunk = json.loads(raw_line)
-                except Exception:
-                    # non-JSON chunk: append raw
-                    full_text += raw_line
-                    continue
-
-                resp_piece = chunk.get("response") or ""
-                if isinstance(resp_piece, str) and resp_piece:
-                    full_text += resp_piece
-
-                if chunk.get("done") is True:
-                    break
-        except Exception:
-            # If streaming iteration fails, fall back to full text
-            full_text = r.text
-
-        # fallback
-        if not full_text:
-            full_text = r.text or ""
-
-        return full_text
-
     except requests.exceptions.RequestException as req_exc:
         error_msg = f"LLM Client FATAL ERROR: Could not connect to LLM service at {url}. Ensure Ollama/Gemini is running. Error: {req_exc}"
         print(error_msg)
-        raise RuntimeError(error_msg) from req_exc
\ No newline at end of file
+        raise RuntimeError(error_msg) from req_exc
+
+    pieces = []
+    try:
+        for raw_line in r.iter_lines(decode_unicode=True, chunk_size=1024):
+            if not raw_line:
+                continue
+            # attempt to parse JSON chunk
+            try:
+                chunk = json.loads(raw_line)
+            except Exception:
+                # non-JSON chunk: pass through raw
+                pieces.append(raw_line)
+                yield raw_line
+                continue
+
+            resp_piece = chunk.get("response") or ""
+            if isinstance(resp_piece, str) and resp_piece:
+                pieces.append(resp_piece)
+                yield resp_piece
+
+            if chunk.get("done") is True:
+                break
+    except requests.exceptions.RequestException as req_exc:
+        raise RuntimeError(f"LLM Client stream interrupted: {req_exc}") from req_exc
+    finally:
+        r.close()
+
+    if cache_key is not None and pieces:
+        llm_cache.get_cache().put(cache_key, "".join(pieces))
+
+def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120) -> str:
+    """
+    Handles API calls to the LLM endpoint (configured for Ollama by default) or returns a mock response.
+    Reads the streamed response (see stream_text) and returns the joined text.
+    """
+    if MOCK:
+        print("--- LLM CLIENT: Returning Mock Response (MOCK_LLM='1') ---")
+        return json.dumps(MOCK_RESPONSE)
+
+    return "".join(stream_text(prompt, max_output_tokens=max_output_tokens, temperature=temperature, timeout=timeout))
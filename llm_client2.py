@@ -2,9 +2,16 @@
 import os
 import json
 import time
+import asyncio
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+import llm_cache
+from rate_limiter import estimate_tokens
+
 load_dotenv()
 
 MOCK = os.environ.get("MOCK_LLM", "0") == "1"
@@ -23,6 +30,52 @@ if not MOCK and not GEMINI_API_KEY:
 
 # Google REST endpoint for Gemini
 GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+# Streaming endpoint: one server-sent event per partial response
+GEMINI_STREAM_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+
+# Max number of LLM calls allowed in flight at once from the async path.
+# Each call occupies one executor thread (including its 429 backoff sleeps),
+# so this also bounds the number of threads the client can tie up.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+
+# Connection pool for the shared HTTP session. Keep-alive connections are
+# reused across calls, so TCP/TLS handshakes scale with the pool size rather
+# than with the number of requests.
+GEMINI_POOL_SIZE = int(os.environ.get("GEMINI_POOL_SIZE", str(LLM_MAX_CONCURRENCY)))
+
+# Returned (as JSON text) instead of calling Gemini when MOCK_LLM=1
+MOCK_RESPONSE = {
+    "predicted_stars": 5,
+    "explanation": "Mock explanation: Customer showed strong positive sentiment.",
+    "ai_summary": "Customer very satisfied with product and service.",
+    "ai_recommendations": ["Keep quality consistent", "Reward staff performance"],
+    "ai_reply": "Thanks for the glowing review! We’re thrilled you enjoyed it."
+}
+
+_llm_executor = None
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """
+    Return the process-wide requests.Session used for Gemini calls.
+    Created lazily (thread-safe) and mounted with a pooled HTTPAdapter.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=max(1, GEMINI_POOL_SIZE),
+                    pool_block=False,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Connection": "keep-alive"})
+                _session = session
+    return _session
 
 def _extract_text_from_response_json(data: dict) -> str:
     """
@@ -84,23 +137,7 @@ def _extract_text_from_response_json(data: dict) -> str:
     # Last resort: return JSON dump
     return json.dumps(data)
 
-def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120, max_retries: int = 4) -> str:
-    """
-    Sends prompt to Gemini API using REST with retries/backoff for 429 and network errors.
-    Returns the text output from the model (raw string).
-    """
-
-    # MOCK mode: return a rich mock JSON string so downstream extractor can parse
-    if MOCK:
-        print("--- GEMINI CLIENT: Returning Mock Response (MOCK_LLM='1') ---")
-        return json.dumps({
-            "predicted_stars": 5,
-            "explanation": "Mock explanation: Customer showed strong positive sentiment.",
-            "ai_summary": "Customer very satisfied with product and service.",
-            "ai_recommendations": ["Keep quality consistent", "Reward staff performance"],
-            "ai_reply": "Thanks for the glowing review! We’re thrilled you enjoyed it."
-        })
-
+def _build_payload(prompt: str, max_output_tokens, temperature: float, response_schema: dict = None) -> dict:
     payload = {
         "contents": [
             {
@@ -114,11 +151,30 @@ def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0,
             "maxOutputTokens": max_output_tokens
         }
     }
+    if response_schema is not None:
+        payload["generationConfig"]["responseMimeType"] = "application/json"
+        payload["generationConfig"]["responseSchema"] = response_schema
+    return payload
 
+def _cache_key(prompt: str, max_output_tokens, temperature: float, response_schema: dict = None):
+    """Cache key for a deterministic request, or None if the request is not cacheable."""
+    if not llm_cache.is_cacheable(temperature):
+        return None
+    return llm_cache.make_key(
+        provider="gemini",
+        model=GEMINI_MODEL,
+        prompt=prompt,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        response_schema=response_schema,
+    )
+
+def _post_with_retries(url: str, payload: dict, timeout: int, max_retries: int, stream: bool = False) -> requests.Response:
+    """POST payload, retrying with backoff on 429 and network errors. Returns the successful response."""
     attempt = 0
     while attempt <= max_retries:
         try:
-            resp = requests.post(GEMINI_URL, json=payload, timeout=timeout)
+            resp = _get_session().post(url, json=payload, timeout=timeout, stream=stream)
             # raise for 4xx/5xx
             try:
                 resp.raise_for_status()
@@ -134,11 +190,7 @@ def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0,
                     continue
                 else:
                     raise RuntimeError(f"HTTP error: {http_err} | status={status} | body={text}")
-
-            # success path
-            data = resp.json()
-            extracted = _extract_text_from_response_json(data)
-            return extracted
+            return resp
 
         except requests.exceptions.RequestException as e:
             # network or timeout — retry up to max_retries with backoff
@@ -151,4 +203,205 @@ def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0,
             raise RuntimeError(f"GEMINI request failed after {attempt} retries: {e}")
 
     # fallback: raise if we exit loop without return
-    raise RuntimeError("GEMINI request exhausted retries without success.")
\ No newline at end of file
+    raise RuntimeError("GEMINI request exhausted retries without success.")
+
+def _cached_text(cache_key):
+    """Cached text for cache_key, or None (also when the request is not cacheable)."""
+    return llm_cache.get_cache().get(cache_key) if cache_key is not None else None
+
+def _request_text(prompt: str, max_output_tokens, temperature: float, timeout: int, max_retries: int,
+                  response_schema: dict, cache_key) -> str:
+    """Call Gemini (no cache lookup) and cache the extracted text under cache_key."""
+    payload = _build_payload(prompt, max_output_tokens, temperature, response_schema)
+    resp = _post_with_retries(GEMINI_URL, payload, timeout, max_retries)
+
+    # success path
+    data = resp.json()
+    extracted = _extract_text_from_response_json(data)
+    if cache_key is not None:
+        llm_cache.get_cache().put(cache_key, extracted)
+    return extracted
+
+def generate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120, max_retries: int = 4,
+                  response_schema: dict = None, rate_limiter=None) -> str:
+    """
+    Sends prompt to Gemini API using REST with retries/backoff for 429 and network errors.
+    Returns the text output from the model (raw string).
+    If response_schema is given, the request uses Gemini's structured-output mode
+    (responseMimeType=application/json + responseSchema), so the returned text
+    is a JSON document matching the schema.
+    If rate_limiter (rate_limiter.RateLimiter) is given, quota is taken only
+    when the request actually goes to Gemini, i.e. not for cache hits.
+    """
+
+    # MOCK mode: return a rich mock JSON string so downstream extractor can parse
+    if MOCK:
+        print("--- GEMINI CLIENT: Returning Mock Response (MOCK_LLM='1') ---")
+        return json.dumps(MOCK_RESPONSE)
+
+    # Identical deterministic requests are served from the response cache
+    cache_key = _cache_key(prompt, max_output_tokens, temperature, response_schema)
+    cached = _cached_text(cache_key)
+    if cached is not None:
+        return cached
+
+    if rate_limiter is not None:
+        rate_limiter.acquire(estimate_tokens(prompt, max_output_tokens))
+    return _request_text(prompt, max_output_tokens, temperature, timeout, max_retries, response_schema, cache_key)
+
+
+def _stream_chunk_text(data: dict) -> str:
+    """Text parts of one streamGenerateContent event ('' for metadata-only events)."""
+    if isinstance(data.get("error"), dict):
+        raise RuntimeError(f"GEMINI stream error: {data['error'].get('message') or data['error']}")
+    candidates = data.get("candidates") or []
+    if not candidates or not isinstance(candidates[0], dict):
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+
+
+def stream_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120, max_retries: int = 4,
+                response_schema: dict = None):
+    """
+    Streaming variant of generate_text(): a generator yielding text chunks as
+    Gemini produces them (streamGenerateContent over SSE).
+    - 429s and network errors are retried only before the first chunk arrives
+    - the joined text is cached like generate_text() once the stream completes,
+      and a cache hit is yielded as a single chunk
+    """
+    if MOCK:
+        print("--- GEMINI CLIENT: Streaming Mock Response (MOCK_LLM='1') ---")
+        text = json.dumps(MOCK_RESPONSE)
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+        return
+
+    cache_key = _cache_key(prompt, max_output_tokens, temperature, response_schema)
+    if cache_key is not None:
+        cached = llm_cache.get_cache().get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    payload = _build_payload(prompt, max_output_tokens, temperature, response_schema)
+    resp = _post_with_retries(GEMINI_STREAM_URL, payload, timeout, max_retries, stream=True)
+    pieces = []
+    try:
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            try:
+                data = json.loads(line[len("data:"):].strip())
+            except Exception:
+                continue
+            piece = _stream_chunk_text(data)
+            if piece:
+                pieces.append(piece)
+                yield piece
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"GEMINI stream interrupted: {e}")
+    finally:
+        resp.close()
+
+    if cache_key is not None and pieces:
+        llm_cache.get_cache().put(cache_key, "".join(pieces))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Lazily create the dedicated executor used by agenerate_text()."""
+    global _llm_executor
+    if _llm_executor is None:
+        _llm_executor = ThreadPoolExecutor(
+            max_workers=max(1, LLM_MAX_CONCURRENCY),
+            thread_name_prefix="gemini-llm",
+        )
+    return _llm_executor
+
+
+async def agenerate_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120, max_retries: int = 4,
+                         response_schema: dict = None, rate_limiter=None) -> str:
+    """
+    Async variant of generate_text() for use inside event-loop handlers.
+    The blocking HTTP call (and any retry backoff) runs on a dedicated, bounded
+    thread pool, so the event loop keeps serving other requests meanwhile.
+    Calls beyond LLM_MAX_CONCURRENCY wait in the executor queue.
+    With rate_limiter, a cache miss awaits quota (aacquire) on the event loop
+    before it takes an executor thread, so throttled calls do not hold threads.
+    """
+    loop = asyncio.get_running_loop()
+    if rate_limiter is None or MOCK:
+        return await loop.run_in_executor(
+            _get_executor(),
+            lambda: generate_text(
+                prompt,
+                max_output_tokens=max_output_tokens,
+                temperature=temperature,
+                timeout=timeout,
+                max_retries=max_retries,
+                response_schema=response_schema,
+            ),
+        )
+
+    cache_key = _cache_key(prompt, max_output_tokens, temperature, response_schema)
+    cached = await loop.run_in_executor(_get_executor(), _cached_text, cache_key)
+    if cached is not None:
+        return cached
+    await rate_limiter.aacquire(estimate_tokens(prompt, max_output_tokens))
+    return await loop.run_in_executor(
+        _get_executor(),
+        lambda: _request_text(prompt, max_output_tokens, temperature, timeout, max_retries, response_schema, cache_key),
+    )
+
+
+async def astream_text(prompt: str, max_output_tokens=512, temperature: float = 0.0, timeout: int = 120, max_retries: int = 4,
+                       response_schema: dict = None):
+    """
+    Async iterator over stream_text() chunks for event-loop handlers.
+    The blocking stream is read on the same bounded executor as agenerate_text()
+    and chunks are handed to the loop as they arrive. If the consumer stops
+    early (e.g. the HTTP client disconnected), the upstream stream is closed.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    end = object()
+
+    def deliver(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # event loop already closed
+            stop.set()
+
+    def produce():
+        chunks = stream_text(
+            prompt,
+            max_output_tokens=max_output_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            max_retries=max_retries,
+            response_schema=response_schema,
+        )
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    break
+                deliver((chunk, None))
+            deliver((end, None))
+        except Exception as e:
+            deliver((end, e))
+        finally:
+            chunks.close()
+
+    loop.run_in_executor(_get_executor(), produce)
+    try:
+        while True:
+            chunk, error = await queue.get()
+            if chunk is end:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        stop.set()
@@ -0,0 +1,356 @@
+# llm_parsing.py (helpers for pulling JSON out of raw LLM text)
+import re
+import ast
+import json
+import heapq
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Upper bound on blocks tried by callers that parse candidates one by one
+MAX_JSON_CANDIDATES = 32
+
+# How often each parse_llm_output() stage produced the result (process-wide)
+PARSE_STRATEGY_COUNTS = Counter()
+_counts_lock = threading.Lock()
+
+# Characters that can change scanner state outside of a quoted string
+_STRUCTURAL_CHARS = {
+    "\"'": re.compile(r'[{}"\']'),
+    '"': re.compile(r'[{}"]'),
+    "": re.compile(r'[{}]'),
+}
+# Rest of a quoted string (escape-aware) up to and including its closing quote
+_STRING_TAILS = {
+    '"': re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL),
+    "'": re.compile(r"[^'\\]*(?:\\.[^'\\]*)*'", re.DOTALL),
+}
+
+
+def _scan_blocks(text: str, quotes: str):
+    """
+    One left-to-right pass over text. Returns (spans, unterminated) where spans
+    are (start, end) offsets of every balanced {...} block, in the order they
+    close, and unterminated is True if the text ended inside a quoted string.
+    Quoted strings are skipped in one regex step. Quotes are only tracked inside
+    a block, so apostrophes in surrounding prose do not affect the scan.
+    """
+    structural = _STRUCTURAL_CHARS[quotes]
+    opens = []       # start offsets of currently open '{'
+    spans = []
+    pos = 0
+
+    while True:
+        m = structural.search(text, pos)
+        if m is None:
+            return spans, False
+        i = m.start()
+        ch = text[i]
+        pos = i + 1
+
+        if ch == "{":
+            opens.append(i)
+        elif ch == "}":
+            if opens:
+                spans.append((opens.pop(), i + 1))
+        elif opens:
+            tail = _STRING_TAILS[ch].match(text, pos)
+            if tail is None:
+                return spans, True
+            pos = tail.end()
+
+
+def _scan(text: str):
+    # fall back to fewer quote characters if a string never closes
+    for quotes in ("\"'", '"', ""):
+        spans, unterminated = _scan_blocks(text, quotes)
+        if not unterminated:
+            break
+    return spans
+
+
+def find_json_blocks(text: str) -> list:
+    """
+    Return the outermost balanced {...} substrings of text, in order of appearance.
+    - Braces inside quoted strings (double or single quotes) are ignored.
+    - Nesting depth is unlimited.
+    - The scan is O(n). If a quote is never closed (e.g. an apostrophe in
+      unquoted text), the text is scanned again with fewer quote characters
+      treated as strings, so this is at most three passes.
+    """
+    if not text or not isinstance(text, str):
+        return []
+
+    spans = sorted(_scan(text), key=lambda span: (span[0], -span[1]))
+    outermost = []
+    reach = -1
+    for start, end in spans:
+        if end > reach:
+            outermost.append((start, end))
+            reach = end
+    return [text[start:end] for start, end in outermost]
+
+
+def json_candidates(text: str, limit: int = MAX_JSON_CANDIDATES) -> list:
+    """
+    Return up to `limit` balanced {...} blocks of text, largest first, including
+    blocks nested inside others. This lets a caller fall back to an inner
+    object when stray braces in the surrounding prose wrap the real JSON.
+    Only the selected blocks are sliced out of text.
+    """
+    if not text or not isinstance(text, str):
+        return []
+
+    spans = heapq.nlargest(limit, _scan(text), key=lambda span: span[1] - span[0])
+    return [text[start:end] for start, end in spans]
+
+
+# -------------------------
+# Cleaning & staged parsing of LLM output
+# -------------------------
+def clean_llm_output(text: str) -> str:
+    """
+    Clean output so JSON extraction is easier:
+    - Normalize line endings
+    - Remove code fences (``` or ```json)
+    - Strip BOM/invisible chars and leading/trailing whitespace
+    - Trim to the first balanced JSON block if one exists
+    - Remove stray whitespace/newlines immediately before quoted keys
+    - Normalize single quotes to double quotes in simple cases
+    """
+    if not text:
+        return ""
+
+    # normalize line endings and remove BOM
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = text.lstrip("\ufeff").strip()
+
+    # remove code fences
+    text = re.sub(r"```(?:json)?\s*", "", text)
+    text = re.sub(r"\s*```\s*", "", text)
+
+    # find the first JSON object and the last closing brace
+    first_brace = text.find("{")
+    last_brace = text.rfind("}")
+    if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
+        # trim to largest brace-delimited block (this drops any leading prose)
+        text = text[first_brace:last_brace+1]
+    else:
+        # collapse repeated whitespace if no braces found
+        text = re.sub(r'\s+', ' ', text).strip()
+
+    # remove stray newlines immediately before quoted keys, e.g. '\n "predicted_stars"'
+    text = re.sub(r'[\n\t ]+(?=["\'])', '', text)
+
+    # if there are no double quotes but single quotes and braces exist, try a safe replace
+    if '"' not in text and ("'" in text and "{" in text and "}" in text):
+        try:
+            text = text.replace("'", '"')
+        except Exception:
+            pass
+
+    return text.strip()
+
+
+def _heuristic_fields(text: str) -> dict:
+    """Regex heuristics to populate the expected admin fields from non-JSON text."""
+    result = {}
+
+    # predicted_stars
+    m = re.search(r'["\']?predicted[_\s-]?stars["\']?\s*[:=]\s*([1-5])', text, re.IGNORECASE)
+    if m:
+        try:
+            result["predicted_stars"] = int(m.group(1))
+        except Exception:
+            pass
+
+    # explanation (short capture)
+    m = re.search(r'explanation["\']?\s*[:=-]\s*["\']?(.{5,400}?)["\']?(?=[,\}\n]|$)', text, re.IGNORECASE)
+    if m:
+        result["explanation"] = m.group(1).strip()
+
+    # ai_summary
+    m = re.search(r'ai_summary["\']?\s*[:=-]\s*["\']?(.{5,300}?)["\']?(?=[,\}\n]|$)', text, re.IGNORECASE)
+    if m:
+        result["ai_summary"] = m.group(1).strip()
+
+    # ai_recommendations (try to capture bracketed list)
+    m = re.search(r'ai_recommendations["\']?\s*[:=-]\s*(\[[^\]]*\])', text, re.IGNORECASE | re.DOTALL)
+    if m:
+        arrtxt = m.group(1)
+        try:
+            result["ai_recommendations"] = json.loads(arrtxt)
+        except Exception:
+            items = re.split(r'[\n;,\|]+', arrtxt.strip("[] "))
+            result["ai_recommendations"] = [it.strip(" \"'") for it in items if it.strip()]
+
+    # ai_reply
+    m = re.search(r'ai_reply["\']?\s*[:=-]\s*["\']?(.{5,500}?)["\']?(?=[,\}\n]|$)', text, re.IGNORECASE)
+    if m:
+        result["ai_reply"] = m.group(1).strip()
+
+    return result
+
+
+@dataclass
+class ParseResult:
+    """
+    Outcome of parse_llm_output().
+    - data: the parsed object ({} if nothing could be recovered)
+    - strategy: which stage produced data ("direct", "json", "json_block",
+      "literal_block", "quote_swap_block", "quote_swap", "heuristic" or "none")
+    - fallback_stars: a bare 1-5 digit found in the text, set only when data has
+      no predicted_stars
+    """
+    data: dict = field(default_factory=dict)
+    strategy: str = "none"
+    fallback_stars: Optional[int] = None
+
+
+def _loads_dict(text: str, literal: bool = False):
+    try:
+        parsed = ast.literal_eval(text) if literal else json.loads(text)
+    except Exception:
+        return None
+    return parsed if isinstance(parsed, dict) and parsed else None
+
+
+def _parse_stages(text: str):
+    # 0) fast path: the text is already a JSON object (structured-output mode)
+    parsed = _loads_dict(text)
+    if parsed is not None:
+        return parsed, "direct"
+
+    # 1) cleaned text as a whole
+    cleaned = clean_llm_output(text)
+    parsed = _loads_dict(cleaned)
+    if parsed is not None:
+        return parsed, "json"
+
+    # 2) balanced {...} blocks from a single scan of the raw text, largest first
+    for block in json_candidates(text):
+        block = block.strip()
+        parsed = _loads_dict(block)
+        if parsed is not None:
+            return parsed, "json_block"
+        parsed = _loads_dict(block, literal=True)
+        if parsed is not None:
+            return parsed, "literal_block"
+        parsed = _loads_dict(block.replace("'", '"'))
+        if parsed is not None:
+            return parsed, "quote_swap_block"
+
+    # 3) cleaned text with single quotes swapped
+    parsed = _loads_dict(cleaned.replace("'", '"'))
+    if parsed is not None:
+        return parsed, "quote_swap"
+
+    # 4) field-by-field regex heuristics
+    parsed = _heuristic_fields(text)
+    if parsed:
+        return parsed, "heuristic"
+    return {}, "none"
+
+
+def parse_llm_output(text: str) -> ParseResult:
+    """
+    Parse raw LLM output into a dict in one staged pass: the text is cleaned
+    once and scanned for {...} blocks once, and each stage stops at the first
+    success. The winning stage is recorded in the result and in
+    PARSE_STRATEGY_COUNTS. Never raises.
+    """
+    if not text or not isinstance(text, str):
+        result = ParseResult()
+    else:
+        try:
+            data, strategy = _parse_stages(text)
+        except Exception as e:
+            print("Parsing helper unexpected exception (ignored):", e)
+            data, strategy = {}, "error"
+        result = ParseResult(data=data, strategy=strategy)
+        if data.get("predicted_stars") is None:
+            m = re.search(r'\b([1-5])\b', text)
+            if m:
+                result.fallback_stars = int(m.group(1))
+
+    with _counts_lock:
+        PARSE_STRATEGY_COUNTS[result.strategy] += 1
+    return result
+
+
+# -------------------------
+# Incremental field extraction (streamed output)
+# -------------------------
+_PLAIN_RUN = re.compile(r'[^"\\]+')
+_ESCAPE = re.compile(r'\\(?:u[0-9a-fA-F]{4}|[^u])')
+_LOW_SURROGATE_ESCAPE = re.compile(r'\\u[dD][c-fC-F][0-9a-fA-F]{2}')
+
+
+class StreamingFieldExtractor:
+    """
+    Pull one string field (e.g. "ai_reply") out of a JSON document that arrives
+    in chunks. feed() returns the newly decoded part of the field's value, so it
+    can be forwarded to a client before the rest of the document exists.
+    - text before the key and after the closing quote is ignored
+    - escapes (including \\uXXXX surrogate pairs) split across chunks are held
+      back until complete
+    - `value` is everything decoded so far; `done` is set at the closing quote
+    Each character is examined a bounded number of times, so feeding is O(n).
+    """
+
+    # how much unmatched text to rescan for a key split across chunks
+    _KEY_OVERLAP = 64
+
+    def __init__(self, field_name: str):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field_name))
+        self._buf = ""
+        self._pos = 0
+        self.started = False
+        self.done = False
+        self.value = ""
+
+    def feed(self, chunk: str) -> str:
+        if self.done or not chunk:
+            return ""
+        self._buf += chunk
+        if not self.started:
+            m = self._key.search(self._buf, self._pos)
+            if m is None:
+                self._pos = max(0, len(self._buf) - self._KEY_OVERLAP)
+                return ""
+            self.started = True
+            self._pos = m.end()
+
+        buf, i, out = self._buf, self._pos, []
+        while i < len(buf):
+            m = _PLAIN_RUN.match(buf, i)
+            if m:
+                out.append(m.group())
+                i = m.end()
+                continue
+            if buf[i] == '"':
+                self.done = True
+                i += 1
+                break
+            esc = _ESCAPE.match(buf, i)
+            if esc is None:
+                break  # incomplete escape: wait for the next chunk
+            seq = esc.group()
+            if seq[1] == "u" and seq[2] in "dD" and seq[3] in "89abAB":
+                # high surrogate: decode together with the following low surrogate
+                if len(buf) < esc.end() + 6:
+                    break
+                low = _LOW_SURROGATE_ESCAPE.match(buf, esc.end())
+                if low:
+                    seq += low.group()
+            try:
+                out.append(json.loads('"' + seq + '"'))
+            except Exception:
+                out.append(seq[1:])
+            i += len(seq)
+
+        self._pos = i
+        delta = "".join(out)
+        self.value += delta
+        return delta
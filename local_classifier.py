@@ -0,0 +1,159 @@
+# local_classifier.py (cheap local star-rating model used before the LLM)
+import os
+import time
+import hashlib
+
+import numpy as np
+
+# -------------------------
+# Configuration
+# -------------------------
+LOCAL_MODEL_PATH = os.environ.get("LOCAL_MODEL_PATH", os.path.join("data", "local_classifier.joblib"))
+# A local prediction is used only when its calibrated probability is at least
+# this; everything else is escalated to the LLM.
+LOCAL_CONFIDENCE_THRESHOLD = float(os.environ.get("LOCAL_CONFIDENCE_THRESHOLD", "0.8"))
+# Fewer labelled rows than this is not enough to train a useful model
+LOCAL_MIN_TRAIN_ROWS = int(os.environ.get("LOCAL_MIN_TRAIN_ROWS", "200"))
+
+_LOADED = {}
+
+
+def data_fingerprint(texts, stars) -> str:
+    """Identify a training set, so a saved model is reused only for the same data."""
+    h = hashlib.sha256()
+    for text, star in zip(texts, stars):
+        h.update(f"{star}\t{text}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class LocalClassifier:
+    """
+    TF-IDF (word 1-2 grams) + linear SVM, with probabilities calibrated by
+    CalibratedClassifierCV (sigmoid, 3 folds). predict() returns the star with
+    the highest calibrated probability and that probability as the confidence.
+    meta records the training set fingerprint and hold-out metrics.
+    """
+
+    def __init__(self, pipeline, meta: dict):
+        self.pipeline = pipeline
+        self.meta = meta
+
+    @classmethod
+    def train(cls, texts, stars, holdout: float = 0.2, seed: int = 42) -> "LocalClassifier":
+        """
+        Fit on (texts, stars). A stratified hold-out split measures accuracy and
+        how often the model is confident; the final model is then refit on all rows.
+        """
+        from sklearn.calibration import CalibratedClassifierCV
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.model_selection import train_test_split
+        from sklearn.pipeline import make_pipeline
+        from sklearn.svm import LinearSVC
+
+        texts = [str(t) for t in texts]
+        stars = np.asarray(stars, dtype=int)
+
+        def build():
+            return make_pipeline(
+                TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True, max_features=200_000),
+                CalibratedClassifierCV(LinearSVC(C=0.5), method="sigmoid", cv=3),
+            )
+
+        started = time.perf_counter()
+        x_train, x_test, y_train, y_test = train_test_split(
+            texts, stars, test_size=holdout, random_state=seed, stratify=stars
+        )
+        probe = cls(build().fit(x_train, y_train), {})
+        pred, conf = probe.predict(x_test)
+        confident = conf >= LOCAL_CONFIDENCE_THRESHOLD
+        meta = {
+            "fingerprint": data_fingerprint(texts, stars.tolist()),
+            "trained_rows": len(texts),
+            "holdout_rows": len(x_test),
+            "holdout_accuracy": float((pred == y_test).mean()),
+            "holdout_coverage": float(confident.mean()),
+            "holdout_confident_accuracy": float((pred == y_test)[confident].mean()) if confident.any() else None,
+            "threshold": LOCAL_CONFIDENCE_THRESHOLD,
+        }
+        model = cls(build().fit(texts, stars), meta)
+        meta["train_seconds"] = round(time.perf_counter() - started, 2)
+        return model
+
+    def predict(self, texts):
+        """Return (stars, confidence) arrays for a list of texts."""
+        proba = self.pipeline.predict_proba([str(t) for t in texts])
+        best = proba.argmax(axis=1)
+        return self.pipeline.classes_[best].astype(int), proba[np.arange(len(best)), best]
+
+    def predict_one(self, text: str):
+        """Return (stars, confidence) for one review."""
+        stars, conf = self.predict([text])
+        return int(stars[0]), float(conf[0])
+
+    def save(self, path: str = LOCAL_MODEL_PATH):
+        import joblib
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({"pipeline": self.pipeline, "meta": self.meta}, path)
+
+    @classmethod
+    def load(cls, path: str = LOCAL_MODEL_PATH) -> "LocalClassifier":
+        import joblib
+
+        blob = joblib.load(path)
+        return cls(blob["pipeline"], blob["meta"])
+
+
+def get_classifier(path: str = LOCAL_MODEL_PATH):
+    """
+    The model saved at path, loaded once per process. Returns None (and says
+    so once) if there is no model file or it cannot be loaded.
+    """
+    if path not in _LOADED:
+        model = None
+        if os.path.exists(path):
+            try:
+                model = LocalClassifier.load(path)
+                print(f"Loaded local classifier '{path}' (hold-out accuracy {model.meta.get('holdout_accuracy')})")
+            except Exception as e:
+                print(f"Failed to load local classifier '{path}':", e)
+        else:
+            print(f"No local classifier at '{path}'; train one with: python local_classifier.py")
+        _LOADED[path] = model
+    return _LOADED[path]
+
+
+def train_or_load(texts, stars, path: str = LOCAL_MODEL_PATH) -> LocalClassifier:
+    """Reuse the model at path if it was trained on exactly these rows, else train and save one."""
+    fingerprint = data_fingerprint([str(t) for t in texts], [int(s) for s in stars])
+    if os.path.exists(path):
+        try:
+            model = LocalClassifier.load(path)
+            if model.meta.get("fingerprint") == fingerprint:
+                _LOADED[path] = model
+                return model
+        except Exception as e:
+            print(f"Ignoring unreadable local classifier '{path}':", e)
+    model = LocalClassifier.train(texts, stars)
+    model.save(path)
+    _LOADED[path] = model
+    print(f"Trained local classifier on {len(texts)} rows in {model.meta['train_seconds']}s -> {path}")
+    return model
+
+
+if __name__ == "__main__":
+    # Train on the labelled Task 1 dataset (data/yelp_reviews.csv) and save for the API.
+    from task1_notebook_script import load_local_dataset
+    from metrics import star_array
+
+    df = load_local_dataset()
+    if "true_stars" not in df.columns:
+        raise SystemExit("The dataset has no star labels to train on.")
+    labels = star_array(df["true_stars"].tolist())
+    keep = labels > 0
+    if keep.sum() < LOCAL_MIN_TRAIN_ROWS:
+        raise SystemExit(f"Need at least {LOCAL_MIN_TRAIN_ROWS} labelled rows, found {int(keep.sum())}.")
+    model = train_or_load(df["review_text"][keep].astype(str).tolist(), labels[keep].tolist())
+    print({k: v for k, v in model.meta.items() if k != "fingerprint"})
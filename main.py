@@ -1,197 +1,108 @@
 # main.py
 import os
-import re
+import io
+import csv
 import json
-import ast
-import sqlite3
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from typing import Optional
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import your Gemini-capable LLM client and the admin prompt template
 # Ensure these files exist: llm_client2.py and prompts.py
-from llm_client2 import generate_text  # expects generate_text(prompt, ...)
-from prompts import ADMIN_FULLJSON_PROMPT
+from llm_client2 import agenerate_text, astream_text  # async wrappers around generate_text / stream_text
+from prompts import ADMIN_FULLJSON_PROMPT, ADMIN_STREAM_PROMPT, ADMIN_TEXT_PROMPT
+from llm_parsing import parse_llm_output, PARSE_STRATEGY_COUNTS, StreamingFieldExtractor
+from schemas import (
+    ADMIN_RESPONSE_SCHEMA, ADMIN_STREAM_RESPONSE_SCHEMA, ADMIN_TEXT_RESPONSE_SCHEMA, AdminAnalysis, coerce_stars,
+    review_fields,
+)
+import llm_cache
+from storage import connect, get_connection, get_writer, init_db, insert_submission_row, complete_submission_row
+from jobs import JobQueue
+from analytics import compute_analytics, TIME_BUCKETS
+from search import RANK_WINDOW, column_query, fts_query, search_submissions
+from batch_ingest import ingest_jsonl, BATCH_LIMITER, BATCH_STATS
+from singleflight import SingleFlight, review_key
+from local_classifier import LOCAL_CONFIDENCE_THRESHOLD, get_classifier
+from near_duplicates import NEAR_DUP_INDEX, NEAR_DUP_THRESHOLD, find_near_duplicates, normalize
 
 # -------------------------
 # Configuration
 # -------------------------
-DATA_DIR = "data"
-os.makedirs(DATA_DIR, exist_ok=True)
-DB_PATH = os.path.join(DATA_DIR, "submissions.db")
-
-# Initialize DB (sqlite)
-def _init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS submissions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        rating INTEGER,
-        review TEXT,
-        ai_response TEXT,
-        admin_json TEXT,
-        created_at TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
-
-_init_db()
-
-# -------------------------
-# Utility: robust cleaning & parsing
-# -------------------------
-def _clean_llm_output(text: str) -> str:
-    """
-    Clean output so JSON extraction is easier:
-    - Normalize line endings
-    - Remove code fences (``` or ```json)
-    - Strip BOM/invisible chars and leading/trailing whitespace
-    - Trim to the first balanced JSON block if one exists
-    - Remove stray whitespace/newlines immediately before quoted keys
-    - Normalize single quotes to double quotes in simple cases
-    """
-    if not text:
-        return ""
-
-    # normalize line endings and remove BOM
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = text.lstrip("\ufeff").strip()
-
-    # remove code fences
-    text = re.sub(r"```(?:json)?\s*", "", text)
-    text = re.sub(r"\s*```\s*", "", text)
-
-    # find the first JSON object and the last closing brace
-    first_brace = text.find("{")
-    last_brace = text.rfind("}")
-    if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
-        # trim to largest brace-delimited block (this drops any leading prose)
-        text = text[first_brace:last_brace+1]
-    else:
-        # collapse repeated whitespace if no braces found
-        text = re.sub(r'\s+', ' ', text).strip()
-
-    # remove stray newlines immediately before quoted keys, e.g. '\n "predicted_stars"'
-    text = re.sub(r'[\n\t ]+(?=["\'])', '', text)
-
-    # if there are no double quotes but single quotes and braces exist, try a safe replace
-    if '"' not in text and ("'" in text and "{" in text and "}" in text):
-        try:
-            text = text.replace("'", '"')
-        except Exception:
-            pass
-
-    return text.strip()
-
-
-def _safe_json_extract(text: str) -> dict:
-    """
-    Robustly attempt to extract a JSON-like dict from noisy LLM text.
-    Strategies (in order):
-     1) Clean and try json.loads(cleaned)
-     2) Extract balanced {...} blocks (largest-first), try json.loads then ast.literal_eval
-     3) Try normalized cleaned text with single->double quote swap
-     4) As last resort, use regex heuristics to find expected fields
-    Returns an empty dict on failure.
-    """
-    if not text or not isinstance(text, str):
-        return {}
-
-    # 1) clean and direct parse
-    cleaned = _clean_llm_output(text)
-    try:
-        parsed = json.loads(cleaned)
-        if isinstance(parsed, dict):
-            return parsed
-    except Exception:
-        pass
-
-    # 2) find balanced {...} blocks (including nested)
-    # This regex attempts to capture JSON-like balanced blocks
-    blocks = re.findall(r'\{(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*\}', text, re.DOTALL)
-    if blocks:
-        # try largest block first
-        for block in sorted(blocks, key=len, reverse=True):
-            b = block.strip()
-            # try JSON
-            try:
-                parsed = json.loads(b)
-                if isinstance(parsed, dict):
-                    return parsed
-            except Exception:
-                pass
-
-            # try ast.literal_eval for single-quoted dicts
-            try:
-                parsed = ast.literal_eval(b)
-                if isinstance(parsed, dict):
-                    return parsed
-            except Exception:
-                pass
-
-            # try a light normalization and parse
-            try:
-                normalized = b.replace("'", '"')
-                parsed = json.loads(normalized)
-                if isinstance(parsed, dict):
-                    return parsed
-            except Exception:
-                pass
-
-    # 3) try normalized cleaned text
-    try:
-        candidate = cleaned.replace("'", '"')
-        parsed = json.loads(candidate)
-        if isinstance(parsed, dict):
-            return parsed
-    except Exception:
-        pass
-
-    # 4) regex heuristics as a last resort to populate expected fields
-    result = {}
-
-    # predicted_stars
-    m = re.search(r'["\']?predicted[_\s-]?stars["\']?\s*[:=]\s*([1-5])', text, re.IGNORECASE)
-    if m:
-        try:
-            result["predicted_stars"] = int(m.group(1))
-        except Exception:
-            pass
-
-    # explanation (short capture)
-    m = re.search(r'explanation["\']?\s*[:=-]\s*["\']?(.{5,400}?)["\']?(?=[,\}\n]|$)', text, re.IGNORECASE)
-    if m:
-        result["explanation"] = m.group(1).strip()
-
-    # ai_summary
-    m = re.search(r'ai_summary["\']?\s*[:=-]\s*["\']?(.{5,300}?)["\']?(?=[,\}\n]|$)', text, re.IGNORECASE)
-    if m:
-        result["ai_summary"] = m.group(1).strip()
-
-    # ai_recommendations (try to capture bracketed list)
-    m = re.search(r'ai_recommendations["\']?\s*[:=-]\s*(\[[^\]]*\])', text, re.IGNORECASE | re.DOTALL)
-    if m:
-        arrtxt = m.group(1)
-        try:
-            result["ai_recommendations"] = json.loads(arrtxt)
-        except Exception:
-            items = re.split(r'[\n;,\|]+', arrtxt.strip("[] "))
-            result["ai_recommendations"] = [it.strip(" \"'") for it in items if it.strip()]
-
-    # ai_reply
-    m = re.search(r'ai_reply["\']?\s*[:=-]\s*["\']?(.{5,500}?)["\']?(?=[,\}\n]|$)', text, re.IGNORECASE)
-    if m:
-        result["ai_reply"] = m.group(1).strip()
-
-    return result
+# Page size limits for GET /submissions
+SUBMISSIONS_DEFAULT_LIMIT = int(os.environ.get("SUBMISSIONS_DEFAULT_LIMIT", "100"))
+SUBMISSIONS_MAX_LIMIT = int(os.environ.get("SUBMISSIONS_MAX_LIMIT", "1000"))
+# Page size limits for GET /search (ranked, offset-paginated)
+SEARCH_DEFAULT_LIMIT = int(os.environ.get("SEARCH_DEFAULT_LIMIT", "20"))
+SEARCH_MAX_LIMIT = int(os.environ.get("SEARCH_MAX_LIMIT", "100"))
+SEARCH_MAX_OFFSET = int(os.environ.get("SEARCH_MAX_OFFSET", "10000"))
+# only the newest RANK_WINDOW matches are ranked, so deeper offsets are always empty
+if RANK_WINDOW > 0:
+    SEARCH_MAX_OFFSET = min(SEARCH_MAX_OFFSET, RANK_WINDOW - 1)
+# Rows fetched from SQLite per chunk when streaming an export
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "1000"))
+# Ask Gemini for schema-constrained JSON (generationConfig.responseSchema)
+LLM_STRUCTURED_OUTPUT = os.environ.get("LLM_STRUCTURED_OUTPUT", "1") == "1"
+# Default /submit mode when the request does not pass ?mode=: "sync" waits for the
+# LLM, "async" stores the review as pending and answers 202 immediately
+SUBMIT_MODE = os.environ.get("SUBMIT_MODE", "sync")
+# Upper bound for GET /submissions/{id}?wait= (long-poll), and the DB poll interval
+# used when the job is not running in this process
+SUBMISSION_MAX_WAIT_SECONDS = float(os.environ.get("SUBMISSION_MAX_WAIT_SECONDS", "30"))
+SUBMISSION_POLL_INTERVAL = float(os.environ.get("SUBMISSION_POLL_INTERVAL", "0.5"))
+# Opt-in: take predicted_stars from the local classifier (local_classifier.py)
+# when it is confident, and skip the star prediction in the LLM call.
+# SUBMIT_LOCAL_CASCADE_TEXT decides what happens to the other fields then:
+# - "llm" (default): one short LLM call writes only the summary, recommendations
+#   and reply (ADMIN_TEXT_PROMPT)
+# - "placeholder": no LLM call at all; the customer gets the generic AdminAnalysis
+#   placeholders ("Thank you for your feedback.", "No summary returned by model.")
+SUBMIT_LOCAL_CASCADE = os.environ.get("SUBMIT_LOCAL_CASCADE", "0") == "1"
+SUBMIT_LOCAL_CASCADE_TEXT = os.environ.get("SUBMIT_LOCAL_CASCADE_TEXT", "llm")
+# Threads for CPU-bound work done before the LLM call (local model inference,
+# near-duplicate lookups), so it does not block the event loop
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+# Opt-in: look up already analysed reviews with the same rating and at least
+# NEAR_DUP_THRESHOLD similar text (near_duplicates.py). The same text (after
+# normalisation) reuses the stored stars, summary and recommendations; a
+# near-identical one only seeds predicted_stars. Either way a text-only call
+# writes the rest, and the reply is always written for this customer.
+SUBMIT_NEAR_DUP_REUSE = os.environ.get("SUBMIT_NEAR_DUP_REUSE", "0") == "1"
+if SUBMIT_NEAR_DUP_REUSE and not NEAR_DUP_INDEX:
+    print("[warning] SUBMIT_NEAR_DUP_REUSE=1 with NEAR_DUP_INDEX=0: new reviews are not indexed, lookups only see older ones")
+
+# Initialize DB (sqlite, WAL mode, per-thread connections — see storage.py)
+init_db()
 
 # -------------------------
 # FastAPI app init
 # -------------------------
-app = FastAPI(title="Review Intelligence Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SUBMIT_LOCAL_CASCADE:
+        get_classifier()  # load the model once, before the first request
+    # requeue submissions accepted before the last shutdown but never analysed
+    pending = get_connection().execute(
+        "SELECT id, rating, review FROM submissions WHERE status = 'pending' ORDER BY id"
+    ).fetchall()
+    for sid, rating, review in pending:
+        JOBS.submit(sid, {"rating": rating, "review": review}, key=review_key(review, rating))
+    if pending:
+        print(f"Requeued {len(pending)} pending submissions")
+    yield
+    await JOBS.stop()
+    # commit any writes still sitting in the group-commit queue
+    await get_writer().flush()
+
+
+app = FastAPI(title="Review Intelligence Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -208,145 +119,614 @@ async def root():
 
 
 # -------------------------
-# GET all submissions (admin dashboard)
+# Runtime counters (cache hit/miss etc.)
+# -------------------------
+@app.get("/stats")
+async def get_stats():
+    return {
+        "status": "ok",
+        "llm_cache": llm_cache.get_cache().stats(),
+        "write_batching": get_writer().stats(),
+        "parse_strategies": dict(PARSE_STRATEGY_COUNTS),
+        "jobs": JOBS.stats(),
+        "single_flight": INFLIGHT.stats(),
+        "near_duplicates": dict(NEAR_DUP_STATS, enabled=SUBMIT_NEAR_DUP_REUSE, indexed=NEAR_DUP_INDEX,
+                                threshold=NEAR_DUP_THRESHOLD),
+        "local_cascade": dict(CASCADE_STATS, enabled=SUBMIT_LOCAL_CASCADE, text=SUBMIT_LOCAL_CASCADE_TEXT,
+                              threshold=LOCAL_CONFIDENCE_THRESHOLD),
+        "batch_ingest": dict(BATCH_STATS, rate_limit_waits=BATCH_LIMITER.waits,
+                             rate_limit_waited_seconds=round(BATCH_LIMITER.waited_seconds, 3)),
+    }
+
+
+# -------------------------
+# Aggregated analytics (admin dashboard summary views)
+# -------------------------
+@app.get("/analytics")
+async def get_analytics(
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    bucket: str = "day",
+    top_n: int = 10,
+):
+    """
+    Summary statistics computed in SQLite (see analytics.compute_analytics):
+    rating / predicted distributions, predicted-vs-user confusion, agreement,
+    submissions over time and top recommendations. A few KB regardless of table size.
+    """
+    if bucket not in TIME_BUCKETS:
+        return JSONResponse(status_code=400, content={"status": "error", "message": f"bucket must be one of {sorted(TIME_BUCKETS)}."})
+    top_n = max(1, min(int(top_n), 100))
+    try:
+        result = compute_analytics(get_connection(), created_from, created_to, bucket=bucket, top_n=top_n)
+        return JSONResponse(status_code=200, content={"status": "ok", **result})
+    except Exception as e:
+        print("Error computing analytics:", e)
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+
+
+# -------------------------
+# Full-text search (FTS5 index over review / ai_summary / explanation)
+# -------------------------
+@app.get("/search")
+async def search(
+    q: str,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    offset: int = 0,
+    rating: Optional[int] = None,
+    predicted_stars: Optional[int] = None,
+):
+    """
+    Keyword search, best matches first (bm25).
+    - q: words that must all appear; "quoted text" for a phrase, word* for a prefix
+    - each hit has highlighted review/ai_summary/explanation snippets and a score
+    - pass next_offset back as offset for the next page
+    - optional filters: rating, predicted_stars
+    - truncated: true when there were more than SEARCH_RANK_WINDOW matches and
+      only the newest ones were ranked; refine the query to reach older ones
+    """
+    match = fts_query(q)
+    if not match:
+        return JSONResponse(status_code=400, content={"status": "error", "message": "q must contain at least one word."})
+    limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+    offset = max(0, int(offset))
+    if offset > SEARCH_MAX_OFFSET:
+        return JSONResponse(status_code=400, content={"status": "error", "message": f"offset must be at most {SEARCH_MAX_OFFSET}; refine the query."})
+    try:
+        # one extra hit tells us whether another page exists
+        results, truncated = search_submissions(get_connection(), match, limit + 1, offset,
+                                                rating=rating, predicted_stars=predicted_stars)
+        has_more = len(results) > limit and offset + limit <= SEARCH_MAX_OFFSET
+        return JSONResponse(status_code=200, content={
+            "status": "ok",
+            "query": match,
+            "results": results[:limit],
+            "next_offset": offset + limit if has_more else None,
+            "truncated": truncated,
+        })
+    except Exception as e:
+        print("Error searching submissions:", e)
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+
+
+SUBMISSION_COLUMNS = (
+    "id, rating, review, ai_response, admin_json, created_at, status, error, "
+    "predicted_stars, ai_summary, explanation"
+)
+
+
+def _attach_recommendations(submissions: list):
+    """Add ai_recommendations (from submission_recommendations) to each row dict, in one query."""
+    if not submissions:
+        return
+    by_id = {row["id"]: row for row in submissions}
+    for row in submissions:
+        row["ai_recommendations"] = []
+    placeholders = ", ".join("?" * len(by_id))
+    for sid, rec in get_connection().execute(
+        f"SELECT submission_id, recommendation FROM submission_recommendations "
+        f"WHERE submission_id IN ({placeholders}) ORDER BY submission_id, position",
+        list(by_id),
+    ):
+        by_id[sid]["ai_recommendations"].append(rec)
+
+# -------------------------
+# GET submissions (admin dashboard) — keyset pagination + filters
 # -------------------------
 @app.get("/submissions")
-async def get_submissions():
+async def get_submissions(
+    limit: int = SUBMISSIONS_DEFAULT_LIMIT,
+    cursor: Optional[int] = None,
+    order: str = "desc",
+    rating: Optional[int] = None,
+    predicted_stars: Optional[int] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    min_star_diff: Optional[int] = None,
+):
+    """
+    Return one page of submissions.
+    - order: "desc" (newest first, default) or "asc"
+    - cursor: pass the previous page's next_cursor to continue (keyset on id,
+      so page cost does not depend on how deep into the table we are)
+    - filters: rating, predicted_stars, created_from/created_to (ISO timestamps,
+      inclusive), q (words in the review text, same syntax as /search: "phrase",
+      prefix*; input without words is ignored), status ("pending", "done" or
+      "failed"), min_star_diff (|predicted_stars - rating| at least this much;
+      1 = every mismatch)
+    - predicted_stars and min_star_diff use indexed typed columns (see storage.init_db);
+      with q, the page is read from the FTS5 index in id order and joined by id
+    """
+    order = (order or "desc").lower()
+    if order not in ("asc", "desc"):
+        return JSONResponse(status_code=400, content={"status": "error", "message": "order must be 'asc' or 'desc'."})
+    limit = max(1, min(int(limit), SUBMISSIONS_MAX_LIMIT))
+
+    match = column_query(q, "review") if q else ""
+    # with q, submissions_fts drives the scan (rowid = submissions.id) so the
+    # keyset cursor and ORDER BY are on its rowid
+    key = "submissions_fts.rowid" if match else "submissions.id"
+    where, params = [], []
+    if match:
+        where.append("submissions_fts MATCH ?")
+        params.append(match)
+    if cursor is not None:
+        where.append(f"{key} < ?" if order == "desc" else f"{key} > ?")
+        params.append(cursor)
+    if rating is not None:
+        where.append("submissions.rating = ?")
+        params.append(rating)
+    if predicted_stars is not None:
+        where.append("submissions.predicted_stars = ?")
+        params.append(predicted_stars)
+    if min_star_diff is not None:
+        # same expression as idx_submissions_star_diff, so this is an index range scan
+        where.append("abs(submissions.predicted_stars - submissions.rating) >= ?")
+        params.append(min_star_diff)
+    # created_at is stamped at insert, so it grows with id: each bound becomes an
+    # id bound found with one idx_submissions_created_at probe, and the
+    # created_at test itself (+: not via the index) only checks rows in range.
+    # Otherwise a wide range is read through that index and sorted by id.
+    if created_from:
+        where.append("submissions.id >= (SELECT id FROM submissions WHERE created_at >= ? "
+                     "ORDER BY created_at, id LIMIT 1) AND +submissions.created_at >= ?")
+        params += [created_from, created_from]
+    if created_to:
+        where.append("submissions.id <= (SELECT id FROM submissions WHERE created_at <= ? "
+                     "ORDER BY created_at DESC, id DESC LIMIT 1) AND +submissions.created_at <= ?")
+        params += [created_to, created_to]
+    if status:
+        where.append("submissions.status = ?")
+        params.append(status)
+
+    columns = ", ".join(f"submissions.{name.strip()}" for name in SUBMISSION_COLUMNS.split(","))
+    sql = f"SELECT {columns} FROM submissions"
+    if match:
+        sql = f"SELECT {columns} FROM submissions_fts JOIN submissions ON submissions.id = submissions_fts.rowid"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # fetch one extra row to know whether another page exists
+    sql += f" ORDER BY {key} {order.upper()} LIMIT ?"
+    params.append(limit + 1)
+
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT id, rating, review, ai_response, admin_json, created_at FROM submissions ORDER BY id DESC")
+        cur = get_connection().execute(sql, params)
         rows = cur.fetchall()
         cols = [column[0] for column in cur.description]
-        conn.close()
 
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         submissions = [dict(zip(cols, row)) for row in rows]
-        return JSONResponse(status_code=200, content={"status": "ok", "submissions": submissions})
+        _attach_recommendations(submissions)
+        next_cursor = submissions[-1]["id"] if has_more and submissions else None
+        return JSONResponse(status_code=200, content={
+            "status": "ok",
+            "submissions": submissions,
+            "next_cursor": next_cursor,
+        })
     except Exception as e:
         print("Error loading submissions:", e)
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 
 # -------------------------
-# Submit endpoint: main logic
+# Streaming export (NDJSON / CSV) for bulk consumers
 # -------------------------
-@app.post("/submit")
-async def submit_review(request: Request):
+EXPORT_COLUMNS = [
+    "id", "rating", "review", "ai_response", "admin_json", "created_at", "status",
+    "predicted_stars", "ai_summary", "explanation",
+]
+
+def _iter_export_rows(since_id: int):
+    """
+    Yield submission rows (oldest first) with id > since_id, reading the
+    cursor EXPORT_CHUNK_SIZE rows at a time so memory stays constant.
+    """
+    # dedicated connection: Starlette may resume this generator on a different
+    # threadpool thread for each chunk (a default connection then raises
+    # sqlite3.ProgrammingError mid-stream), and it must not tie up a request
+    # thread's connection
+    conn = connect(check_same_thread=False)
     try:
-        # read raw body and log
-        raw_body = await request.body()
-        body_text = raw_body.decode("utf-8") if raw_body else ""
-        print("---- RAW BODY RECEIVED ----")
-        print(body_text)
-        print("---------------------------")
-
-        # parse JSON payload
-        try:
-            data = await request.json()
-        except Exception:
-            data = None
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM submissions WHERE id > ? ORDER BY id ASC",
+            (since_id,),
+        )
+        while True:
+            chunk = cur.fetchmany(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        conn.close()
 
-        if not data:
-            return JSONResponse(status_code=400, content={"status": "error", "message": "Invalid request. Must send JSON with 'rating' and 'review'."})
 
-        user_review = data.get("review")
-        rating_raw = data.get("rating")
+def _ndjson_export(since_id: int):
+    for chunk in _iter_export_rows(since_id):
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in chunk)
 
-        try:
-            user_rating = int(rating_raw)
-        except Exception:
-            user_rating = None
 
-        if not user_review or not isinstance(user_rating, int) or not (1 <= user_rating <= 5):
-            return JSONResponse(status_code=400, content={"status": "error", "message": "Invalid rating or review."})
+def _csv_export(since_id: int):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in _iter_export_rows(since_id):
+        writer.writerows(chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+    # header only when there were no rows
+    if buf.tell():
+        yield buf.getvalue()
+
+
+@app.get("/submissions/export")
+def export_submissions(format: str = "ndjson", since_id: int = 0):
+    """
+    Stream every submission with id > since_id as NDJSON (default) or CSV.
+    Rows are sent as they are read; pass the largest id already received as
+    since_id to pull only new rows.
+    """
+    fmt = (format or "ndjson").lower()
+    if fmt == "ndjson":
+        return StreamingResponse(_ndjson_export(since_id), media_type="application/x-ndjson")
+    if fmt == "csv":
+        return StreamingResponse(
+            _csv_export(since_id),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="submissions.csv"'},
+        )
+    return JSONResponse(status_code=400, content={"status": "error", "message": "format must be 'ndjson' or 'csv'."})
 
-        # build prompt using ADMIN_FULLJSON_PROMPT from prompts.py
-        prompt = ADMIN_FULLJSON_PROMPT.format(user_review=user_review, user_rating=user_rating)
-        print("PROMPT SENT (clipped):", prompt[:1000])
 
-        # call the LLM (uses llm_client2.generate_text)
+# -------------------------
+# Single submission lookup (status polling / long-poll)
+# -------------------------
+def _load_submission(submission_id: int):
+    cur = get_connection().execute(f"SELECT {SUBMISSION_COLUMNS} FROM submissions WHERE id = ?", (submission_id,))
+    row = cur.fetchone()
+    return dict(zip([column[0] for column in cur.description], row)) if row else None
+
+
+@app.get("/submissions/{submission_id}")
+async def get_submission(submission_id: int, wait: float = 0):
+    """
+    Return one submission and its processing status ("pending", "done" or "failed").
+    - wait: long-poll up to this many seconds (capped at SUBMISSION_MAX_WAIT_SECONDS)
+      while the submission is still pending
+    - once done, the analysis fields are returned in the same shape as a synchronous /submit
+    """
+    row = _load_submission(submission_id)
+    if row is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Submission not found."})
+
+    wait = max(0.0, min(float(wait), SUBMISSION_MAX_WAIT_SECONDS))
+    if row["status"] == "pending" and wait > 0:
+        if JOBS.is_tracked(submission_id):
+            await JOBS.wait(submission_id, wait)
+        else:
+            # queued by another process: fall back to polling the row
+            deadline = asyncio.get_running_loop().time() + wait
+            while row["status"] == "pending" and asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(SUBMISSION_POLL_INTERVAL)
+                row = _load_submission(submission_id)
+        row = _load_submission(submission_id)
+
+    content = {
+        "status": "ok",
+        "id": row["id"],
+        "job_status": row["status"],
+        "rating": row["rating"],
+        "review": row["review"],
+        "created_at": row["created_at"],
+    }
+    if row["status"] == "done":
         try:
-            llm_output = generate_text(prompt, temperature=0.0)
-        except Exception as e:
-            print("LLM call exception:", e)
-            return JSONResponse(status_code=502, content={"status": "error", "message": f"LLM failure: {str(e)}"})
+            admin_obj = json.loads(row["admin_json"] or "{}")
+        except Exception:
+            admin_obj = {}
+        analysis = AdminAnalysis.from_dict(admin_obj, default_stars=row["rating"])
+        content.update(analysis.to_dict(), ai_reply=row["ai_response"] or analysis.ai_reply, admin_json=admin_obj)
+    elif row["status"] == "failed":
+        content["error"] = row["error"]
+    return JSONResponse(status_code=200, content=content)
 
-        print("---- RAW LLM OUTPUT ----")
-        print(llm_output)
-        print("------------------------")
 
-        # robust parsing without raising unexpected exceptions
+# -------------------------
+# Review analysis (shared by synchronous /submit and the background workers)
+# -------------------------
+INFLIGHT = SingleFlight()
+CASCADE_STATS = Counter()
+NEAR_DUP_STATS = Counter()
+ANALYSIS_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, ANALYSIS_WORKERS), thread_name_prefix="analysis")
+
+
+def _near_duplicate_lookup(user_review: str, user_rating: int):
+    """Best near-duplicate as (id, similarity, exact, admin_obj), or None. Runs on ANALYSIS_EXECUTOR."""
+    conn = get_connection()
+    matches = find_near_duplicates(conn, user_review, rating=user_rating)
+    if not matches:
+        return None
+    sid, similarity = matches[0]
+    review, admin_json = conn.execute("SELECT review, admin_json FROM submissions WHERE id = ?", (sid,)).fetchone()
+    admin_obj = json.loads(admin_json or "{}")
+    if not isinstance(admin_obj, dict):
         admin_obj = {}
+    return sid, similarity, normalize(review) == normalize(user_review), admin_obj
+
+
+async def near_duplicate_match(user_review: str, user_rating: int):
+    """
+    Seed fields for text_only_analysis from the most similar stored 'done'
+    submission with the same rating, if at least NEAR_DUP_THRESHOLD similar,
+    else None. The seed records reused_from and similarity.
+    - exact (same normalised text): predicted_stars, explanation, ai_summary and
+      ai_recommendations; never ai_reply, which was written to another customer
+    - otherwise only predicted_stars and explanation, since a small edit such as
+      an added "not" can flip the meaning of the summary and recommendations
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        match = await loop.run_in_executor(ANALYSIS_EXECUTOR, _near_duplicate_lookup, user_review, user_rating)
+    except Exception as e:
+        print("Near-duplicate lookup failed:", e)
+        NEAR_DUP_STATS["errors"] += 1
+        return None
+    if match is None:
+        NEAR_DUP_STATS["misses"] += 1
+        return None
+    sid, similarity, exact, admin_obj = match
+    keep = ("predicted_stars", "explanation") + (("ai_summary", "ai_recommendations") if exact else ())
+    seed = {name: admin_obj[name] for name in keep if name in admin_obj}
+    seed.update(source="near_duplicate", reused_from=sid, similarity=round(similarity, 4))
+    NEAR_DUP_STATS["reused" if exact else "seeded"] += 1
+    return seed
+
+
+async def local_prediction(user_review: str):
+    """
+    (stars, confidence) from the local classifier if it is loaded and at least
+    LOCAL_CONFIDENCE_THRESHOLD confident, else None (escalate to the LLM).
+    Inference runs on ANALYSIS_EXECUTOR.
+    """
+    model = get_classifier()
+    if model is None:
+        return None
+    loop = asyncio.get_running_loop()
+    stars, confidence = await loop.run_in_executor(ANALYSIS_EXECUTOR, model.predict_one, user_review)
+    if confidence < LOCAL_CONFIDENCE_THRESHOLD:
+        CASCADE_STATS["escalated"] += 1
+        return None
+    CASCADE_STATS["local"] += 1
+    return stars, confidence
+
+
+def local_admin_obj(stars: int, confidence: float) -> dict:
+    return {
+        "predicted_stars": stars,
+        "explanation": f"Predicted by the local classifier (confidence {confidence:.2f}).",
+        "source": "local",
+        "confidence": round(confidence, 4),
+    }
+
+
+async def text_only_analysis(user_review: str, user_rating: int, seed: dict, limiter=None):
+    """
+    (AdminAnalysis, admin_obj) for a review whose predicted_stars is already
+    known (seed: local classifier or near-duplicate fields): the LLM writes
+    only ai_summary, ai_recommendations and ai_reply.
+    """
+    stars = coerce_stars(seed.get("predicted_stars")) or user_rating
+    prompt = ADMIN_TEXT_PROMPT.format(user_review=user_review, user_rating=user_rating, predicted_stars=stars)
+    llm_output = await agenerate_text(
+        prompt,
+        max_output_tokens=256,
+        temperature=0.0,
+        response_schema=ADMIN_TEXT_RESPONSE_SCHEMA if LLM_STRUCTURED_OUTPUT else None,
+        rate_limiter=limiter,
+    )
+    parsed = parse_llm_output(llm_output)
+    admin_obj = {name: parsed.data[name] for name in ("ai_summary", "ai_recommendations", "ai_reply")
+                 if name in parsed.data}
+    admin_obj.update(seed)
+    return AdminAnalysis.from_dict(admin_obj, default_stars=user_rating), admin_obj
+
+
+async def analyze_review(user_review: str, user_rating: int, limiter=None, llm_call=None):
+    """
+    Run the admin prompt for one review and return (AdminAnalysis, admin_obj).
+    Raises if the LLM call itself fails; parsing never raises.
+    - with SUBMIT_NEAR_DUP_REUSE=1, a stored analysis of the same review
+      (normalised text) seeds stars, summary and recommendations, a
+      near-identical one only predicted_stars, for a text-only call that writes
+      a fresh reply (see near_duplicate_match)
+    - with SUBMIT_LOCAL_CASCADE=1, a confident local prediction replaces the
+      full LLM call: a text-only call (text_only_analysis) takes its place, or
+      nothing with SUBMIT_LOCAL_CASCADE_TEXT=placeholder
+    - concurrent calls for the same review and rating (see singleflight.review_key)
+      share one LLM call; each caller still stores its own row
+    - limiter (a RateLimiter, e.g. the batch quota) is charged only if the
+      request actually reaches Gemini, not for cache hits or the shortcuts above
+    - llm_call: coroutine function used instead of the default LLM call if this
+      caller ends up making it (/submit/stream passes its streaming call)
+    """
+    seed = None
+    if SUBMIT_NEAR_DUP_REUSE:
+        seed = await near_duplicate_match(user_review, user_rating)
+    if seed is None and SUBMIT_LOCAL_CASCADE:
+        local = await local_prediction(user_review)
+        if local is not None:
+            seed = local_admin_obj(*local)
+            if SUBMIT_LOCAL_CASCADE_TEXT == "placeholder":
+                return AdminAnalysis.from_dict(seed, default_stars=user_rating), seed
+    if seed is not None:
+        llm_call = partial(text_only_analysis, user_review, user_rating, seed, limiter)
+    return await INFLIGHT.do(
+        review_key(user_review, user_rating),
+        llm_call or (lambda: _analyze_review(user_review, user_rating, limiter)),
+    )
+
+
+async def _analyze_review(user_review: str, user_rating: int, limiter=None):
+    # build prompt using ADMIN_FULLJSON_PROMPT from prompts.py
+    prompt = ADMIN_FULLJSON_PROMPT.format(user_review=user_review, user_rating=user_rating)
+    print("PROMPT SENT (clipped):", prompt[:1000])
+
+    # call the LLM (llm_client2.agenerate_text runs the blocking call off the event loop)
+    llm_output = await agenerate_text(
+        prompt,
+        temperature=0.0,
+        response_schema=ADMIN_RESPONSE_SCHEMA if LLM_STRUCTURED_OUTPUT else None,
+        rate_limiter=limiter,
+    )
+
+    return analysis_from_output(llm_output, user_rating)
+
+
+def analysis_from_output(llm_output: str, user_rating: int):
+    """Parse raw LLM output into (AdminAnalysis, admin_obj). Never raises."""
+    print("---- RAW LLM OUTPUT ----")
+    print(llm_output)
+    print("------------------------")
+
+    # robust parsing without raising unexpected exceptions (single staged pass, see llm_parsing);
+    # structured-output responses hit the "direct" fast path
+    parsed = parse_llm_output(llm_output)
+    admin_obj = parsed.data
+
+    # validate once into typed fields; missing values get human-friendly fallbacks and
+    # predicted_stars falls back to a bare 1-5 digit in the output, else to user_rating
+    analysis = AdminAnalysis.from_dict(admin_obj, default_stars=parsed.fallback_stars or user_rating)
+    return analysis, admin_obj
+
+
+async def insert_submission(user_rating: int, user_review: str, analysis: AdminAnalysis, admin_obj: dict) -> int:
+    """
+    Persist an analysed review and return its id. ai_response stores the friendly
+    reply shown to the user; admin_json stores the raw parsed object, and its
+    fields are copied into the typed columns in the same transaction.
+    (group-committed with other concurrent submissions; returns once durable)
+    """
+    created_at = datetime.now(timezone.utc).isoformat()
+    return await get_writer().call(lambda conn: insert_submission_row(
+        conn, user_rating, user_review, created_at, ai_response=analysis.ai_reply, admin_obj=admin_obj,
+    ))
+
+
+async def process_submission(sid: int, payload: dict):
+    """Background job: analyse a pending submission and store the result (or the failure)."""
+    writer = get_writer()
+    try:
+        analysis, admin_obj = await analyze_review(payload["review"], payload["rating"])
+    except Exception as e:
+        print(f"LLM call exception (submission {sid}):", e)
+        await writer.execute(
+            "UPDATE submissions SET status = 'failed', error = ? WHERE id = ?",
+            (f"LLM failure: {str(e)}", sid),
+        )
+        raise
+    await writer.call(lambda conn: complete_submission_row(conn, sid, analysis.ai_reply, admin_obj))
+
+
+JOBS = JobQueue(process_submission)
+
+
+async def read_review_payload(request: Request):
+    """
+    Read and validate a {"rating", "review"} JSON body.
+    Returns (user_review, user_rating, None), or (None, None, error_response).
+    """
+    # read raw body and log
+    raw_body = await request.body()
+    body_text = raw_body.decode("utf-8") if raw_body else ""
+    print("---- RAW BODY RECEIVED ----")
+    print(body_text)
+    print("---------------------------")
+
+    # parse JSON payload
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+
+    if not data:
+        return None, None, JSONResponse(status_code=400, content={"status": "error", "message": "Invalid request. Must send JSON with 'rating' and 'review'."})
+
+    user_review, user_rating = review_fields(data)
+    if user_review is None:
+        return None, None, JSONResponse(status_code=400, content={"status": "error", "message": "Invalid rating or review."})
+    return user_review, user_rating, None
+
+
+# -------------------------
+# Submit endpoint: main logic
+# -------------------------
+@app.post("/submit")
+async def submit_review(request: Request, mode: Optional[str] = None):
+    """
+    Analyse a review and store it.
+    - mode=sync (default, see SUBMIT_MODE): wait for the LLM and return the analysis
+    - mode=async: store the review as pending, queue it for the background
+      workers and return 202 at once; poll GET /submissions/{id}?wait=N for the result
+    """
+    mode = (mode or SUBMIT_MODE).lower()
+    if mode not in ("sync", "async"):
+        return JSONResponse(status_code=400, content={"status": "error", "message": "mode must be 'sync' or 'async'."})
+    try:
+        user_review, user_rating, error = await read_review_payload(request)
+        if error is not None:
+            return error
+
+        if mode == "async":
+            # store first so the review survives a restart; the worker fills in the analysis
+            try:
+                created_at = datetime.now(timezone.utc).isoformat()
+                sid = await get_writer().call(lambda conn: insert_submission_row(
+                    conn, user_rating, user_review, created_at, status="pending",
+                ))
+            except Exception as e:
+                print("DB write failed:", e)
+                return JSONResponse(status_code=500, content={"status": "error", "message": "Failed to save submission."})
+            JOBS.submit(sid, {"rating": user_rating, "review": user_review}, key=review_key(user_review, user_rating))
+            return JSONResponse(status_code=202, content={
+                "status": "accepted",
+                "id": sid,
+                "job_status": "pending",
+                "poll_url": f"/submissions/{sid}",
+            })
+
         try:
-            cleaned_output = _clean_llm_output(llm_output)
-            admin_obj = _safe_json_extract(cleaned_output) or _safe_json_extract(llm_output)
-            if not admin_obj:
-                # try ast.literal_eval on any {...} block as another attempt
-                blocks = re.findall(r'\{(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*\}', llm_output, re.DOTALL)
-                for b in sorted(blocks, key=len, reverse=True):
-                    try:
-                        candidate = ast.literal_eval(b)
-                        if isinstance(candidate, dict) and candidate:
-                            admin_obj = candidate
-                            break
-                    except Exception:
-                        continue
+            analysis, admin_obj = await analyze_review(user_review, user_rating)
         except Exception as e:
-            print("Parsing helper unexpected exception (ignored):", e)
-            admin_obj = {}
-
-        # fallback empty dict if nothing parsed
-        if not isinstance(admin_obj, dict):
-            admin_obj = {}
+            print("LLM call exception:", e)
+            return JSONResponse(status_code=502, content={"status": "error", "message": f"LLM failure: {str(e)}"})
 
-        # SAFETY: extract fields with defaults
-        predicted_stars = admin_obj.get("predicted_stars")
-        explanation = admin_obj.get("explanation")
-        ai_summary = admin_obj.get("ai_summary")
-        ai_recommendations = admin_obj.get("ai_recommendations")
-        ai_reply = admin_obj.get("ai_reply")
-
-        # If predicted_stars missing, try strict digit extraction, else fallback to user_rating
-        if predicted_stars is None:
-            m = re.search(r'\b([1-5])\b', llm_output)
-            if m:
-                try:
-                    predicted_stars = int(m.group(1))
-                except:
-                    predicted_stars = user_rating
-            else:
-                predicted_stars = user_rating
-
-        # Provide sensible human-friendly fallbacks if fields empty
-        if not explanation:
-            explanation = admin_obj.get("explanation", None) or "No detailed explanation returned by model."
-
-        if not ai_summary:
-            ai_summary = admin_obj.get("ai_summary", None) or "No summary returned by model."
-
-        if not ai_recommendations or (isinstance(ai_recommendations, list) and len(ai_recommendations) == 0):
-            ai_recommendations = admin_obj.get("ai_recommendations", None) or ["No recommendations returned by model."]
-
-        if not ai_reply:
-            ai_reply = admin_obj.get("ai_reply", None) or "Thank you for your feedback."
-
-        # persist to sqlite DB (ai_response stores the friendly reply shown to user; admin_json stores raw object)
+        # persist to sqlite DB
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO submissions (rating, review, ai_response, admin_json, created_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                user_rating,
-                user_review,
-                ai_reply,
-                json.dumps(admin_obj, ensure_ascii=False),
-                datetime.now(timezone.utc).isoformat()
-            ))
-            conn.commit()
-            sid = cur.lastrowid
-            conn.close()
+            sid = await insert_submission(user_rating, user_review, analysis, admin_obj)
         except Exception as e:
             print("DB write failed:", e)
             return JSONResponse(status_code=500, content={"status": "error", "message": "Failed to save submission."})
@@ -355,14 +735,135 @@ async def submit_review(request: Request):
         return JSONResponse(status_code=200, content={
             "status": "ok",
             "id": sid,
-            "predicted_stars": predicted_stars,
-            "explanation": explanation,
-            "ai_summary": ai_summary,
-            "ai_recommendations": ai_recommendations,
-            "ai_reply": ai_reply,
+            **analysis.to_dict(),
             "admin_json": admin_obj
         })
 
     except Exception as e:
         print("CRITICAL ERROR:", e)
-        return JSONResponse(status_code=500, content={"status": "error", "message": f"Server error: {str(e)}"})
\ No newline at end of file
+        return JSONResponse(status_code=500, content={"status": "error", "message": f"Server error: {str(e)}"})
+
+
+# -------------------------
+# Streaming submit endpoint (server-sent events)
+# -------------------------
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_submission(user_review: str, user_rating: int):
+    """
+    SSE body for /submit/stream:
+    - "reply" events carry ai_reply text as the model produces it ({"text": delta});
+      when the analysis does not come from this request's own LLM stream (reused
+      near-duplicate, local prediction, or an identical submission already in
+      flight, see analyze_review) the whole reply is sent as one "reply" event
+    - one final "result" event carries the same payload as a synchronous /submit,
+      after the full output has been parsed and stored (its ai_reply is authoritative)
+    - an "error" event replaces "result" if the LLM call or the DB write fails
+    If the client disconnects mid-stream, nothing is stored for it; an LLM call
+    it started still completes for any request sharing it (and fills the cache).
+    """
+    deltas = asyncio.Queue()
+    end = object()
+
+    async def stream_analysis():
+        # runs only if this request makes the LLM call itself
+        prompt = ADMIN_STREAM_PROMPT.format(user_review=user_review, user_rating=user_rating)
+        reply = StreamingFieldExtractor("ai_reply")
+        chunks = []
+        async for chunk in astream_text(
+            prompt,
+            temperature=0.0,
+            response_schema=ADMIN_STREAM_RESPONSE_SCHEMA if LLM_STRUCTURED_OUTPUT else None,
+        ):
+            chunks.append(chunk)
+            delta = reply.feed(chunk)
+            if delta:
+                deltas.put_nowait(delta)
+        return analysis_from_output("".join(chunks), user_rating)
+
+    task = asyncio.ensure_future(analyze_review(user_review, user_rating, llm_call=stream_analysis))
+    task.add_done_callback(lambda _: deltas.put_nowait(end))
+    streamed = False
+    try:
+        while True:
+            delta = await deltas.get()
+            if delta is end:
+                break
+            streamed = True
+            yield _sse("reply", {"text": delta})
+        try:
+            analysis, admin_obj = task.result()
+        except Exception as e:
+            print("LLM stream exception:", e)
+            yield _sse("error", {"status": "error", "message": f"LLM failure: {str(e)}"})
+            return
+    finally:
+        if not task.done():
+            task.cancel()
+
+    if not streamed:
+        yield _sse("reply", {"text": analysis.ai_reply})
+    try:
+        sid = await insert_submission(user_rating, user_review, analysis, admin_obj)
+    except Exception as e:
+        print("DB write failed:", e)
+        yield _sse("error", {"status": "error", "message": "Failed to save submission."})
+        return
+    yield _sse("result", {"status": "ok", "id": sid, **analysis.to_dict(), "admin_json": admin_obj})
+
+
+@app.post("/submit/stream")
+async def submit_review_stream(request: Request):
+    """
+    Like /submit, but answers with a text/event-stream so the reply can be
+    shown token by token (see _stream_submission for the event format).
+    """
+    user_review, user_rating, error = await read_review_payload(request)
+    if error is not None:
+        return error
+    return StreamingResponse(
+        _stream_submission(user_review, user_rating),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -------------------------
+# Bulk submit endpoint (streamed JSONL in, streamed NDJSON outcomes out)
+# -------------------------
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse without Starlette's disconnect listener: that listener
+    calls receive() and would swallow the request body the generator is still
+    reading. A disconnect mid-upload surfaces as ClientDisconnect from
+    request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+async def _batch_outcomes(request: Request):
+    async for outcome in ingest_jsonl(
+        request.stream(),
+        analyze_review,
+        get_writer(),
+    ):
+        yield json.dumps(outcome, ensure_ascii=False) + "\n"
+
+
+@app.post("/submit/batch")
+async def submit_batch(request: Request):
+    """
+    Bulk import: the body is JSONL/NDJSON, one {"rating", "review"} object per
+    line, and may be streamed (chunked upload). Records are validated as they
+    arrive, analysed by BATCH_WORKERS concurrent LLM calls under the batch rate
+    limit, and stored in bulk transactions. The response is NDJSON with one
+    outcome per input line ("line" is 1-based) as it completes, then a
+    {"status": "done", ...} summary (see batch_ingest.ingest_jsonl).
+    Clients should read the response while uploading; outcomes that are not
+    read yet are buffered.
+    """
+    return DuplexStreamingResponse(_batch_outcomes(request), media_type="application/x-ndjson")
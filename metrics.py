@@ -0,0 +1,119 @@
+# metrics.py (vectorized rating metrics for Task 1 and the evaluation summary)
+import os
+import numpy as np
+import pandas as pd
+
+STAR_LABELS = (1, 2, 3, 4, 5)
+# Bootstrap resamples per confidence interval
+BOOTSTRAP_SAMPLES = int(os.environ.get("BOOTSTRAP_SAMPLES", "2000"))
+BOOTSTRAP_ALPHA = float(os.environ.get("BOOTSTRAP_ALPHA", "0.05"))
+
+_K = len(STAR_LABELS)
+_ROWS, _COLS = np.indices((_K, _K))
+_DISTANCE = np.abs(_ROWS - _COLS)  # |true - predicted| for every confusion cell
+
+
+def star_array(values) -> np.ndarray:
+    """
+    Convert a sequence of star values (ints, numeric strings, None, -1, ...)
+    to an int array in one pass; anything that is not a whole number in 1..5
+    becomes 0 (invalid).
+    """
+    try:
+        numeric = np.asarray(values, dtype=float)  # fast path: already numeric
+    except (TypeError, ValueError):
+        numeric = pd.to_numeric(pd.Series(list(values), dtype=object), errors="coerce").to_numpy(dtype=float)
+    valid = np.isfinite(numeric) & (numeric == np.round(numeric)) & (numeric >= 1) & (numeric <= _K)
+    return np.where(valid, numeric, 0).astype(np.int64)
+
+
+def confusion_matrix(y_true, y_pred) -> np.ndarray:
+    """
+    5x5 counts, rows = true stars, columns = predicted stars. Pairs where
+    either side is invalid (see star_array) are ignored.
+    """
+    t, p = star_array(y_true), star_array(y_pred)
+    keep = (t > 0) & (p > 0)
+    cells = (t[keep] - 1) * _K + (p[keep] - 1)
+    return np.bincount(cells, minlength=_K * _K).reshape(_K, _K)
+
+
+def _rates(cm: np.ndarray) -> dict:
+    """
+    accuracy, within_one and mae for one confusion matrix or a stack of them
+    (shape (..., 5, 5)); NaN where there are no pairs.
+    """
+    n = cm.sum(axis=(-2, -1)).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "accuracy": np.trace(cm, axis1=-2, axis2=-1) / n,
+            "within_one": (cm * (_DISTANCE <= 1)).sum(axis=(-2, -1)) / n,
+            "mae": (cm * _DISTANCE).sum(axis=(-2, -1)) / n,
+        }
+
+
+def _none_if_nan(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def per_class(cm: np.ndarray) -> dict:
+    """{star: {precision, recall, support}} from a confusion matrix (None when undefined)."""
+    diag = np.diag(cm).astype(float)
+    predicted, support = cm.sum(axis=0), cm.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision, recall = diag / predicted, diag / support
+    return {
+        str(star): {
+            "precision": _none_if_nan(precision[i]),
+            "recall": _none_if_nan(recall[i]),
+            "support": int(support[i]),
+        }
+        for i, star in enumerate(STAR_LABELS)
+    }
+
+
+def bootstrap_ci(cm, samples: int = BOOTSTRAP_SAMPLES, alpha: float = BOOTSTRAP_ALPHA, seed: int = 0) -> dict:
+    """
+    Percentile bootstrap intervals {metric: [low, high]} for accuracy,
+    within_one and mae.
+    Every metric here depends only on the confusion matrix, so resampling the
+    n (true, predicted) pairs with replacement is the same as drawing the 25
+    cell counts from a multinomial with the observed cell frequencies. All
+    resamples are drawn in one call, so the cost does not depend on n.
+    """
+    cm = np.asarray(cm, dtype=np.int64)
+    n = int(cm.sum())
+    if n == 0 or samples <= 0:
+        return {name: None for name in ("accuracy", "within_one", "mae")}
+    rng = np.random.default_rng(seed)
+    draws = rng.multinomial(n, cm.ravel() / n, size=samples).reshape(samples, _K, _K)
+    low, high = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    return {
+        name: [float(np.percentile(values, low)), float(np.percentile(values, high))]
+        for name, values in _rates(draws).items()
+    }
+
+
+def rating_metrics(y_true=None, y_pred=None, cm=None, samples: int = BOOTSTRAP_SAMPLES,
+                   alpha: float = BOOTSTRAP_ALPHA, seed: int = 0) -> dict:
+    """
+    All Task 1 metrics from predictions (y_true / y_pred) or from an existing
+    confusion matrix (cm):
+    - compared: pairs where both sides are valid stars
+    - accuracy, within_one, mae (None if nothing was compared)
+    - confusion: 5x5 list, rows = true, columns = predicted
+    - per_class: precision / recall / support per star
+    - ci: bootstrap intervals for accuracy, within_one and mae
+    """
+    cm = confusion_matrix(y_true, y_pred) if cm is None else np.asarray(cm, dtype=np.int64)
+    rates = _rates(cm)
+    return {
+        "compared": int(cm.sum()),
+        "accuracy": _none_if_nan(rates["accuracy"]),
+        "within_one": _none_if_nan(rates["within_one"]),
+        "mae": _none_if_nan(rates["mae"]),
+        "confusion": cm.tolist(),
+        "per_class": per_class(cm),
+        "ci": bootstrap_ci(cm, samples=samples, alpha=alpha, seed=seed),
+        "ci_level": 1 - alpha,
+    }
@@ -0,0 +1,149 @@
+# near_duplicates.py (MinHash/LSH index for finding near-identical reviews)
+import os
+import re
+import zlib
+import hashlib
+import sqlite3
+from collections import Counter
+
+import numpy as np
+
+# -------------------------
+# Configuration
+# -------------------------
+# Character shingle length, after normalisation (see normalize)
+SHINGLE_SIZE = int(os.environ.get("NEAR_DUP_SHINGLE_SIZE", "5"))
+# MinHash signature = LSH_BANDS bands of LSH_ROWS values. Two reviews with Jaccard
+# similarity s share at least one band with probability 1 - (1 - s**rows)**bands:
+# with 8 x 8 that is ~0.98 at s=0.9, ~0.83 at s=0.8 and ~0.04 at s=0.5.
+# Changing these changes every band key: bump the migration to rebuild the index.
+LSH_BANDS = 8
+LSH_ROWS = 8
+# Rows read per matching bucket (newest first), so a bucket shared by thousands
+# of identical short reviews costs the same as a small one
+NEAR_DUP_BUCKET_LIMIT = int(os.environ.get("NEAR_DUP_BUCKET_LIMIT", "20"))
+# Candidates (by number of shared bands) whose exact similarity is checked
+NEAR_DUP_CANDIDATES = int(os.environ.get("NEAR_DUP_CANDIDATES", "10"))
+# Minimum exact Jaccard similarity for a stored review to count as a near-duplicate.
+# Small edits score high ("would definitely come back" vs "... not come back" is
+# 0.92), so callers must not treat a match as meaning the same thing.
+NEAR_DUP_THRESHOLD = float(os.environ.get("NEAR_DUP_THRESHOLD", "0.95"))
+# Keep submission_lsh up to date: index each new review on insert, and at
+# startup (storage.init_db) catch up on the rows stored while this was off.
+# Follows SUBMIT_NEAR_DUP_REUSE (main.py) unless set, so the index costs nothing
+# while lookups are off.
+NEAR_DUP_INDEX = os.environ.get("NEAR_DUP_INDEX", os.environ.get("SUBMIT_NEAR_DUP_REUSE", "0")) == "1"
+# Rows per transaction when catching up
+NEAR_DUP_INDEX_CHUNK = 1000
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, 2**32, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+_B = _rng.integers(0, 2**32, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    """Casefold, drop punctuation and collapse whitespace: "Great food!!" -> "great food"."""
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text or "").casefold()).split())
+
+
+def shingles(text: str) -> set:
+    """crc32 hashes of the character SHINGLE_SIZE-grams of the normalised text."""
+    norm = normalize(text)
+    if len(norm) <= SHINGLE_SIZE:
+        return {zlib.crc32(norm.encode("utf-8"))}
+    return {zlib.crc32(norm[i:i + SHINGLE_SIZE].encode("utf-8")) for i in range(len(norm) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def signature(shingle_set: set) -> np.ndarray:
+    """MinHash signature: min of (a*x + b) mod p over the shingles, for each of the hash functions."""
+    x = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    # a, x < 2**32, so a*x fits in uint64; reduce before adding b
+    return ((_A[:, None] * x[None, :] % _PRIME + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def band_keys(text: str) -> list:
+    """
+    One bucket key per LSH band: the band number in the top byte and a 56-bit
+    hash of the band's signature values below it (positive, fits SQLite INTEGER).
+    """
+    sig = signature(shingles(text))
+    keys = []
+    for band in range(LSH_BANDS):
+        digest = hashlib.blake2b(sig[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=7).digest()
+        keys.append((band << 56) | int.from_bytes(digest, "big"))
+    return keys
+
+
+def index_review(conn: sqlite3.Connection, sid: int, review: str):
+    """
+    Add one submission to the LSH index (same transaction as its INSERT) and
+    advance the watermark: every id up to submission_lsh_state.indexed_through
+    is indexed.
+    """
+    conn.executemany(
+        "INSERT OR IGNORE INTO submission_lsh (bucket, submission_id) VALUES (?, ?)",
+        [(key, sid) for key in band_keys(review)],
+    )
+    conn.execute("UPDATE submission_lsh_state SET indexed_through = max(indexed_through, ?)", (sid,))
+
+
+def catch_up_index(conn: sqlite3.Connection) -> int:
+    """
+    Index the submissions stored after the watermark (e.g. while NEAR_DUP_INDEX
+    was off), NEAR_DUP_INDEX_CHUNK rows per transaction. Returns how many.
+    """
+    total = 0
+    while True:
+        with conn:
+            rows = conn.execute(
+                "SELECT id, review FROM submissions "
+                "WHERE id > (SELECT indexed_through FROM submission_lsh_state) ORDER BY id LIMIT ?",
+                (NEAR_DUP_INDEX_CHUNK,),
+            ).fetchall()
+            for sid, review in rows:
+                index_review(conn, sid, review)
+        if not rows:
+            return total
+        total += len(rows)
+
+
+def find_near_duplicates(conn: sqlite3.Connection, review: str, threshold: float = NEAR_DUP_THRESHOLD,
+                         rating=None, status: str = "done", limit: int = 1) -> list:
+    """
+    Stored submissions whose review has Jaccard similarity >= threshold with
+    `review` (on SHINGLE_SIZE-character shingles), best first, as
+    [(id, similarity)]. Optional filters: same rating, status.
+    - candidates come from the LSH buckets (newest NEAR_DUP_BUCKET_LIMIT per band)
+    - the NEAR_DUP_CANDIDATES sharing the most bands are checked exactly
+    """
+    keys = band_keys(review)
+    hits = Counter()
+    for key in keys:
+        for (sid,) in conn.execute(
+            "SELECT submission_id FROM submission_lsh WHERE bucket = ? ORDER BY submission_id DESC LIMIT ?",
+            (key, NEAR_DUP_BUCKET_LIMIT),
+        ):
+            hits[sid] += 1
+    if not hits:
+        return []
+    candidates = [sid for sid, _ in hits.most_common(NEAR_DUP_CANDIDATES)]
+    where, params = [f"id IN ({', '.join('?' * len(candidates))})"], list(candidates)
+    if rating is not None:
+        where.append("rating = ?")
+        params.append(rating)
+    if status is not None:
+        where.append("status = ?")
+        params.append(status)
+    mine = shingles(review)
+    scored = [
+        (sid, jaccard(mine, shingles(text)))
+        for sid, text in conn.execute(f"SELECT id, review FROM submissions WHERE {' AND '.join(where)}", params)
+    ]
+    scored = [(sid, sim) for sid, sim in scored if sim >= threshold]
+    scored.sort(key=lambda item: (-item[1], -item[0]))
+    return scored[:limit]
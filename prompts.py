@@ -71,13 +71,35 @@ Review: "{review_text}"
 Return ONLY valid JSON with no explanations.
 """
 
+# 4. BATCH STRICT PROMPT (K reviews per request, indexed JSON array output)
+# Filled with .format(reviews=...) where each line is: [index] "review text"
+BATCH_STRICT = """
+You are a reliable star rating classifier. Rate EACH review below from 1 to 5 stars using the rubric:
+
+1 star: severe issue, danger, sickness, strong negative
+2 stars: major problems, rude service, multiple complaints
+3 stars: mixed or neutral
+4 stars: mostly positive, small issue
+5 stars: strong praise, highly positive
+
+Reviews:
+{reviews}
+
+Return ONLY a JSON array with exactly one object per review, using the review's index:
+[
+  {{ "index": 0, "predicted_stars": 4, "explanation": "short reason" }}
+]
+Return ONLY valid JSON with no extra text.
+"""
+
 # ===================================================
 # TASK 1 PROMPT MAP (required by task1 script)
 # ===================================================
 PROMPT_MAP = {
     "base": BASE_STRICT,
     "fewshot": FEWSHOT_STRICT,
-    "rubric_cot": RUBRIC_STRICT
+    "rubric_cot": RUBRIC_STRICT,
+    "batch": BATCH_STRICT
 }
 
 # ===================================================
@@ -120,4 +142,76 @@ Example output (for guidance only):
 Now produce the JSON for the following input:
 user_review: \"{user_review}\"
 user_rating: {user_rating}
-"""
\ No newline at end of file
+"""
+# ===================================================
+# TASK 2 STREAMING PROMPT (same fields, ai_reply FIRST so it can be shown while the rest is generated)
+# ===================================================
+ADMIN_STREAM_PROMPT = """
+You are a helpful assistant that must analyze a single customer review and return a JSON object ONLY (no extra text).
+Do NOT output any explanation outside the JSON. The JSON must be valid and parsable by a strict JSON parser.
+
+Input fields:
+- user_review: the text of the customer's review (string)
+- user_rating: the numeric rating the user supplied (integer 1-5)
+
+Return EXACTLY one JSON object with the following keys, IN THIS ORDER (use these exact key names):
+
+{{
+  "ai_reply": string (10-40 words) - friendly reply to the customer,
+  "predicted_stars": integer between 1 and 5,
+  "explanation": string (10-40 words) - short reasoning why the predicted_stars was chosen,
+  "ai_summary": string (10-20 words) - a concise summary of the review,
+  "ai_recommendations": array of 2-4 short recommendation strings (each 3-10 words)
+}}
+
+Rules:
+1. Output MUST be **only** the JSON object (no surrounding backticks, no markdown, no commentary).
+2. "ai_reply" MUST be the first key.
+3. All fields MUST be non-empty. If you cannot infer a meaningful recommendation, return "No recommendation available" as an item in the array.
+4. predicted_stars MUST be your model's best prediction (do not copy user_rating unless the review strongly supports it).
+5. Keep explanation/summary concise and factual; do NOT hallucinate facts.
+
+Example output (for guidance only):
+{{
+  "ai_reply": "We're sorry your experience was poor — we'll investigate and improve our service.",
+  "predicted_stars": 2,
+  "explanation": "Food was cold on arrival and staff were unresponsive, indicating poor service quality.",
+  "ai_summary": "Cold food and slow, unhelpful service.",
+  "ai_recommendations": ["Improve delivery packaging", "Train staff on response times"]
+}}
+
+Now produce the JSON for the following input:
+user_review: \"{user_review}\"
+user_rating: {user_rating}
+"""
+# ===================================================
+# TASK 2 TEXT-ONLY PROMPT (stars already known from the local classifier or a near-duplicate, see main.text_only_analysis)
+# ===================================================
+ADMIN_TEXT_PROMPT = """
+You are a helpful assistant that must write the text fields for a single customer review and return a JSON object ONLY (no extra text).
+Do NOT output any explanation outside the JSON. The JSON must be valid and parsable by a strict JSON parser.
+
+Input fields:
+- user_review: the text of the customer's review (string)
+- user_rating: the numeric rating the user supplied (integer 1-5)
+- predicted_stars: the star rating already predicted for the review (integer 1-5)
+
+Return EXACTLY one JSON object with the following keys (use these exact key names):
+
+{{
+  "ai_summary": string (10-20 words) - a concise summary of the review,
+  "ai_recommendations": array of 2-4 short recommendation strings (each 3-10 words),
+  "ai_reply": string (10-40 words) - friendly reply to the customer
+}}
+
+Rules:
+1. Output MUST be **only** the JSON object (no surrounding backticks, no markdown, no commentary).
+2. All fields MUST be non-empty. If you cannot infer a meaningful recommendation, return "No recommendation available" as an item in the array.
+3. The reply's tone should fit predicted_stars; do NOT mention star numbers.
+4. Keep the summary concise and factual; do NOT hallucinate facts.
+
+Now produce the JSON for the following input:
+user_review: \"{user_review}\"
+user_rating: {user_rating}
+predicted_stars: {predicted_stars}
+"""
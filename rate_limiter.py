@@ -0,0 +1,87 @@
+# rate_limiter.py (token-bucket limiter for LLM requests/min and tokens/min)
+import time
+import asyncio
+import threading
+
+
+class RateLimiter:
+    """
+    Thread-safe token buckets for a requests-per-minute and an optional
+    tokens-per-minute quota, refilled continuously. acquire() blocks
+    (aacquire() awaits) until both buckets can pay for the call.
+    - burst: requests that may be sent back to back. The request bucket holds
+      (and starts with) this many, so no 60 s window admits more than
+      rpm + burst - 1 requests; a bucket holding a whole minute would let
+      about 2 x rpm through in the first minute.
+    - the token bucket holds the same share of its quota: burst / rpm of a
+      minute (burst seconds without a request limit). A call larger than the
+      bucket waits for a full bucket.
+    A limit of 0 (or less) disables that bucket.
+    Counters (updated under the lock): acquired calls, waits (sleeps before a
+    retry) and waited_seconds (their total length).
+    """
+
+    def __init__(self, rpm: float, tpm: float = 0, burst: float = 1):
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.burst = max(1.0, float(burst))
+        self._req_capacity = self.burst
+        self._tok_capacity = self.tpm * (self.burst / self.rpm if self.rpm > 0 else self.burst / 60.0)
+        self._req_tokens = self._req_capacity
+        self._tok_tokens = max(self._tok_capacity, 0.0)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm > 0:
+            self._req_tokens = min(self._req_capacity, self._req_tokens + elapsed * self.rpm / 60.0)
+        if self.tpm > 0:
+            self._tok_tokens = min(self._tok_capacity, self._tok_tokens + elapsed * self.tpm / 60.0)
+
+    def _try_acquire(self, tokens: float) -> float:
+        """Take quota if available and return 0, else count and return the seconds to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # a single call larger than the whole bucket waits for a full bucket
+            tokens = min(tokens, self._tok_capacity) if self.tpm > 0 else 0
+            wait = 0.0
+            if self.rpm > 0 and self._req_tokens < 1:
+                wait = max(wait, (1 - self._req_tokens) * 60.0 / self.rpm)
+            if self.tpm > 0 and self._tok_tokens < tokens:
+                wait = max(wait, (tokens - self._tok_tokens) * 60.0 / self.tpm)
+            if wait > 0:
+                self.waits += 1
+                self.waited_seconds += wait
+                return wait
+            if self.rpm > 0:
+                self._req_tokens -= 1
+            if self.tpm > 0:
+                self._tok_tokens -= tokens
+            self.acquired += 1
+            return 0.0
+
+    def acquire(self, tokens: float = 0):
+        """Block until one request (costing `tokens` tokens) fits in the quota."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 0):
+        """acquire() for coroutines: waits with asyncio.sleep so the event loop keeps running."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int = 0) -> int:
+    """Rough token cost of a call: ~4 characters per prompt token plus the output budget."""
+    return len(prompt or "") // 4 + int(max_output_tokens or 0)
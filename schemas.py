@@ -0,0 +1,148 @@
+# schemas.py (structured-output schemas for Gemini + typed results)
+from dataclasses import dataclass, field, asdict
+
+# -------------------------
+# Gemini responseSchema definitions (OpenAPI subset accepted by generationConfig)
+# -------------------------
+ADMIN_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "predicted_stars": {"type": "INTEGER", "minimum": 1, "maximum": 5},
+        "explanation": {"type": "STRING"},
+        "ai_summary": {"type": "STRING"},
+        "ai_recommendations": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "ai_reply": {"type": "STRING"},
+    },
+    "required": ["predicted_stars", "explanation", "ai_summary", "ai_recommendations", "ai_reply"],
+    "propertyOrdering": ["predicted_stars", "explanation", "ai_summary", "ai_recommendations", "ai_reply"],
+}
+
+# Same fields with ai_reply generated first, for the streaming endpoint
+ADMIN_STREAM_RESPONSE_SCHEMA = dict(
+    ADMIN_RESPONSE_SCHEMA,
+    propertyOrdering=["ai_reply", "predicted_stars", "explanation", "ai_summary", "ai_recommendations"],
+)
+
+# Text fields only, for reviews whose stars come from the local classifier
+ADMIN_TEXT_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "ai_summary": {"type": "STRING"},
+        "ai_recommendations": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "ai_reply": {"type": "STRING"},
+    },
+    "required": ["ai_summary", "ai_recommendations", "ai_reply"],
+    "propertyOrdering": ["ai_summary", "ai_recommendations", "ai_reply"],
+}
+
+TASK1_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "predicted_stars": {"type": "INTEGER", "minimum": 1, "maximum": 5},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["predicted_stars", "explanation"],
+    "propertyOrdering": ["predicted_stars", "explanation"],
+}
+
+TASK1_BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "predicted_stars": {"type": "INTEGER", "minimum": 1, "maximum": 5},
+            "explanation": {"type": "STRING"},
+        },
+        "required": ["index", "predicted_stars", "explanation"],
+        "propertyOrdering": ["index", "predicted_stars", "explanation"],
+    },
+}
+
+
+def coerce_stars(value):
+    """Return value as an int in 1..5, or None if it is not a valid star rating."""
+    if isinstance(value, bool):
+        return None
+    try:
+        stars = int(value)
+    except (TypeError, ValueError):
+        return None
+    return stars if 1 <= stars <= 5 else None
+
+
+def clean_text(value):
+    """Return value stripped if it is a non-empty string, else None."""
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def clean_list(value):
+    """Return a list of non-empty strings (a bare string becomes one item), or None."""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return None
+    items = [str(v).strip() for v in value if str(v).strip()]
+    return items or None
+
+
+def review_fields(data):
+    """
+    Validate a {"rating", "review"} submission record. Returns (review, rating)
+    with rating an int in 1..5, or (None, None) if either field is missing or invalid.
+    """
+    if not isinstance(data, dict):
+        return None, None
+    review = data.get("review")
+    try:
+        rating = int(data.get("rating"))
+    except Exception:
+        rating = None
+    if not review or not isinstance(review, str) or rating is None or not (1 <= rating <= 5):
+        return None, None
+    return review, rating
+
+
+def analysis_columns(data: dict) -> dict:
+    """
+    Typed column values stored alongside admin_json: predicted_stars,
+    explanation, ai_summary and ai_recommendations. Unlike AdminAnalysis, no
+    fallbacks are applied; a field the model did not return is None.
+    """
+    data = data if isinstance(data, dict) else {}
+    return {
+        "predicted_stars": coerce_stars(data.get("predicted_stars")),
+        "explanation": clean_text(data.get("explanation")),
+        "ai_summary": clean_text(data.get("ai_summary")),
+        "ai_recommendations": clean_list(data.get("ai_recommendations")) or [],
+    }
+
+
+@dataclass
+class AdminAnalysis:
+    """Validated admin fields for one review, with human-friendly fallbacks applied."""
+    predicted_stars: int
+    explanation: str = "No detailed explanation returned by model."
+    ai_summary: str = "No summary returned by model."
+    ai_recommendations: list = field(default_factory=lambda: ["No recommendations returned by model."])
+    ai_reply: str = "Thank you for your feedback."
+
+    @classmethod
+    def from_dict(cls, data: dict, default_stars: int) -> "AdminAnalysis":
+        """
+        Build from a parsed LLM object. Missing, empty or wrongly typed fields
+        fall back to the defaults; predicted_stars falls back to default_stars.
+        """
+        data = data if isinstance(data, dict) else {}
+        analysis = cls(predicted_stars=coerce_stars(data.get("predicted_stars")) or default_stars)
+        for name in ("explanation", "ai_summary", "ai_reply"):
+            value = clean_text(data.get(name))
+            if value is not None:
+                setattr(analysis, name, value)
+        recs = clean_list(data.get("ai_recommendations"))
+        if recs:
+            analysis.ai_recommendations = recs
+        return analysis
+
+    def to_dict(self) -> dict:
+        return asdict(self)
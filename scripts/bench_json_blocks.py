@@ -0,0 +1,133 @@
+# scripts/bench_json_blocks.py
+# Fuzz + microbenchmark for the llm_parsing block scanner against the nested
+# regex main.py used before (max three levels of nesting, not string-aware).
+#
+#  1) Fuzz corpus: random nested JSON objects (depth 1-6, strings containing
+#     braces, quotes and escapes) embedded in noisy prose. A case passes if some
+#     returned block json.loads() back to the original object. Both
+#     find_json_blocks (outermost only) and json_candidates (as used by main.py)
+#     are checked.
+#  2) Microbenchmark: adversarial ~100KB inputs, best of N runs for each extractor.
+#
+# Usage: python scripts/bench_json_blocks.py [fuzz_cases] [bench_repeats]
+import os
+import re
+import sys
+import json
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_parsing import find_json_blocks, json_candidates  # noqa: E402
+
+FUZZ_CASES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+OLD_BLOCK_RE = re.compile(r'\{(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*\}', re.DOTALL)
+
+
+def old_find_json_blocks(text):
+    return OLD_BLOCK_RE.findall(text)
+
+
+# -------------------------
+# Fuzz corpus
+# -------------------------
+TRICKY_STRINGS = ["plain", "use {braces}", "close } only", 'say "hi"', "back\\slash", "it's", "{{}}", "tab\tnew\nline", ""]
+PROSE = ["Sure! Here is the JSON:", "```json", "```", "Note: { this is not json", "done }", "I don't know.",
+         "Result ->", "\n\n", "'quoted aside'", "{oops"]
+
+
+def random_value(rng, depth):
+    kind = rng.random()
+    if depth > 0 and kind < 0.3:
+        return random_object(rng, depth - 1)
+    if depth > 0 and kind < 0.45:
+        return [random_value(rng, depth - 1) for _ in range(rng.randint(0, 3))]
+    if kind < 0.7:
+        return rng.choice(TRICKY_STRINGS)
+    if kind < 0.85:
+        return rng.randint(1, 5)
+    return rng.choice([True, False, None])
+
+
+def random_object(rng, depth):
+    return {f"k{i}": random_value(rng, depth) for i in range(rng.randint(1, 4))}
+
+
+def fuzz_corpus(n, seed=1234):
+    rng = random.Random(seed)
+    for _ in range(n):
+        depth = rng.randint(0, 5)
+        obj = random_object(rng, depth)
+        obj["predicted_stars"] = rng.randint(1, 5)
+        blob = json.dumps(obj, indent=rng.choice([None, 2]))
+        text = " ".join(rng.sample(PROSE, rng.randint(0, 2))) + " " + blob + " " + " ".join(rng.sample(PROSE, rng.randint(0, 2)))
+        yield depth, obj, text
+
+
+def recovered(extract, obj, text):
+    for block in extract(text):
+        try:
+            if json.loads(block) == obj:
+                return True
+        except Exception:
+            continue
+    return False
+
+
+def run_fuzz():
+    totals = {}
+    for depth, obj, text in fuzz_corpus(FUZZ_CASES):
+        row = totals.setdefault(depth + 1, [0, 0, 0, 0])
+        row[0] += 1
+        row[1] += recovered(find_json_blocks, obj, text)
+        row[2] += recovered(json_candidates, obj, text)
+        row[3] += recovered(old_find_json_blocks, obj, text)
+    print(f"Fuzz corpus: {FUZZ_CASES} cases (object recovered exactly)")
+    print("| Max depth | Cases | find_json_blocks | json_candidates | Old regex |")
+    print("|---:|---:|---:|---:|---:|")
+    for depth in sorted(totals):
+        n, outer_ok, cand_ok, old_ok = totals[depth]
+        print(f"| {depth} | {n} | {outer_ok / n:.1%} | {cand_ok / n:.1%} | {old_ok / n:.1%} |")
+
+
+# -------------------------
+# Microbenchmark
+# -------------------------
+def adversarial_inputs(size=100_000):
+    obj = json.dumps({"predicted_stars": 4, "explanation": "ok"})
+    return {
+        "unclosed_runs": ("{" + "a" * 99) * (size // 100),
+        "open_braces": "{" * size,
+        "nested_unclosed": ("{{" + "a" * 8) * (size // 10),
+        "deep_nesting": "{" * (size // 2) + "}" * (size // 2),
+        "many_small_objects": (obj + " ") * (size // (len(obj) + 1)),
+        "long_string_value": '{"explanation": "' + ("x{}" * (size // 3)) + '", "predicted_stars": 3}',
+        "prose_then_json": ("lorem ipsum dolor " * (size // 18)) + obj,
+    }
+
+
+def best_time(fn, text):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run_bench():
+    print(f"\nMicrobenchmark: best of {REPEATS} runs on ~100KB adversarial inputs")
+    print("| Input | find_json_blocks (ms) | json_candidates (ms) | Old regex (ms) |")
+    print("|---|---:|---:|---:|")
+    for name, text in adversarial_inputs().items():
+        outer_ms = best_time(find_json_blocks, text) * 1000
+        cand_ms = best_time(json_candidates, text) * 1000
+        old_ms = best_time(old_find_json_blocks, text) * 1000
+        print(f"| {name} | {outer_ms:.2f} | {cand_ms:.2f} | {old_ms:.2f} |")
+
+
+if __name__ == "__main__":
+    run_fuzz()
+    run_bench()
@@ -0,0 +1,79 @@
+# scripts/bench_metrics.py
+# Task 1 metrics on N synthetic predictions: the previous per-sample Python
+# loops + sklearn against metrics.py (NumPy), and the bootstrap CI cost.
+#   1) checks that both paths give the same accuracy / within-one / confusion
+#   2) times each path (best of R runs) and metrics.bootstrap_ci
+# Usage: python scripts/bench_metrics.py [samples] [repeats]
+import os
+import sys
+import time
+import random
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sklearn.metrics import accuracy_score, confusion_matrix  # noqa: E402
+from metrics import BOOTSTRAP_SAMPLES, bootstrap_ci, rating_metrics, star_array  # noqa: E402
+
+
+def synthetic(n, seed=7):
+    rng = random.Random(seed)
+    true, pred = [], []
+    for _ in range(n):
+        t = rng.randint(1, 5)
+        true.append(str(t) if rng.random() < 0.5 else t)
+        # mostly right or off by one, some unparsed (-1)
+        pred.append(-1 if rng.random() < 0.03 else max(1, min(5, t + rng.choice([-1, 0, 0, 0, 1]))))
+    return true, pred
+
+
+def loop_metrics(true_values, preds):
+    """The per-sample path previously used in task1_notebook_script.run()."""
+    true_list = []
+    for v in true_values:
+        try:
+            iv = int(v)
+            true_list.append(iv if 1 <= iv <= 5 else -1)
+        except Exception:
+            true_list.append(-1)
+    valid_idx = [i for i, (t, p) in enumerate(zip(true_list, preds))
+                 if isinstance(t, int) and 1 <= t <= 5 and isinstance(p, int) and 1 <= p <= 5]
+    y_true = [true_list[i] for i in valid_idx]
+    y_pred = [preds[i] for i in valid_idx]
+    w1 = sum(1 for t, p in zip(y_true, y_pred) if abs(t - p) <= 1) / len(y_true)
+    return accuracy_score(y_true, y_pred), w1, confusion_matrix(y_true, y_pred, labels=[1, 2, 3, 4, 5])
+
+
+def vector_metrics(true_values, preds):
+    return rating_metrics(star_array(true_values), star_array(preds), samples=0)
+
+
+def best_ms(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    true_values, preds = synthetic(ROWS)
+    acc, w1, cm = loop_metrics(true_values, preds)
+    fast = vector_metrics(true_values, preds)
+    assert abs(acc - fast["accuracy"]) < 1e-12 and abs(w1 - fast["within_one"]) < 1e-12
+    assert cm.tolist() == fast["confusion"]
+
+    print(f"{ROWS:,} samples, best of {REPEATS} runs")
+    print("| Step | ms |")
+    print("|---|---:|")
+    print(f"| loops + sklearn (accuracy, within-one, confusion) | {best_ms(lambda: loop_metrics(true_values, preds)):.1f} |")
+    print(f"| metrics.py (+ MAE, per-class precision/recall) | {best_ms(lambda: vector_metrics(true_values, preds)):.1f} |")
+    print(f"| bootstrap_ci, {BOOTSTRAP_SAMPLES} resamples | {best_ms(lambda: bootstrap_ci(fast['confusion'])):.1f} |")
+    print(f"| bootstrap_ci, 100000 resamples | {best_ms(lambda: bootstrap_ci(fast['confusion'], samples=100_000)):.1f} |")
+    print("accuracy CI:", bootstrap_ci(fast["confusion"])["accuracy"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# scripts/bench_near_duplicates.py
+# Lookup latency of near_duplicates.find_near_duplicates (MinHash/LSH buckets
+# in submission_lsh) on a synthetic submissions table.
+#   1) builds N rows in a temporary database through storage.init_db(), with
+#      their LSH buckets, plus a few thousand copies of a few short reviews
+#      ("Great food.") so some buckets are very large
+#   2) times Q lookups each (p50 / p95) for exact copies of stored reviews,
+#      edited copies (one word replaced), unseen reviews and the hot short
+#      reviews, and reports how often a match >= the threshold was found and,
+#      for the edited copies, the recall against their true similarity
+# Usage: python scripts/bench_near_duplicates.py [rows] [queries]
+import os
+import sys
+import time
+import random
+import tempfile
+
+import numpy as np
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_near_duplicates.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+from near_duplicates import NEAR_DUP_THRESHOLD, band_keys, find_near_duplicates, jaccard, shingles  # noqa: E402
+
+SUBJECTS = ["food", "pizza", "burger", "coffee", "service", "staff", "delivery", "table", "music", "price",
+            "dessert", "waiter", "manager", "parking", "menu", "portion", "salad", "noodles", "soup", "bread"]
+ADJECTIVES = ["cold", "hot", "rude", "friendly", "slow", "quick", "great", "awful", "tasty", "bland",
+              "expensive", "cheap", "clean", "dirty", "noisy", "cozy", "fresh", "stale", "amazing", "average"]
+FILLER = ["the", "was", "really", "and", "we", "loved", "hated", "our", "visit", "again", "never", "will", "come", "back"]
+SHORT = ["Great food.", "Terrible service.", "Loved it!", "Would not recommend."]
+SHORT_COPIES = 2_000
+
+
+def review_text(rng):
+    words = []
+    for _ in range(rng.randint(4, 8)):
+        words += [rng.choice(FILLER), rng.choice(ADJECTIVES), rng.choice(SUBJECTS)]
+    return " ".join(words).capitalize() + "."
+
+
+def edited(review, rng):
+    words = review.rstrip(".").split()
+    words[rng.randrange(len(words))] = rng.choice(ADJECTIVES)
+    return " ".join(words) + "."
+
+
+def build(rng):
+    storage.init_db()
+    conn = storage.get_connection()
+    t0 = time.perf_counter()
+    next_id = 1
+    remaining = ROWS
+    shorts = [SHORT[i % len(SHORT)] for i in range(min(SHORT_COPIES * len(SHORT), ROWS))]
+    while remaining:
+        size = min(20_000, remaining)
+        reviews = [shorts.pop() if shorts else review_text(rng) for _ in range(size)]
+        ids = range(next_id, next_id + size)
+        with conn:
+            conn.executemany(
+                "INSERT INTO submissions (id, rating, review, ai_response, admin_json, created_at, status) "
+                "VALUES (?, ?, ?, 'Thanks!', '{}', '2025-01-01T00:00:00+00:00', 'done')",
+                [(sid, 5, review) for sid, review in zip(ids, reviews)],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO submission_lsh (bucket, submission_id) VALUES (?, ?)",
+                [(key, sid) for sid, review in zip(ids, reviews) for key in band_keys(review)],
+            )
+        next_id += size
+        remaining -= size
+    print(f"Inserted {ROWS:,} rows with LSH buckets in {time.perf_counter() - t0:.1f}s")
+    return conn
+
+
+def measure(conn, queries, originals=None):
+    """p50 and p95 ms, share of queries with a match, and (given originals) recall."""
+    times, found = [], []
+    for review in queries:
+        t0 = time.perf_counter()
+        matches = find_near_duplicates(conn, review, rating=5)
+        times.append(time.perf_counter() - t0)
+        found.append(bool(matches))
+    times, found = np.array(times) * 1000, np.array(found)
+    recall = None
+    if originals is not None:
+        expected = np.array([jaccard(shingles(q), shingles(o)) >= NEAR_DUP_THRESHOLD
+                             for q, o in zip(queries, originals)])
+        recall = found[expected].mean() if expected.any() else None
+    return np.percentile(times, 50), np.percentile(times, 95), found.mean(), recall
+
+
+def main():
+    rng = random.Random(7)
+    conn = build(rng)
+    sample_ids = rng.sample(range(SHORT_COPIES * len(SHORT) + 1, ROWS + 1), QUERIES)
+    stored = [conn.execute("SELECT review FROM submissions WHERE id = ?", (sid,)).fetchone()[0] for sid in sample_ids]
+    cases = [
+        ("exact copy", stored, stored),
+        ("one word replaced", [edited(review, rng) for review in stored], stored),
+        ("unseen review", [review_text(rng) for _ in range(QUERIES)], None),
+        ("hot short review", [rng.choice(SHORT) for _ in range(QUERIES)], None),
+    ]
+    t0 = time.perf_counter()
+    for review in stored:
+        band_keys(review)
+    signature_ms = (time.perf_counter() - t0) * 1000 / len(stored)
+    lsh_rows = conn.execute("SELECT COUNT(*) FROM submission_lsh").fetchone()[0]
+    print(f"\n{ROWS:,} stored reviews, {lsh_rows:,} LSH rows, threshold {NEAR_DUP_THRESHOLD}, "
+          f"{QUERIES} lookups per case; MinHash signature alone {signature_ms:.3f} ms")
+    print("| Query | p50 (ms) | p95 (ms) | Match found | Recall (true similarity >= threshold) |")
+    print("|---|---:|---:|---:|---:|")
+    for label, queries, originals in cases:
+        p50, p95, found, recall = measure(conn, queries, originals)
+        recall = "-" if recall is None else f"{recall:.1%}"
+        print(f"| {label} | {p50:.2f} | {p95:.2f} | {found:.1%} | {recall} |")
+
+
+if __name__ == "__main__":
+    main()
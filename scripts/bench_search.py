@@ -0,0 +1,100 @@
+# scripts/bench_search.py
+# Latency of /search-style queries (search.search_submissions over the FTS5
+# index) against a LIKE scan, on a synthetic submissions table.
+#   1) builds N rows in a temporary database through storage.init_db(), so the
+#      FTS triggers index every insert exactly as in production
+#   2) times each query (best of R runs) for rare, common, phrase, prefix and
+#      filtered searches, first page and a deep page
+# Usage: python scripts/bench_search.py [rows] [repeats]
+import os
+import sys
+import time
+import random
+import tempfile
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+from search import fts_query, search_submissions  # noqa: E402
+
+SUBJECTS = ["food", "pizza", "burger", "coffee", "service", "staff", "delivery", "table", "music", "price",
+            "dessert", "waiter", "manager", "parking", "menu", "portion", "salad", "noodles", "soup", "bread"]
+ADJECTIVES = ["cold", "hot", "rude", "friendly", "slow", "quick", "great", "awful", "tasty", "bland",
+              "expensive", "cheap", "clean", "dirty", "noisy", "cozy", "fresh", "stale", "amazing", "average"]
+FILLER = ["the", "was", "really", "and", "we", "loved", "hated", "our", "visit", "again", "never", "will", "come", "back"]
+
+
+def synthetic_rows(n, seed=7):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = []
+        for _ in range(rng.randint(2, 5)):
+            words += [rng.choice(FILLER), rng.choice(ADJECTIVES), rng.choice(SUBJECTS)]
+        # a rare word in ~0.01% of rows
+        if rng.random() < 0.0001:
+            words.append("cockroach")
+        review = " ".join(words).capitalize() + "."
+        stars = rng.randint(1, 5)
+        summary = f"{rng.choice(ADJECTIVES).capitalize()} {rng.choice(SUBJECTS)}."
+        yield (stars, review, "Thanks!", "{}", f"2025-01-01T00:00:{i % 60:02d}+00:00", "done",
+               max(1, min(5, stars + rng.choice([-1, 0, 0, 1]))), summary, "Synthetic row.")
+
+
+def build():
+    storage.init_db()
+    conn = storage.get_connection()
+    t0 = time.perf_counter()
+    rows = synthetic_rows(ROWS)
+    while True:
+        chunk = [row for _, row in zip(range(50_000), rows)]
+        if not chunk:
+            break
+        with conn:
+            conn.executemany(
+                "INSERT INTO submissions (rating, review, ai_response, admin_json, created_at, status, "
+                "predicted_stars, ai_summary, explanation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                chunk,
+            )
+    print(f"Inserted {ROWS:,} rows (FTS maintained by triggers) in {time.perf_counter() - t0:.1f}s")
+    return conn
+
+
+def best_ms(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    conn = build()
+    cases = [
+        ("rare word", "cockroach", {}),
+        ("two words", "cold pizza", {}),
+        ("phrase", '"rude staff"', {}),
+        ("prefix", "cockr*", {}),
+        ("common word", "food", {}),
+        ("two words + rating", "cold pizza", {"rating": 1}),
+    ]
+    print(f"\nBest of {REPEATS} runs, page size 20")
+    print("| Query | Matches | FTS page 1 (ms) | FTS offset 1000 (ms) | LIKE scan (ms) |")
+    print("|---|---:|---:|---:|---:|")
+    for label, q, filters in cases:
+        match = fts_query(q)
+        matches = conn.execute("SELECT COUNT(*) FROM submissions_fts WHERE submissions_fts MATCH ?", (match,)).fetchone()[0]
+        first = best_ms(lambda: search_submissions(conn, match, 21, 0, **filters))
+        deep = best_ms(lambda: search_submissions(conn, match, 21, 1000, **filters))
+        like = "%" + q.strip('"*') + "%"
+        scan = best_ms(lambda: conn.execute(
+            "SELECT id FROM submissions WHERE review LIKE ? ORDER BY id DESC LIMIT 21", (like,)
+        ).fetchall())
+        print(f"| {label} (`{q}`) | {matches:,} | {first:.2f} | {deep:.2f} | {scan:.2f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# scripts/bench_sqlite_inserts.py
+# Compare review-insert throughput under parallel load:
+#   - "baseline": connect per insert, default rollback journal (old main.py behaviour)
+#   - "storage":  per-thread persistent connections from storage.py (WAL, tuned pragmas)
+# while a reader thread keeps running dashboard-style page queries.
+# Then compares /submit-style async writes through storage.GroupCommitWriter
+# with and without batching (one commit per row vs group commit).
+# Set SQLITE_SYNCHRONOUS=FULL to see the effect when every commit fsyncs.
+# Usage: python scripts/bench_sqlite_inserts.py [threads] [inserts_per_thread]
+import os
+import sys
+import time
+import json
+import asyncio
+import sqlite3
+import tempfile
+import threading
+
+THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+PER_THREAD = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+
+INSERT_SQL = """
+    INSERT INTO submissions (rating, review, ai_response, admin_json, created_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+ROW = (4, "Good food, slow service", "Thanks!", json.dumps({"predicted_stars": 4}), "2025-01-01T00:00:00+00:00")
+
+
+def run(label, get_conn, release_conn):
+    errors = []
+    reads = [0]
+    stop = threading.Event()
+
+    def writer():
+        for _ in range(PER_THREAD):
+            try:
+                conn = get_conn()
+                with conn:
+                    conn.execute(INSERT_SQL, ROW)
+                release_conn(conn)
+            except sqlite3.Error as e:
+                errors.append(str(e))
+
+    def reader():
+        while not stop.is_set():
+            try:
+                conn = get_conn()
+                conn.execute("SELECT id, rating, review FROM submissions ORDER BY id DESC LIMIT 100").fetchall()
+                release_conn(conn)
+                reads[0] += 1
+            except sqlite3.Error as e:
+                errors.append(str(e))
+
+    r = threading.Thread(target=reader)
+    r.start()
+    t0 = time.perf_counter()
+    ws = [threading.Thread(target=writer) for _ in range(THREADS)]
+    for w in ws:
+        w.start()
+    for w in ws:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    r.join()
+    total = THREADS * PER_THREAD
+    print(f"{label:>9}: {total} inserts in {elapsed:.2f}s -> {total / elapsed:,.0f} inserts/s "
+          f"| concurrent reads: {reads[0]} | errors: {len(errors)}")
+
+
+def run_async(label, writer, concurrency, total):
+    async def go():
+        async def submitter(n):
+            for _ in range(n):
+                await writer.execute(INSERT_SQL, ROW)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(submitter(total // concurrency) for _ in range(concurrency)))
+        return time.perf_counter() - t0
+
+    elapsed = asyncio.run(go())
+    done = (total // concurrency) * concurrency
+    print(f"{label:>9}: {done} async submits in {elapsed:.2f}s -> {done / elapsed:,.0f} submits/s | {writer.stats()}")
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+
+    # baseline
+    base_path = os.path.join(tmp, "baseline.db")
+    os.environ["DB_PATH"] = os.path.join(tmp, "storage.db")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import storage  # noqa: E402 (reads DB_PATH at import time)
+
+    storage.init_db()
+    conn = sqlite3.connect(base_path)
+    conn.execute(storage.get_connection().execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'submissions'").fetchone()[0])
+    conn.close()
+
+    run("baseline", lambda: sqlite3.connect(base_path, timeout=5), lambda c: c.close())
+    run("storage", storage.get_connection, lambda c: None)
+
+    concurrency = THREADS * 8
+    run_async("per-row", storage.GroupCommitWriter(enabled=False), concurrency, THREADS * PER_THREAD)
+    run_async("grouped", storage.GroupCommitWriter(), concurrency, THREADS * PER_THREAD)
+
+
+if __name__ == "__main__":
+    main()
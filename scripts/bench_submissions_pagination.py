@@ -0,0 +1,127 @@
+# scripts/bench_submissions_pagination.py
+# Page latency of GET /submissions (main.get_submissions) on a synthetic
+# submissions table, first page vs a deep keyset page, for each filter.
+#   1) builds N rows in a temporary database through storage.init_db(), so the
+#      indexes and the FTS triggers are exactly as in production
+#   2) for each filter, times (best of R runs) the first page and a page whose
+#      cursor is 95% of the way into the table, and fails if the deep page is
+#      more than MAX_RATIO times slower than the first (keyset pages should not
+#      get slower with depth; OFFSET pages would) or if any page takes more
+#      than MAX_PAGE_MS
+# Usage: python scripts/bench_submissions_pagination.py [rows] [repeats]
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import tempfile
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+MAX_RATIO = 5.0
+# and no page, first or deep, may take longer than this
+MAX_PAGE_MS = 50.0
+# below this, timer noise dominates the ratio
+FLOOR_MS = 2.0
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_submissions_pagination.db")
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+import main as app_main  # noqa: E402
+
+SUBJECTS = ["food", "pizza", "burger", "coffee", "service", "staff", "delivery", "table", "music", "price",
+            "dessert", "waiter", "manager", "parking", "menu", "portion", "salad", "noodles", "soup", "bread"]
+ADJECTIVES = ["cold", "hot", "rude", "friendly", "slow", "quick", "great", "awful", "tasty", "bland",
+              "expensive", "cheap", "clean", "dirty", "noisy", "cozy", "fresh", "stale", "amazing", "average"]
+FILLER = ["the", "was", "really", "and", "we", "loved", "hated", "our", "visit", "again", "never", "will", "come", "back"]
+
+
+def synthetic_rows(n, seed=7):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = []
+        for _ in range(rng.randint(2, 5)):
+            words += [rng.choice(FILLER), rng.choice(ADJECTIVES), rng.choice(SUBJECTS)]
+        review = " ".join(words).capitalize() + "."
+        stars = rng.randint(1, 5)
+        # ~10% of rows disagree with the customer's rating, 2% by 2+ stars
+        drift = rng.choices([0, 1, -1, 2, -2], weights=[90, 4, 4, 1, 1])[0]
+        status = "failed" if rng.random() < 0.01 else "done"
+        created = f"2025-{1 + i * 12 // n:02d}-01T00:00:00+00:00"
+        yield (stars, review, "Thanks!", "{}", created, status,
+               max(1, min(5, stars + drift)), "Synthetic row.", "Synthetic row.")
+
+
+def build():
+    storage.init_db()
+    conn = storage.get_connection()
+    t0 = time.perf_counter()
+    rows = synthetic_rows(ROWS)
+    while True:
+        chunk = [row for _, row in zip(range(50_000), rows)]
+        if not chunk:
+            break
+        with conn:
+            conn.executemany(
+                "INSERT INTO submissions (rating, review, ai_response, admin_json, created_at, status, "
+                "predicted_stars, ai_summary, explanation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                chunk,
+            )
+    print(f"Inserted {ROWS:,} rows (FTS maintained by triggers) in {time.perf_counter() - t0:.1f}s")
+    return conn
+
+
+def page(**params):
+    return asyncio.run(app_main.get_submissions(**params))
+
+
+def best_ms(params):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        out = page(**params)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, out
+
+
+def main():
+    build()
+    deep_cursor = ROWS // 20  # ORDER BY id DESC: 95% of the table lies above it
+    cases = [
+        ("no filter", {}),
+        ("rating", {"rating": 1}),
+        ("predicted_stars", {"predicted_stars": 5}),
+        ("min_star_diff=1", {"min_star_diff": 1}),
+        ("min_star_diff=2", {"min_star_diff": 2}),
+        ("status=failed", {"status": "failed"}),
+        ("created range (wide)", {"created_from": "2025-01-01", "created_to": "2025-12-31"}),
+        ("created range (one month)", {"created_from": "2025-01-01", "created_to": "2025-01-31"}),
+        ("q (two words)", {"q": "cold pizza"}),
+        ("q (phrase)", {"q": '"rude staff"'}),
+        ("q + rating", {"q": "cold pizza", "rating": 1}),
+    ]
+    print(f"\nBest of {REPEATS} runs, page size {app_main.SUBMISSIONS_DEFAULT_LIMIT}, deep cursor id < {deep_cursor:,}")
+    print("| Filter | Page 1 (ms) | Deep page (ms) | Deep rows |")
+    print("|---|---:|---:|---:|")
+    slow = []
+    for label, filters in cases:
+        params = {"limit": app_main.SUBMISSIONS_DEFAULT_LIMIT, "cursor": None, "order": "desc", "rating": None,
+                  "predicted_stars": None, "created_from": None, "created_to": None, "q": None, "status": None,
+                  "min_star_diff": None, **filters}
+        first, _ = best_ms(params)
+        deep, out = best_ms({**params, "cursor": deep_cursor})
+        if out.status_code != 200:
+            raise SystemExit(f"FAIL: {label} returned {out.status_code}: {out.body!r}")
+        print(f"| {label} | {first:.2f} | {deep:.2f} | {len(json.loads(out.body)['submissions'])} |")
+        if deep > max(first, FLOOR_MS) * MAX_RATIO or max(first, deep) > MAX_PAGE_MS:
+            slow.append(label)
+    if slow:
+        raise SystemExit(f"FAIL: deep page more than {MAX_RATIO:g}x slower than page 1, "
+                         f"or a page over {MAX_PAGE_MS:g} ms, for: {', '.join(slow)}")
+    print(f"OK: every deep keyset page within {MAX_RATIO:g}x of page 1 and every page under {MAX_PAGE_MS:g} ms")
+
+
+if __name__ == "__main__":
+    main()
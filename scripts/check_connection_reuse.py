@@ -0,0 +1,64 @@
+# scripts/check_connection_reuse.py
+# Checks that llm_client2 reuses keep-alive connections: N Gemini calls from
+# T threads against a local stub server (scripts/stub_gemini.py) must open at
+# most GEMINI_POOL_SIZE TCP connections, i.e. handshakes scale with the pool
+# size and not with the number of calls. A plain requests.post() per call is
+# run for comparison (one connection per call).
+# Usage: python scripts/check_connection_reuse.py [calls] [threads]
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+os.environ["MOCK_LLM"] = "0"
+os.environ["LLM_CACHE"] = "0"  # every call must reach the server
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_client2  # noqa: E402
+from stub_gemini import StubGemini  # noqa: E402
+
+
+def run(call):
+    stub = StubGemini().start()
+    try:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(THREADS) as pool:
+            list(pool.map(lambda i: call(stub.url, f"review {i}"), range(CALLS)))
+        return stub.connections, len(stub.requests), time.perf_counter() - t0
+    finally:
+        stub.stop()
+
+
+def pooled(url, prompt):
+    llm_client2.GEMINI_URL = url
+    return llm_client2.generate_text(prompt)
+
+
+def unpooled(url, prompt):
+    return requests.post(url, json=llm_client2._build_payload(prompt, 512, 0.0), timeout=30).json()
+
+
+def main():
+    pool_size = max(1, llm_client2.GEMINI_POOL_SIZE)
+    print(f"{CALLS} calls from {THREADS} threads, GEMINI_POOL_SIZE={pool_size}")
+    print("| Client | Requests | Connections opened | Seconds |")
+    print("|---|---:|---:|---:|")
+    results = {}
+    for label, call in (("llm_client2 (pooled session)", pooled), ("requests.post per call", unpooled)):
+        connections, served, seconds = run(call)
+        results[label] = connections
+        print(f"| {label} | {served} | {connections} | {seconds:.2f} |")
+    opened = results["llm_client2 (pooled session)"]
+    limit = min(pool_size, THREADS)
+    if opened > limit:
+        raise SystemExit(f"FAIL: {opened} connections for {CALLS} calls, expected at most {limit}")
+    print(f"OK: {opened} connections for {CALLS} calls (at most min(pool size, threads) = {limit})")
+
+
+if __name__ == "__main__":
+    main()
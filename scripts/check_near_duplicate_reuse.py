@@ -0,0 +1,98 @@
+# scripts/check_near_duplicate_reuse.py
+# Checks main.analyze_review with SUBMIT_NEAR_DUP_REUSE=1 against a local stub
+# Gemini server (scripts/stub_gemini.py), in a temporary database:
+#   1) the same review (different case/punctuation) as a stored submission
+#      reuses its predicted_stars, summary and recommendations, but ai_reply is
+#      written by a fresh text-only call and never copied from the stored row
+#   2) a near-identical review (one typo) keeps only predicted_stars;
+#      summary, recommendations and reply all come from the text-only call
+# Usage: python scripts/check_near_duplicate_reuse.py
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from datetime import datetime, timezone
+
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+os.environ["MOCK_LLM"] = "0"
+os.environ["LLM_CACHE"] = "0"
+os.environ["SUBMIT_NEAR_DUP_REUSE"] = "1"
+os.environ["SUBMIT_LOCAL_CASCADE"] = "0"
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "check_near_duplicate_reuse.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_client2  # noqa: E402
+import main as app_main  # noqa: E402
+from storage import get_connection, insert_submission_row  # noqa: E402
+from stub_gemini import StubGemini  # noqa: E402
+
+STORED_REVIEW = ("The pasta was cold when it arrived and the waiter forgot our drinks twice, "
+                 "but the manager apologised and took the dessert off the bill. We have been coming here "
+                 "for years and the kitchen is usually much better than this.")
+STORED = {
+    "predicted_stars": 2,
+    "explanation": "Cold food and slow service, partly made up for by the manager.",
+    "ai_summary": "Cold pasta and forgotten drinks; manager apologised and comped dessert.",
+    "ai_recommendations": ["Check dish temperature at the pass", "Track drink orders per table"],
+    "ai_reply": "Dear Alice, thank you for telling us about Tuesday's dinner.",
+}
+FRESH = {
+    "ai_summary": "Fresh summary from the text-only call.",
+    "ai_recommendations": ["Fresh recommendation"],
+    "ai_reply": "Thank you for your review, we are sorry the pasta was cold.",
+}
+
+
+def check(label, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+def analyze(stub, review):
+    sent = len(stub.requests)
+    analysis, admin_obj = asyncio.run(app_main.analyze_review(review, 2))
+    prompts = [req["contents"][0]["parts"][0]["text"] for req in stub.requests[sent:]]
+    return analysis, admin_obj, prompts
+
+
+def main():
+    conn = get_connection()
+    with conn:
+        stored_id = insert_submission_row(conn, 2, STORED_REVIEW, datetime.now(timezone.utc).isoformat(),
+                                          ai_response=STORED["ai_reply"], admin_obj=dict(STORED))
+    stub = StubGemini(reply_text=json.dumps(FRESH)).start()
+    llm_client2.GEMINI_URL = stub.url
+    results = []
+    try:
+        same = STORED_REVIEW.upper().replace(",", "")
+        analysis, admin_obj, prompts = analyze(stub, same)
+        results += [
+            check("exact: matched the stored submission", admin_obj.get("reused_from") == stored_id),
+            check("exact: one text-only LLM call", len(prompts) == 1 and "write the text fields" in prompts[0]),
+            check("exact: ai_reply is fresh", analysis.ai_reply == FRESH["ai_reply"]),
+            check("exact: stored ai_reply not copied",
+                  STORED["ai_reply"] not in (analysis.ai_reply, admin_obj.get("ai_reply"))),
+            check("exact: predicted_stars, summary and recommendations reused",
+                  (analysis.predicted_stars, analysis.ai_summary, analysis.ai_recommendations)
+                  == (STORED["predicted_stars"], STORED["ai_summary"], STORED["ai_recommendations"])),
+        ]
+
+        edited = STORED_REVIEW.replace("dessert", "desert")
+        analysis, admin_obj, prompts = analyze(stub, edited)
+        results += [
+            check("near-identical: matched the stored submission", admin_obj.get("reused_from") == stored_id),
+            check("near-identical: one text-only LLM call", len(prompts) == 1 and "write the text fields" in prompts[0]),
+            check("near-identical: predicted_stars seeded", analysis.predicted_stars == STORED["predicted_stars"]),
+            check("near-identical: summary, recommendations and reply are fresh",
+                  (analysis.ai_summary, analysis.ai_recommendations, analysis.ai_reply)
+                  == (FRESH["ai_summary"], FRESH["ai_recommendations"], FRESH["ai_reply"])),
+        ]
+    finally:
+        stub.stop()
+    if not all(results):
+        raise SystemExit("FAIL")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# scripts/check_structured_output.py
+# Checks the schema-constrained request path of llm_client2 against a local
+# stub Gemini server (scripts/stub_gemini.py):
+#   1) with response_schema, generationConfig carries
+#      responseMimeType=application/json and the schema, and the reply parses
+#      through the 'direct' stage of llm_parsing.parse_llm_output
+#   2) without it (LLM_STRUCTURED_OUTPUT=0), neither field is sent and a
+#      fenced, chatty reply still parses through the heuristic stages
+# Usage: python scripts/check_structured_output.py
+import os
+import sys
+import json
+
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+os.environ["MOCK_LLM"] = "0"
+os.environ["LLM_CACHE"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_client2  # noqa: E402
+from llm_parsing import parse_llm_output  # noqa: E402
+from prompts import ADMIN_FULLJSON_PROMPT  # noqa: E402
+from schemas import ADMIN_RESPONSE_SCHEMA, TASK1_RESPONSE_SCHEMA, AdminAnalysis  # noqa: E402
+from stub_gemini import StubGemini  # noqa: E402
+
+ANALYSIS = {
+    "predicted_stars": 2,
+    "explanation": "Cold food and a long wait.",
+    "ai_summary": "Unhappy with food temperature and service speed.",
+    "ai_recommendations": ["Check food temperature at the pass", "Add staff at peak hours"],
+    "ai_reply": "Sorry about your visit, we are looking into it.",
+}
+
+
+def check(label, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+def call(stub, reply_text, schema):
+    stub.reply_text = reply_text
+    llm_client2.GEMINI_URL = stub.url
+    prompt = ADMIN_FULLJSON_PROMPT.format(user_review="The soup was cold and we waited 40 minutes.", user_rating=2)
+    text = llm_client2.generate_text(prompt, temperature=0.0, response_schema=schema)
+    return stub.requests[-1]["generationConfig"], parse_llm_output(text)
+
+
+def main():
+    stub = StubGemini().start()
+    results = []
+    try:
+        config, parsed = call(stub, json.dumps(ANALYSIS), ADMIN_RESPONSE_SCHEMA)
+        analysis = AdminAnalysis.from_dict(parsed.data, default_stars=5)
+        results += [
+            check("schema mode: responseMimeType is application/json",
+                  config.get("responseMimeType") == "application/json"),
+            check("schema mode: responseSchema is ADMIN_RESPONSE_SCHEMA",
+                  config.get("responseSchema") == ADMIN_RESPONSE_SCHEMA),
+            check("schema mode: temperature and maxOutputTokens kept",
+                  config.get("temperature") == 0.0 and config.get("maxOutputTokens") == 512),
+            check(f"schema mode: parsed by the 'direct' stage (got '{parsed.strategy}')", parsed.strategy == "direct"),
+            check("schema mode: AdminAnalysis keeps every field", analysis.to_dict() == ANALYSIS),
+        ]
+
+        config, _ = call(stub, '{"predicted_stars": 3}', TASK1_RESPONSE_SCHEMA)
+        results.append(check("Task 1 schema sent as responseSchema", config.get("responseSchema") == TASK1_RESPONSE_SCHEMA))
+
+        chatty = "Sure! Here is the analysis:\n```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```"
+        config, parsed = call(stub, chatty, None)
+        results += [
+            check("free-text mode: no responseMimeType / responseSchema",
+                  "responseMimeType" not in config and "responseSchema" not in config),
+            check(f"free-text mode: fenced reply parsed by a fallback stage (got '{parsed.strategy}')",
+                  parsed.strategy not in ("direct", "none", "error") and parsed.data.get("predicted_stars") == 2),
+        ]
+    finally:
+        stub.stop()
+    if not all(results):
+        raise SystemExit("FAIL")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,25 @@
 # scripts/evaluation_summary.py
+import os
+import sys
 import json
-import statistics
-from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import rating_metrics, star_array  # noqa: E402
 
 IN = "task1_results.json"
 OUT_JSON = "evaluation_summary.json"
 OUT_MD = "evaluation_table.md"
 
-def is_valid_json_and_star(s):
-    if not s or not isinstance(s, str):
-        return False, None
-    try:
-        j = json.loads(s)
-        if isinstance(j, dict) and "predicted_stars" in j:
-            try:
-                v = int(j["predicted_stars"])
-                return 1 <= v <= 5, v
-            except Exception:
-                return False, None
-        # if top-level has numeric value somewhere
-        return False, None
-    except Exception:
-        return False, None
+def raw_star(raw):
+    """predicted_stars from one raw output (dict, or JSON string), or None."""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return None
+    return raw.get("predicted_stars") if isinstance(raw, dict) else None
 
 R = json.load(open(IN, "r", encoding="utf-8"))
 prompts = list(R.get("prompts", {}).keys())
@@ -37,34 +35,29 @@ for p in prompts:
     # We'll try both keys:
     raw_examples = info.get("raws") or info.get("raw_outputs_example") or []
     # Compute JSON validity rate over the stored raw_examples (best-effort)
-    valid_count = 0
-    total = len(raw_examples)
-    extracted_stars = []
-    for r in raw_examples:
-        ok, v = is_valid_json_and_star(r)
-        if ok:
-            valid_count += 1
-            extracted_stars.append(v)
-    json_validity = (valid_count / total) if total>0 else None
+    stars = star_array([raw_star(r) for r in raw_examples])
+    json_validity = float((stars > 0).mean()) if len(stars) else None
 
     # If your saved file doesn't include per-run raw outputs for each sample, we can only compute validity on examples.
     # For reliability (consensus) we need per-sample per-run outputs — if you collected those, add them as 'all_raws' in results.
     # We will compute consensus if 'all_raws' exists:
     consensus = None
-    if "all_raws" in info:
+    if info.get("all_raws"):
         # info["all_raws"] should be list of lists: per-sample list of raw outputs from each run
         per_sample = info["all_raws"]
-        agrees = 0
-        for sample_runs in per_sample:
-            preds = []
-            for r in sample_runs:
-                ok, v = is_valid_json_and_star(r)
-                preds.append(v if ok else None)
-            # consensus if all non-None identical
-            nonnull = [x for x in preds if x is not None]
-            if nonnull and all(x==nonnull[0] for x in nonnull):
-                agrees += 1
-        consensus = agrees / len(per_sample) if len(per_sample)>0 else None
+        runs = max(len(sample_runs) for sample_runs in per_sample)
+        # samples x runs array of stars, 0 = invalid / missing run
+        grid = star_array([raw_star(r) for sample_runs in per_sample
+                           for r in list(sample_runs) + [None] * (runs - len(sample_runs))]).reshape(len(per_sample), runs)
+        # consensus if there is a valid run and all valid runs agree (smallest == largest)
+        largest = grid.max(axis=1)
+        smallest = np.where(grid > 0, grid, 6).min(axis=1)
+        agrees = (largest > 0) & (smallest == largest)
+        consensus = float(agrees.mean())
+
+    # MAE, per-class precision/recall and bootstrap CIs from the stored confusion matrix
+    metrics = rating_metrics(cm=info["confusion"]) if info.get("confusion") else None
+    ci = metrics["ci"] if metrics else {}
 
     # gather metrics we already have: accuracy, within_one
     acc = info.get("accuracy")
@@ -73,12 +66,22 @@ for p in prompts:
         "prompt": p,
         "accuracy": acc,
         "within_one": w1,
+        "mae": metrics["mae"] if metrics else None,
+        "accuracy_ci": ci.get("accuracy"),
+        "local_share": info.get("local_share"),
+        "llm_calls_avoided": info.get("llm_calls_avoided"),
         "json_validity": json_validity,
         "consensus": consensus
     })
     summary["prompts"][p] = {
         "accuracy": acc,
         "within_one": w1,
+        "mae": metrics["mae"] if metrics else None,
+        "per_class": metrics["per_class"] if metrics else None,
+        "ci": ci or None,
+        # local-classifier cascade prompts only (see task1_notebook_script.LOCAL_CASCADE)
+        "local_share": info.get("local_share"),
+        "llm_calls_avoided": info.get("llm_calls_avoided"),
         "json_validity": json_validity,
         "consensus": consensus
     }
@@ -88,13 +91,25 @@ with open(OUT_JSON,"w",encoding="utf-8") as f:
     json.dump(summary,f,indent=2,ensure_ascii=False)
 
 # Write markdown table
+def fmt_ci(interval):
+    return f"[{interval[0]:.3f}, {interval[1]:.3f}]" if interval else "None"
+
 lines = []
-lines.append("| Prompt | Exact Acc | Within±1 | JSON validity (sample) | Consensus (if computed) |")
-lines.append("|---|---:|---:|---:|---:|")
+lines.append("| Prompt | Exact Acc | Acc 95% CI | Within±1 | MAE | JSON validity (sample) | Consensus (if computed) "
+             "| Answered locally | LLM calls avoided |")
+lines.append("|---|---:|---:|---:|---:|---:|---:|---:|---:|")
 for t in table:
-    lines.append(f"| {t['prompt']} | {t['accuracy']} | {t['within_one']} | {t['json_validity']} | {t['consensus']} |")
+    local = f"{t['local_share']:.1%}" if t["local_share"] is not None else "-"
+    avoided = t["llm_calls_avoided"] if t["llm_calls_avoided"] is not None else "-"
+    lines.append(f"| {t['prompt']} | {t['accuracy']} | {fmt_ci(t['accuracy_ci'])} | {t['within_one']} | {t['mae']} | "
+                 f"{t['json_validity']} | {t['consensus']} | {local} | {avoided} |")
 
 md = "\n".join(lines)
 open(OUT_MD,"w",encoding="utf-8").write(md)
 print("Wrote", OUT_JSON, "and", OUT_MD)
-print(md)
\ No newline at end of file
+print(md)
+local = R.get("metadata", {}).get("local_classifier")
+if local:
+    print(f"\nLocal classifier: hold-out accuracy {local['holdout_accuracy']:.3f}, confident on "
+          f"{local['holdout_coverage']:.1%} at threshold {local['threshold']} "
+          f"(accuracy when confident {local['holdout_confident_accuracy']})")
\ No newline at end of file
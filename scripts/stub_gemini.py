@@ -0,0 +1,61 @@
+# scripts/stub_gemini.py
+# Minimal local stand-in for the Gemini generateContent endpoint, used by the
+# check_*.py scripts. It speaks HTTP/1.1 with keep-alive, counts the TCP
+# connections it accepts and records every JSON request body it receives.
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubGemini:
+    """
+    Start with start(), point llm_client2.GEMINI_URL at .url, stop with stop().
+    - connections: TCP connections accepted (one handshake each)
+    - requests: parsed request bodies, in arrival order
+    - reply_text: text returned as candidates[0].content.parts[0].text
+    """
+
+    def __init__(self, reply_text: str = '{"predicted_stars": 4}', delay: float = 0.0):
+        self.reply_text = reply_text
+        self.delay = delay
+        self.connections = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep the connection open between requests
+            disable_nagle_algorithm = True  # no delayed-ACK stalls between keep-alive responses
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with stub._lock:
+                    stub.requests.append(json.loads(body or b"{}"))
+                if stub.delay:
+                    threading.Event().wait(stub.delay)
+                out = json.dumps({"candidates": [{"content": {"parts": [{"text": stub.reply_text}]}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}/v1beta/models/stub:generateContent"
+
+    def start(self) -> "StubGemini":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
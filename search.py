@@ -0,0 +1,112 @@
+# search.py (full-text search over submissions via the FTS5 index)
+import os
+import re
+import sqlite3
+
+# markers placed around matched terms in snippets (markdown bold)
+SNIPPET_OPEN = "**"
+SNIPPET_CLOSE = "**"
+SNIPPET_TOKENS = 16
+
+# bm25 is computed for every candidate row, so ranking cost grows with the number
+# of matches. Only the newest RANK_WINDOW matches are ranked; a common word then
+# costs the same at 10k rows as at 10M. 0 ranks every match. Callers are told
+# when older matches were left out (see search_submissions).
+RANK_WINDOW = int(os.environ.get("SEARCH_RANK_WINDOW", "5000"))
+
+# snippet column order matches submissions_fts (see storage._migrate_search_index)
+SNIPPET_COLUMNS = ("review", "ai_summary", "explanation")
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression:
+    - every word must match (implicit AND)
+    - "quoted text" matches as a phrase
+    - a trailing * makes a word a prefix (e.g. cust*)
+    FTS5 operators and punctuation in the input are treated as plain text,
+    so user input can never produce a syntax error. Returns "" if there are no words.
+    """
+    parts = []
+    for phrase, word, star in re.findall(r'"([^"]*)"|(\w+)(\*?)', text or ""):
+        if phrase:
+            tokens = re.findall(r"\w+", phrase)
+            if tokens:
+                parts.append('"' + " ".join(tokens) + '"')
+        elif word:
+            parts.append(f'"{word}"{star}')
+    return " ".join(parts)
+
+
+def column_query(text: str, column: str) -> str:
+    """fts_query(text) restricted to one submissions_fts column ("" if there are no words)."""
+    match = fts_query(text)
+    return f"{column} : ({match})" if match else ""
+
+
+def search_submissions(conn: sqlite3.Connection, match: str, limit: int, offset: int = 0,
+                       rating=None, predicted_stars=None, rank_window: int = RANK_WINDOW) -> tuple:
+    """
+    Return (results, truncated): up to `limit` submissions matching the FTS5
+    expression `match`, best first (bm25 rank, weights in storage.SEARCH_WEIGHTS),
+    skipping `offset`.
+    - only the newest `rank_window` matches (after filters) are ranked: the
+      window start is found by walking the index in rowid order, which needs
+      no scoring. truncated is True when older matches were left out, so
+      offsets past rank_window never return anything
+    - the page is picked from the index first; snippets and row data are then
+      read for those rows only
+    """
+    where, params = ["submissions_fts MATCH ?"], [match]
+    join = ""
+    if rating is not None or predicted_stars is not None:
+        join = " JOIN submissions ON submissions.id = submissions_fts.rowid"
+        if rating is not None:
+            where.append("submissions.rating = ?")
+            params.append(rating)
+        if predicted_stars is not None:
+            where.append("submissions.predicted_stars = ?")
+            params.append(predicted_stars)
+    truncated = False
+    if rank_window > 0:
+        # the oldest match in the window, and the next older one if there is any
+        edge = conn.execute(
+            f"SELECT submissions_fts.rowid FROM submissions_fts{join} WHERE {' AND '.join(where)} "
+            "ORDER BY submissions_fts.rowid DESC LIMIT 2 OFFSET ?",
+            params + [rank_window - 1],
+        ).fetchall()
+        if edge:
+            where.append("submissions_fts.rowid >= ?")
+            params.append(edge[0][0])
+            truncated = len(edge) > 1
+    page = conn.execute(
+        f"SELECT submissions_fts.rowid, rank FROM submissions_fts{join} WHERE {' AND '.join(where)} "
+        "ORDER BY rank LIMIT ? OFFSET ?",
+        params + [limit, offset],
+    ).fetchall()
+    if not page:
+        return [], truncated
+
+    ranks = dict(page)
+    placeholders = ", ".join("?" * len(ranks))
+    snippets = ", ".join(
+        f"snippet(submissions_fts, {i}, ?, ?, '…', {SNIPPET_TOKENS}) AS {name}_snippet"
+        for i, name in enumerate(SNIPPET_COLUMNS)
+    )
+    cur = conn.execute(
+        f"""
+        SELECT submissions.id, submissions.rating, submissions.predicted_stars, submissions.status,
+               submissions.created_at, submissions.review, submissions.ai_summary, {snippets}
+        FROM submissions_fts JOIN submissions ON submissions.id = submissions_fts.rowid
+        WHERE submissions_fts MATCH ? AND submissions_fts.rowid IN ({placeholders})
+        """,
+        [SNIPPET_OPEN, SNIPPET_CLOSE] * len(SNIPPET_COLUMNS) + [match] + list(ranks),
+    )
+    cols = [column[0] for column in cur.description]
+    results = []
+    for row in cur.fetchall():
+        item = dict(zip(cols, row))
+        item["score"] = -ranks[item["id"]]  # bm25 rank is lower-is-better
+        results.append(item)
+    results.sort(key=lambda item: (-item["score"], item["id"]))
+    return results, truncated
@@ -0,0 +1,54 @@
+# singleflight.py (share one in-flight LLM call between identical concurrent requests)
+import asyncio
+
+
+def review_key(review: str, rating: int) -> str:
+    """
+    Coalescing key for a submission: the review with case and whitespace
+    normalised, plus the rating. Double-submits and client retries map to the
+    same key even if a trailing space or newline differs.
+    """
+    return f"{int(rating)}:{' '.join(str(review).split()).casefold()}"
+
+
+class SingleFlight:
+    """
+    Per-key deduplication of concurrent coroutines (asyncio only).
+    do(key, fn) runs fn() unless a call with the same key is already running,
+    in which case it awaits that call's result (or exception) instead. Nothing
+    is remembered once a call finishes; repeated sequential calls are the
+    response cache's job (llm_cache.py).
+    The shared call runs as its own task, so a caller that is cancelled (e.g.
+    the client disconnected) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.joined = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.joined += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every caller went away
+
+    def stats(self) -> dict:
+        total = self.leaders + self.joined
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.leaders,
+            "coalesced": self.joined,
+            "coalesced_ratio": (self.joined / total) if total else 0.0,
+        }
@@ -0,0 +1,420 @@
+# storage.py (SQLite connection management for the FastAPI backend)
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from schemas import analysis_columns
+from near_duplicates import NEAR_DUP_INDEX, catch_up_index, index_review
+
+# -------------------------
+# Configuration
+# -------------------------
+DATA_DIR = "data"
+os.makedirs(DATA_DIR, exist_ok=True)
+DB_PATH = os.environ.get("DB_PATH", os.path.join(DATA_DIR, "submissions.db"))
+
+# WAL lets dashboard reads proceed while a review insert is being committed.
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+# NORMAL is durable across application crashes in WAL mode; FULL also survives power loss.
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Size of each connection's prepared-statement cache
+SQLITE_CACHED_STATEMENTS = int(os.environ.get("SQLITE_CACHED_STATEMENTS", "256"))
+
+# Group commit: writes queued within WRITE_BATCH_WINDOW_MS (up to
+# WRITE_BATCH_MAX_ROWS) share one transaction / one fsync. Callers are only
+# acknowledged after their batch commits, so durability is still governed by
+# SQLITE_SYNCHRONOUS. WRITE_BATCH_ENABLED=0 commits every write on its own.
+WRITE_BATCH_ENABLED = os.environ.get("WRITE_BATCH_ENABLED", "1") == "1"
+WRITE_BATCH_WINDOW_MS = float(os.environ.get("WRITE_BATCH_WINDOW_MS", "5"))
+WRITE_BATCH_MAX_ROWS = int(os.environ.get("WRITE_BATCH_MAX_ROWS", "64"))
+
+# bm25 column weights for the full-text index: review, ai_summary, explanation
+SEARCH_WEIGHTS = (1.0, 0.75, 0.5)
+
+_local = threading.local()
+
+
+def connect(check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Open a new connection to DB_PATH with the backend's pragmas applied:
+    journal mode, synchronous level and busy timeout.
+    Use this for connections with their own lifetime (e.g. a streaming export);
+    request handlers should use get_connection() instead.
+    """
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+        check_same_thread=check_same_thread,
+    )
+    conn.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return this thread's long-lived connection, opening it on first use.
+    Connections are never shared between threads and stay open for the life
+    of the process, so repeated queries reuse the prepared-statement cache.
+    Do not close the returned connection.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = connect()
+        _local.conn = conn
+    return conn
+
+
+def _columns(conn: sqlite3.Connection) -> set:
+    return {row[1] for row in conn.execute("PRAGMA table_info(submissions)")}
+
+
+def _migrate_status(conn: sqlite3.Connection):
+    """processing status for queued (async) submissions"""
+    columns = _columns(conn)
+    if "status" not in columns:
+        conn.execute("ALTER TABLE submissions ADD COLUMN status TEXT NOT NULL DEFAULT 'done'")
+    if "error" not in columns:
+        conn.execute("ALTER TABLE submissions ADD COLUMN error TEXT")
+    # partial index: only unfinished rows, used to requeue them on startup
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_pending ON submissions(id) WHERE status = 'pending'")
+
+
+def _migrate_analysis_columns(conn: sqlite3.Connection):
+    """typed analysis columns + recommendations table, backfilled from admin_json"""
+    columns = _columns(conn)
+    for name, sql_type in (("predicted_stars", "INTEGER"), ("ai_summary", "TEXT"), ("explanation", "TEXT")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE submissions ADD COLUMN {name} {sql_type}")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS submission_recommendations (
+        submission_id INTEGER NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        recommendation TEXT NOT NULL,
+        PRIMARY KEY (submission_id, position)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_predicted_stars ON submissions(predicted_stars)")
+    # mismatch filter: abs(predicted_stars - rating) >= N is a range scan on this index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_star_diff ON submissions(abs(predicted_stars - rating))")
+
+    # one-time backfill, in id order and bounded chunks, with the same rules as write time
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, admin_json FROM submissions WHERE id > ? AND admin_json IS NOT NULL ORDER BY id LIMIT 1000",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            break
+        for sid, admin_json in rows:
+            try:
+                admin_obj = json.loads(admin_json)
+            except Exception:
+                admin_obj = {}
+            _write_analysis_columns(conn, sid, admin_obj)
+        last_id = rows[-1][0]
+
+
+def _migrate_search_index(conn: sqlite3.Connection):
+    """FTS5 full-text index over review, ai_summary and explanation"""
+    # external-content table: the index stores only tokens, the text stays in submissions
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5(
+        review, ai_summary, explanation,
+        content='submissions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    # kept in sync by triggers, so every write path (and any manual SQL) updates it
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS submissions_fts_insert AFTER INSERT ON submissions BEGIN
+        INSERT INTO submissions_fts(rowid, review, ai_summary, explanation)
+        VALUES (new.id, new.review, new.ai_summary, new.explanation);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS submissions_fts_delete AFTER DELETE ON submissions BEGIN
+        INSERT INTO submissions_fts(submissions_fts, rowid, review, ai_summary, explanation)
+        VALUES ('delete', old.id, old.review, old.ai_summary, old.explanation);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS submissions_fts_update AFTER UPDATE OF review, ai_summary, explanation ON submissions BEGIN
+        INSERT INTO submissions_fts(submissions_fts, rowid, review, ai_summary, explanation)
+        VALUES ('delete', old.id, old.review, old.ai_summary, old.explanation);
+        INSERT INTO submissions_fts(rowid, review, ai_summary, explanation)
+        VALUES (new.id, new.review, new.ai_summary, new.explanation);
+    END
+    """)
+    # ranking used by ORDER BY rank: bm25 with the review weighted above the AI fields
+    conn.execute(
+        "INSERT INTO submissions_fts(submissions_fts, rank) VALUES ('rank', ?)",
+        (f"bm25({', '.join(str(w) for w in SEARCH_WEIGHTS)})",),
+    )
+    # index the rows that already exist
+    conn.execute("INSERT INTO submissions_fts(submissions_fts) VALUES ('rebuild')")
+
+
+def _migrate_near_duplicate_index(conn: sqlite3.Connection):
+    """MinHash/LSH bucket table for near-duplicate reviews"""
+    # one row per (LSH band bucket, submission); see near_duplicates.band_keys
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS submission_lsh (
+        bucket INTEGER NOT NULL,
+        submission_id INTEGER NOT NULL,
+        PRIMARY KEY (bucket, submission_id)
+    ) WITHOUT ROWID
+    """)
+
+
+def _migrate_near_duplicate_watermark(conn: sqlite3.Connection):
+    """near-duplicate index watermark, so it can be filled only while enabled"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS submission_lsh_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        indexed_through INTEGER NOT NULL
+    )
+    """)
+    # a non-empty submission_lsh was filled on every insert (and backfilled by
+    # migration 4 before it stopped doing so); an empty one has nothing indexed
+    indexed = conn.execute("SELECT 1 FROM submission_lsh LIMIT 1").fetchone() is not None
+    through = conn.execute("SELECT COALESCE(MAX(id), 0) FROM submissions").fetchone()[0] if indexed else 0
+    conn.execute("INSERT OR IGNORE INTO submission_lsh_state (id, indexed_through) VALUES (1, ?)", (through,))
+
+
+# Applied in order to databases whose PRAGMA user_version is below their position
+MIGRATIONS = [_migrate_status, _migrate_analysis_columns, _migrate_search_index, _migrate_near_duplicate_index,
+              _migrate_near_duplicate_watermark]
+
+
+def init_db():
+    """
+    Create the submissions table if it does not exist and bring its schema up
+    to date. PRAGMA user_version records how many MIGRATIONS have been applied;
+    each migration runs once, in its own transaction.
+    - status: 'pending' (queued for analysis), 'done' or 'failed'; error: failure message
+    - predicted_stars / ai_summary / explanation: typed copies of the parsed
+      admin_json fields; ai_recommendations live in submission_recommendations
+    - submissions_fts: FTS5 index over review / ai_summary / explanation
+    - submission_lsh: MinHash/LSH buckets of each review (near_duplicates.py),
+      kept up to date only with NEAR_DUP_INDEX; rows stored while it was off
+      are indexed here on the next start with it on
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rating INTEGER,
+            review TEXT,
+            ai_response TEXT,
+            admin_json TEXT,
+            created_at TEXT
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_created_at ON submissions(created_at)")
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migrate in enumerate(MIGRATIONS, 1):
+        if version >= number:
+            continue
+        with conn:
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+        print(f"Applied schema migration {number}: {migrate.__doc__}")
+
+    if NEAR_DUP_INDEX:
+        indexed = catch_up_index(conn)
+        if indexed:
+            print(f"Near-duplicate index: added {indexed} submissions stored while NEAR_DUP_INDEX was off")
+
+
+# -------------------------
+# Row writers (run on the writer thread via GroupCommitWriter.call)
+# -------------------------
+def _write_recommendations(conn: sqlite3.Connection, sid: int, recommendations: list, replace: bool = True):
+    if replace:
+        conn.execute("DELETE FROM submission_recommendations WHERE submission_id = ?", (sid,))
+    conn.executemany(
+        "INSERT INTO submission_recommendations (submission_id, position, recommendation) VALUES (?, ?, ?)",
+        [(sid, position, rec) for position, rec in enumerate(recommendations)],
+    )
+
+
+def _write_analysis_columns(conn: sqlite3.Connection, sid: int, admin_obj: dict):
+    columns = analysis_columns(admin_obj)
+    conn.execute(
+        "UPDATE submissions SET predicted_stars = ?, ai_summary = ?, explanation = ? WHERE id = ?",
+        (columns["predicted_stars"], columns["ai_summary"], columns["explanation"], sid),
+    )
+    _write_recommendations(conn, sid, columns["ai_recommendations"])
+
+
+def insert_submission_row(conn: sqlite3.Connection, rating: int, review: str, created_at: str,
+                          ai_response: str = None, admin_obj: dict = None, status: str = "done") -> int:
+    """
+    Insert one submission and return its id. admin_obj (the parsed LLM object)
+    is stored both as admin_json and in the typed analysis columns, in a single
+    INSERT so the search index trigger fires once. With NEAR_DUP_INDEX the
+    review is added to the near-duplicate index in the same transaction.
+    """
+    columns = analysis_columns(admin_obj) if admin_obj is not None else {}
+    sid = conn.execute(
+        "INSERT INTO submissions (rating, review, ai_response, admin_json, created_at, status, "
+        "predicted_stars, ai_summary, explanation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            rating,
+            review,
+            ai_response,
+            json.dumps(admin_obj, ensure_ascii=False) if admin_obj is not None else None,
+            created_at,
+            status,
+            columns.get("predicted_stars"),
+            columns.get("ai_summary"),
+            columns.get("explanation"),
+        ),
+    ).lastrowid
+    if columns.get("ai_recommendations"):
+        _write_recommendations(conn, sid, columns["ai_recommendations"], replace=False)
+    if NEAR_DUP_INDEX:
+        index_review(conn, sid, review)
+    return sid
+
+
+def complete_submission_row(conn: sqlite3.Connection, sid: int, ai_response: str, admin_obj: dict):
+    """Store the analysis for a pending submission and mark it done."""
+    columns = analysis_columns(admin_obj)
+    conn.execute(
+        "UPDATE submissions SET status = 'done', error = NULL, ai_response = ?, admin_json = ?, "
+        "predicted_stars = ?, ai_summary = ?, explanation = ? WHERE id = ?",
+        (
+            ai_response,
+            json.dumps(admin_obj, ensure_ascii=False),
+            columns["predicted_stars"],
+            columns["ai_summary"],
+            columns["explanation"],
+            sid,
+        ),
+    )
+    _write_recommendations(conn, sid, columns["ai_recommendations"])
+
+
+class GroupCommitWriter:
+    """
+    Async write-behind queue. execute() enqueues one statement and resolves
+    to its lastrowid once the batch containing it has been committed; call()
+    does the same for a function fn(conn) that issues several statements.
+    Writes run on a single dedicated thread (with its own connection from
+    get_connection()), so the event loop never waits on SQLite or fsync.
+    Each write runs inside its own savepoint: one that raises is rolled back
+    and fails only its own caller; the rest of the batch still commits.
+    """
+
+    def __init__(self, window_ms=WRITE_BATCH_WINDOW_MS, max_rows=WRITE_BATCH_MAX_ROWS, enabled=WRITE_BATCH_ENABLED):
+        self.window_s = max(0.0, float(window_ms)) / 1000.0 if enabled else 0.0
+        self.max_rows = max(1, int(max_rows)) if enabled else 1
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._queue = None
+        self._task = None
+        self._loop = None
+        self.batches = 0
+        self.rows = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def execute(self, sql: str, params=()) -> int:
+        """Queue one write and wait until it is committed. Returns cursor.lastrowid."""
+        return await self.call(lambda conn: conn.execute(sql, params).lastrowid)
+
+    async def call(self, fn):
+        """Queue fn(conn) and wait until its writes are committed. Returns fn's result."""
+        self._ensure_started()
+        fut = self._loop.create_future()
+        await self._queue.put((fn, fut))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # still take whatever is already waiting, without blocking
+                    if self._queue.empty():
+                        break
+                    batch.append(self._queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                outcomes = await loop.run_in_executor(self._executor, self._commit_batch, batch)
+            except Exception as e:
+                outcomes = [e] * len(batch)
+            for (_, fut), outcome in zip(batch, outcomes):
+                if fut.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    fut.set_exception(outcome)
+                else:
+                    fut.set_result(outcome)
+
+    def _commit_batch(self, batch):
+        conn = get_connection()
+        outcomes = []
+        with conn:
+            if not conn.in_transaction:
+                # explicit BEGIN so releasing a savepoint does not commit on its own
+                conn.execute("BEGIN")
+            for fn, _ in batch:
+                conn.execute("SAVEPOINT batch_item")
+                try:
+                    outcomes.append(fn(conn))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO batch_item")
+                    outcomes.append(e)
+                conn.execute("RELEASE batch_item")
+        self.batches += 1
+        self.rows += len(batch)
+        return outcomes
+
+    async def flush(self):
+        """Wait until everything queued so far has been committed."""
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self.execute("SELECT 1")
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": (self.rows / self.batches) if self.batches else None,
+            "window_ms": self.window_s * 1000.0,
+            "max_rows": self.max_rows,
+        }
+
+
+_writer = None
+
+def get_writer() -> GroupCommitWriter:
+    """Return the process-wide group-commit writer."""
+    global _writer
+    if _writer is None:
+        _writer = GroupCommitWriter()
+    return _writer
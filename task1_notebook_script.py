@@ -1,6 +1,9 @@
 # task1_notebook_script.py (UPDATED: load dataset directly from data/yelp_reviews.csv)
 import os
 import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -10,11 +13,16 @@ from datetime import datetime, timezone
 from collections import Counter
 
 import pandas as pd
-from sklearn.metrics import accuracy_score, confusion_matrix
 
 # Import the LLM helper and the model name constant exported by llm_client
 from llm_client2 import generate_text, GEMINI_MODEL as LLM_MODEL
+import llm_cache
 from prompts import PROMPT_MAP
+from schemas import TASK1_RESPONSE_SCHEMA, TASK1_BATCH_RESPONSE_SCHEMA, coerce_stars
+from llm_parsing import find_json_blocks
+from rate_limiter import RateLimiter
+from metrics import rating_metrics, star_array
+from local_classifier import LOCAL_CONFIDENCE_THRESHOLD, LOCAL_MIN_TRAIN_ROWS, train_or_load
 
 # ---------- Config ----------
 SAMPLE_SIZE = int(os.environ.get("SAMPLE_SIZE", "200"))
@@ -22,7 +30,37 @@ OUTPUT_RESULTS = "task1_results.json"
 PROMPT_KEYS = ["base", "fewshot", "rubric_cot"]
 PROMPTS = {f"P{i+1}_{k}": PROMPT_MAP.get(k) for i, k in enumerate(PROMPT_KEYS)}
 
+# Batched classification: one request rates K reviews. Each size in BATCH_SIZES adds a
+# prompt variant (e.g. "P4_batch_k5") so accuracy vs calls can be compared per size.
+# Items missing or malformed in the batch output are retried (only those) up to
+# BATCH_MAX_ATTEMPTS times. Set BATCH_SIZES="" to skip batched runs.
+BATCH_SIZES = [int(k) for k in os.environ.get("BATCH_SIZES", "5").split(",") if k.strip()]
+BATCH_MAX_ATTEMPTS = int(os.environ.get("BATCH_MAX_ATTEMPTS", "3"))
+BATCH_PROMPTS = {}
+for _k in BATCH_SIZES:
+    _name = f"P{len(PROMPTS)+1}_batch_k{_k}"
+    PROMPTS[_name] = PROMPT_MAP.get("batch")
+    BATCH_PROMPTS[_name] = _k
+
+# Local-classifier cascade (see local_classifier.py): adds a prompt variant that
+# uses the local model's answer when its confidence is >= LOCAL_CONFIDENCE_THRESHOLD
+# and calls the LLM with this PROMPT_MAP template otherwise, e.g. LOCAL_CASCADE=base.
+# The model is trained on the dataset rows outside the evaluation sample. "" disables.
+LOCAL_CASCADE = os.environ.get("LOCAL_CASCADE", "")
+CASCADE_PROMPTS = set()
+if LOCAL_CASCADE:
+    _name = f"P{len(PROMPTS)+1}_cascade_{LOCAL_CASCADE}"
+    PROMPTS[_name] = PROMPT_MAP.get(LOCAL_CASCADE)
+    CASCADE_PROMPTS.add(_name)
+
 ENSEMBLE_RUNS = int(os.environ.get("ENSEMBLE_RUNS", "1"))
+# Ensemble runs for one review are issued concurrently. "adaptive" issues only as
+# many as could still decide the vote and stops once the majority cannot change;
+# "all" always runs ENSEMBLE_RUNS calls.
+ENSEMBLE_MODE = os.environ.get("ENSEMBLE_MODE", "adaptive")
+# Adaptive mode also stops as soon as one star has this many votes (0 = only stop
+# when the majority is decided). E.g. 2 with 5 runs: two agreeing runs are enough.
+ENSEMBLE_AGREE_VOTES = int(os.environ.get("ENSEMBLE_AGREE_VOTES", "0"))
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 PREFERRED_CSV = os.path.join(DATA_DIR, "yelp_reviews.csv")
 FALLBACK_CSV = os.path.join(DATA_DIR, "sample_yelp.csv")
@@ -31,6 +69,23 @@ FALLBACK_CSV = os.path.join(DATA_DIR, "sample_yelp.csv")
 LLM_TIMEOUT = int(os.environ.get("LLM_TIMEOUT", "20"))  # seconds for each call
 LLM_MAX_TOKENS = int(os.environ.get("LLM_MAX_TOKENS", "512"))
 LLM_TEMPERATURE = float(os.environ.get("LLM_TEMPERATURE", "0.0"))
+# Request schema-constrained JSON ({predicted_stars, explanation}) from Gemini
+LLM_STRUCTURED_OUTPUT = os.environ.get("LLM_STRUCTURED_OUTPUT", "1") == "1"
+
+# Concurrent evaluation engine: worker threads + quota-based rate limiting
+# (replaces the fixed 4s sleep per review). Set LLM_RPM / LLM_TPM to your real quota.
+EVAL_CONCURRENCY = int(os.environ.get("EVAL_CONCURRENCY", "8"))
+LLM_RPM = float(os.environ.get("LLM_RPM", "15"))
+LLM_TPM = float(os.environ.get("LLM_TPM", "0"))  # 0 = no tokens-per-minute limit
+# Requests that may be sent back to back; keeps every 60 s window within LLM_RPM (+ burst - 1)
+LLM_BURST = float(os.environ.get("LLM_BURST", "1"))
+RATE_LIMITER = RateLimiter(rpm=LLM_RPM, tpm=LLM_TPM, burst=LLM_BURST)
+# Separate pool for the runs of one ensemble vote (evaluation workers block on them)
+ENSEMBLE_POOL = ThreadPoolExecutor(max_workers=max(1, EVAL_CONCURRENCY * ENSEMBLE_RUNS))
+
+# Append-only per-sample result log. Completed (prompt, sample) pairs found here are
+# skipped on the next run and all metrics are computed from the log. "" disables it.
+EVAL_CHECKPOINT = os.environ.get("EVAL_CHECKPOINT", "task1_checkpoint.jsonl")
 # ----------------------------
 
 def load_local_dataset():
@@ -143,6 +198,19 @@ def extract_star_from_dict_or_text(out):
                 continue
     return -1
 
+def call_llm(prompt: str, response_schema: dict, max_output_tokens: int = LLM_MAX_TOKENS) -> str:
+    """Rate-limited generate_text() call shared by the single and batched paths."""
+    # every request that reaches Gemini (including each ensemble run) draws from
+    # the shared quota; response-cache hits do not
+    return generate_text(
+        prompt,
+        max_output_tokens=max_output_tokens,
+        temperature=LLM_TEMPERATURE,
+        timeout=LLM_TIMEOUT,
+        response_schema=response_schema if LLM_STRUCTURED_OUTPUT else None,
+        rate_limiter=RATE_LIMITER,
+    )
+
 def generate_task1_prediction_local(review_text: str, prompt_template: str):
     """
     Local wrapper to call generate_text() from llm_client.
@@ -163,7 +231,7 @@ def generate_task1_prediction_local(review_text: str, prompt_template: str):
             prompt = f"{prompt_template}\n\nReview:\n{review_text}"
 
     try:
-        raw = generate_text(prompt, max_output_tokens=LLM_MAX_TOKENS, temperature=LLM_TEMPERATURE, timeout=LLM_TIMEOUT)
+        raw = call_llm(prompt, TASK1_RESPONSE_SCHEMA)
     except Exception as e:
         return {"error": f"LLM call failed: {e}"}
 
@@ -193,33 +261,212 @@ def generate_task1_prediction_local(review_text: str, prompt_template: str):
     # fallback: return raw text
     return {"raw_text": txt}
 
-def generate_majority_prediction(review_text: str, prompt_template: str, runs: int = ENSEMBLE_RUNS):
+def _calls_to_decide(counts: Counter, done: int, runs: int) -> int:
+    """
+    Fewest further runs that could settle the vote if they all agreed with the
+    current leader; 0 once it is settled.
+    - decided: the leader is ahead of the runner-up by more than the runs left
+    - agreement: the leader has ENSEMBLE_AGREE_VOTES votes
     """
-    Call the local generate_task1_prediction multiple times and return majority vote plus raw outputs.
+    ranked = [c for _, c in counts.most_common(2)] + [0, 0]
+    leader, second = ranked[0], ranked[1]
+    remaining = runs - done
+    need = max(0, (second + remaining - leader) // 2 + 1) if leader <= second + remaining else 0
+    if ENSEMBLE_AGREE_VOTES > 0:
+        need = min(need, max(0, ENSEMBLE_AGREE_VOTES - leader))
+    return min(need, remaining)
+
+def generate_majority_prediction(review_text: str, prompt_template: str, runs: int = ENSEMBLE_RUNS,
+                                 mode: str = ENSEMBLE_MODE):
     """
+    Call generate_task1_prediction_local() up to `runs` times concurrently and
+    return (majority star or -1, raw outputs, calls issued).
+    In "adaptive" mode the first wave is just large enough to form a majority;
+    more runs are issued only while the vote is still open, and calls not yet
+    started are cancelled once it is decided. runs - calls is the saving.
+    When the calls are cacheable (LLM_TEMPERATURE 0), every run sends the same
+    request and the others would only replay the first run's cached reply, so
+    a single run is made (and counted).
+    """
+    if llm_cache.is_cacheable(LLM_TEMPERATURE):
+        runs = 1
+    counts = Counter()
     raws = []
-    preds = []
-    for _ in range(runs):
-        out = generate_task1_prediction_local(review_text, prompt_template)
-        raws.append(out)
-        p = extract_star_from_dict_or_text(out)
-        preds.append(p if p != -1 else None)
-
-    # majority vote among non-None
-    counts = Counter([p for p in preds if p is not None])
+    done = issued = 0
+    in_flight = set()
+    while True:
+        if mode == "adaptive":
+            need = _calls_to_decide(counts, done, runs)
+            if need == 0 and raws:
+                break
+            want = max(need, 1) - len(in_flight)
+        else:
+            want = runs - issued
+        for _ in range(max(0, min(want, runs - issued))):
+            in_flight.add(ENSEMBLE_POOL.submit(generate_task1_prediction_local, review_text, prompt_template))
+            issued += 1
+        if not in_flight:
+            break
+        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        for fut in finished:
+            out = fut.result()
+            raws.append(out)
+            done += 1
+            p = extract_star_from_dict_or_text(out)
+            if p != -1:
+                counts[p] += 1
+    # runs still in flight are not waited for; the ones that had not started are not billed
+    issued -= sum(1 for fut in in_flight if fut.cancel())
+
+    # majority vote among parsed runs
     if counts:
-        return counts.most_common(1)[0][0], raws
+        return counts.most_common(1)[0][0], raws, issued
 
     # fallback: -1
-    return -1, raws
+    return -1, raws, issued
+
+def _parse_batch_output(raw: str) -> list:
+    """
+    Turn a batched response into a list of dicts. Accepts a JSON array, an array
+    embedded in prose, or (if the array is broken) any individual {...} objects.
+    """
+    txt = str(raw or "").strip()
+    for candidate in (txt, txt[txt.find("["):txt.rfind("]") + 1] if "[" in txt else ""):
+        try:
+            parsed = json.loads(candidate)
+        except Exception:
+            continue
+        if isinstance(parsed, list):
+            return [item for item in parsed if isinstance(item, dict)]
+    items = []
+    for block in find_json_blocks(txt):
+        try:
+            obj = json.loads(block)
+        except Exception:
+            continue
+        if isinstance(obj, dict):
+            items.append(obj)
+    return items
+
+def generate_batch_predictions(review_texts: list, prompt_template: str):
+    """
+    Rate several reviews with one request per attempt.
+    Returns (results, calls) where results[j] = (pred, raw) for review_texts[j].
+    Reviews whose entry is missing or invalid are re-sent (only those) in the
+    next attempt; after BATCH_MAX_ATTEMPTS they get pred -1.
+    """
+    results = [(-1, {"error": "batch_item_failed"}) for _ in review_texts]
+    pending = list(range(len(review_texts)))
+    calls = 0
+    for _attempt in range(max(1, BATCH_MAX_ATTEMPTS)):
+        if not pending:
+            break
+        lines = "\n".join(f"[{pos}] {json.dumps(review_texts[j], ensure_ascii=False)}" for pos, j in enumerate(pending))
+        prompt = prompt_template.format(reviews=lines)
+        # room for one short object per review
+        max_tokens = max(LLM_MAX_TOKENS, 64 * len(pending))
+        calls += 1
+        try:
+            items = _parse_batch_output(call_llm(prompt, TASK1_BATCH_RESPONSE_SCHEMA, max_output_tokens=max_tokens))
+        except Exception as e:
+            print(f"[warning] batch LLM call failed ({len(pending)} reviews): {e}")
+            continue
+
+        by_pos = {}
+        for item in items:
+            try:
+                pos = int(item.get("index"))
+            except (TypeError, ValueError):
+                continue
+            if 0 <= pos < len(pending) and coerce_stars(item.get("predicted_stars")) is not None:
+                by_pos.setdefault(pos, item)
+
+        still_pending = []
+        for pos, j in enumerate(pending):
+            item = by_pos.get(pos)
+            if item is None:
+                still_pending.append(j)
+            else:
+                results[j] = (coerce_stars(item["predicted_stars"]), item)
+        pending = still_pending
+    return results, calls
+
+def sample_hash(review_text: str) -> str:
+    return hashlib.sha256(review_text.encode("utf-8")).hexdigest()
+
+def checkpoint_key(prompt_name: str, prompt_template: str, review_text: str) -> str:
+    """
+    Identify one evaluation result. Changing the prompt text, model, ensemble
+    size or any generation setting (LLM_TEMPERATURE, LLM_STRUCTURED_OUTPUT,
+    LLM_MAX_TOKENS) produces a new key, so stale results are never reused. An
+    agreement cutoff (ENSEMBLE_AGREE_VOTES) can change the vote, so it is part of the key.
+    """
+    ensemble = [ENSEMBLE_RUNS, ENSEMBLE_AGREE_VOTES] if ENSEMBLE_AGREE_VOTES > 0 else ENSEMBLE_RUNS
+    generation = {"temperature": LLM_TEMPERATURE, "structured_output": LLM_STRUCTURED_OUTPUT,
+                  "max_tokens": LLM_MAX_TOKENS}
+    blob = json.dumps([prompt_name, prompt_template, LLM_MODEL, ensemble, generation, sample_hash(review_text)],
+                      sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class CheckpointLog:
+    """
+    Append-only JSONL log of per-sample results, keyed by checkpoint_key().
+    Lines are flushed as soon as they are written, so a crash or Ctrl-C loses
+    at most the calls still in flight. A truncated last line is ignored on load.
+    """
 
-def within_one_accuracy(true_list, pred_list):
-    """Compute within-1 accuracy over valid pairs."""
-    valid_pairs = [(t, p) for t, p in zip(true_list, pred_list) if isinstance(t, int) and 1 <= t <=5 and isinstance(p, int) and 1 <= p <=5]
-    if not valid_pairs:
+    def __init__(self, path: str):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        self._fh = None
+        if not path:
+            return
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        self.records[rec["key"]] = rec
+                    except Exception:
+                        continue
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def get(self, key: str):
+        return self.records.get(key)
+
+    def append(self, rec: dict):
+        with self._lock:
+            self.records[rec["key"]] = rec
+            if self._fh is not None:
+                self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                self._fh.flush()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+def train_local_model(df, sample_df):
+    """
+    Train (or reuse, see local_classifier.train_or_load) the cascade model on the
+    labelled rows that are not in the evaluation sample. Returns None if there
+    are too few of them.
+    """
+    if 'true_stars' not in df.columns:
+        print("[warning] Local cascade needs star labels in the dataset; skipping it.")
         return None
-    valid = sum(1 for t,p in valid_pairs if abs(t - p) <= 1)
-    return valid / len(valid_pairs)
+    train_df = df[~df['review_text'].isin(set(sample_df['review_text']))]
+    labels = star_array(train_df['true_stars'].tolist())
+    keep = labels > 0
+    if keep.sum() < LOCAL_MIN_TRAIN_ROWS:
+        print(f"[warning] Local cascade needs {LOCAL_MIN_TRAIN_ROWS} labelled rows outside the sample, "
+              f"found {int(keep.sum())}; skipping it.")
+        return None
+    model = train_or_load(train_df['review_text'][keep].astype(str).tolist(), labels[keep].tolist())
+    print(f"Local classifier: hold-out accuracy={model.meta['holdout_accuracy']:.3f}, "
+          f"confident on {model.meta['holdout_coverage']:.1%} (threshold {LOCAL_CONFIDENCE_THRESHOLD})")
+    return model
 
 def run():
     print("Loading dataset from data/ ...")
@@ -237,74 +484,152 @@ def run():
         "prompts": {}
     }
 
-    # Iterate over prompts
+    active_prompts = {}
     for name, prompt_template in PROMPTS.items():
         if not prompt_template:
             print(f"Skipping prompt '{name}': Template value is None. Check PROMPT_MAP keys in prompts.py.")
             continue
-            
-        print(f"\n--- Running Prompt: {name} ---")
-        preds = []
-        raw_examples = []
-        parsed_count = 0
-
-        for i, row in sample_df.iterrows():
-            review = str(row.get("review_text", ""))
-            try:
-                # Use the majority prediction helper for ensemble runs
-                pred, raws = generate_majority_prediction(review, prompt_template, runs=ENSEMBLE_RUNS)
-            except Exception as e:
-                print(f"[warning] LLM call failed at idx={i}: {e}")
-                pred, raws = -1, [{}]
-
-            # Store the first run's raw output for examples
-            raw_examples.append(raws[0] if raws else {})
-            
-            if isinstance(pred, int) and 1 <= pred <= 5:
-                parsed_count += 1
-            preds.append(pred if isinstance(pred, int) else -1)
-
-            # --- RATE LIMITING (GEMINI FREE TIER FIX) ---
-            # Sleep 4 seconds to ensure we stay under ~15 RPM (60s/15 = 4s)
-            time.sleep(4)
-
-            if (i + 1) % 5 == 0 or (i + 1) == n:
-                print(f"  Processed {i+1}/{n}")
-
-        # --- Metrics Calculation ---
-        acc, w1, cm = None, None, None
-        
-        if 'true_stars' in sample_df.columns:
-            true_list = []
-            for v in sample_df['true_stars'].tolist()[:len(preds)]:
-                try:
-                    iv = int(v)
-                    true_list.append(iv if 1 <= iv <= 5 else -1)
-                except Exception:
-                    true_list.append(-1)
+        active_prompts[name] = prompt_template
 
-            valid_idx = [i for i, (t, p) in enumerate(zip(true_list, preds)) if isinstance(t, int) and 1 <= t <=5 and isinstance(p, int) and 1 <= p <=5]
-            
-            if valid_idx:
-                y_true = [true_list[i] for i in valid_idx]
-                y_pred = [preds[i] for i in valid_idx]
-                try:
-                    acc = accuracy_score(y_true, y_pred)
-                    cm = confusion_matrix(y_true, y_pred, labels=[1,2,3,4,5])
-                    w1 = within_one_accuracy(y_true, y_pred)
-                except Exception as e:
-                    print(f"[warning] metrics failed for prompt={name}: {e}")
+    local_model = train_local_model(df, sample_df) if CASCADE_PROMPTS & set(active_prompts) else None
+    if local_model is None:
+        active_prompts = {name: t for name, t in active_prompts.items() if name not in CASCADE_PROMPTS}
+    else:
+        results["metadata"]["local_classifier"] = local_model.meta
+    # cascade results also depend on the local model and threshold
+    key_templates = {
+        name: (f"{t}\n[local {local_model.meta['fingerprint']} >= {LOCAL_CONFIDENCE_THRESHOLD}]"
+               if name in CASCADE_PROMPTS else t)
+        for name, t in active_prompts.items()
+    }
+
+    # --- Concurrent evaluation: each job is one sample, or a chunk of samples for batched prompts ---
+    reviews = [str(r) for r in sample_df["review_text"].tolist()]
+    checkpoint = CheckpointLog(EVAL_CHECKPOINT)
+    keys = {
+        (name, i): checkpoint_key(name, prompt_template, reviews[i])
+        for name, prompt_template in key_templates.items()
+        for i in range(n)
+    }
+    jobs = []
+    for name in active_prompts:
+        todo = [i for i in range(n) if checkpoint.get(keys[(name, i)]) is None]
+        size = BATCH_PROMPTS.get(name, 1)
+        jobs += [(name, todo[j:j + size]) for j in range(0, len(todo), size)]
+    pending_count = sum(len(idxs) for _, idxs in jobs)
+    print(f"\nEvaluating {len(active_prompts)} prompts x {n} samples: {len(keys) - pending_count} already in "
+          f"checkpoint '{EVAL_CHECKPOINT}', {pending_count} to run in {len(jobs)} jobs "
+          f"(concurrency={EVAL_CONCURRENCY}, rpm={LLM_RPM:g}, tpm={LLM_TPM:g}, ensemble_runs={ENSEMBLE_RUNS})")
+
+    def evaluate(name, prompt_template, idxs):
+        """Return ([(i, pred, raws)], llm_calls, ensemble_calls_saved) for the samples in idxs."""
+        if name in BATCH_PROMPTS:
+            batch, calls = generate_batch_predictions([reviews[i] for i in idxs], prompt_template)
+            return [(i, pred, [raw]) for i, (pred, raw) in zip(idxs, batch)], calls, 0
+        i = idxs[0]
+        if name in CASCADE_PROMPTS:
+            stars, confidence = local_model.predict_one(reviews[i])
+            if confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+                return [(i, stars, [{"predicted_stars": stars, "confidence": confidence, "source": "local"}])], 0, 0
+        try:
+            # Use the majority prediction helper for ensemble runs
+            pred, raws, calls = generate_majority_prediction(reviews[i], prompt_template, runs=ENSEMBLE_RUNS)
+        except Exception as e:
+            print(f"[warning] LLM call failed for prompt={name} idx={i}: {e}")
+            pred, raws, calls = -1, [{"error": str(e)}], ENSEMBLE_RUNS
+        return [(i, pred, raws)], calls, ENSEMBLE_RUNS - calls
+
+    llm_calls = Counter()
+    calls_saved = Counter()
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=max(1, EVAL_CONCURRENCY))
+    try:
+        futures = {pool.submit(evaluate, name, active_prompts[name], idxs): name for name, idxs in jobs}
+        for done, fut in enumerate(as_completed(futures), 1):
+            name = futures[fut]
+            outcomes, calls, saved = fut.result()
+            llm_calls[name] += calls
+            calls_saved[name] += saved
+            for i, pred, raws in outcomes:
+                # calls that failed outright are not checkpointed, so the next run retries them
+                if raws and all(isinstance(r, dict) and "error" in r for r in raws):
+                    continue
+                checkpoint.append({
+                    "key": keys[(name, i)],
+                    "prompt": name,
+                    "sample_hash": sample_hash(reviews[i]),
+                    "pred": pred if isinstance(pred, int) else -1,
+                    # Store the first run's raw output for examples
+                    "raw": raws[0] if raws else {},
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                })
+            if done % 25 == 0 or done == len(jobs):
+                print(f"  Processed {done}/{len(jobs)} jobs ({time.perf_counter() - started:.1f}s)")
+    except KeyboardInterrupt:
+        print("Interrupted — completed results are saved in the checkpoint; re-run to resume.")
+        pool.shutdown(wait=False, cancel_futures=True)
+        checkpoint.close()
+        raise
+    pool.shutdown(wait=True)
+    checkpoint.close()
+
+    elapsed = time.perf_counter() - started
+    results["metadata"]["elapsed_seconds"] = elapsed
+    results["metadata"]["eval_concurrency"] = EVAL_CONCURRENCY
+    results["metadata"]["rate_limit"] = {"rpm": LLM_RPM, "tpm": LLM_TPM, "burst": LLM_BURST,
+                                         "waits": RATE_LIMITER.waits, "waited_seconds": RATE_LIMITER.waited_seconds}
+    print(f"Finished {len(jobs)} jobs ({sum(llm_calls.values())} LLM calls) in {elapsed:.1f}s")
+    if ENSEMBLE_RUNS > 1:
+        results["metadata"]["ensemble"] = {"runs": ENSEMBLE_RUNS, "mode": ENSEMBLE_MODE,
+                                           "agree_votes": ENSEMBLE_AGREE_VOTES,
+                                           "calls_saved": sum(calls_saved.values())}
+        print(f"Ensemble ({ENSEMBLE_MODE}, {ENSEMBLE_RUNS} runs): {sum(calls_saved.values())} LLM calls saved")
+
+    # --- Metrics are derived from the checkpoint log (this run + earlier runs) ---
+    for name in active_prompts:
+        recs = [checkpoint.get(keys[(name, i)]) for i in range(n)]
+        preds = [rec["pred"] if rec else -1 for rec in recs]
+        raw_examples = [rec["raw"] if rec else {} for rec in recs]
+        parsed_count = sum(1 for p in preds if isinstance(p, int) and 1 <= p <= 5)
+        local_count = sum(1 for raw in raw_examples if isinstance(raw, dict) and raw.get("source") == "local")
+
+        # --- Metrics Calculation (vectorized, see metrics.py) ---
+        metrics = None
+        if 'true_stars' in sample_df.columns:
+            true_stars = star_array(sample_df['true_stars'].tolist()[:len(preds)])
+            metrics = rating_metrics(true_stars, star_array(preds)[:len(true_stars)])
+            if not metrics["compared"]:
+                metrics = None
+        acc = metrics["accuracy"] if metrics else None
+        w1 = metrics["within_one"] if metrics else None
 
         results["prompts"][name] = {
             "parsed_count": parsed_count,
             "parsed_percent": parsed_count / len(preds) if preds else 0.0,
             "accuracy": acc,
             "within_one_accuracy": w1,
-            "confusion": cm.tolist() if cm is not None else None,
-            "raw_outputs_example": raw_examples[:3]
+            "mae": metrics["mae"] if metrics else None,
+            "confusion": metrics["confusion"] if metrics else None,
+            "per_class": metrics["per_class"] if metrics else None,
+            "ci": metrics["ci"] if metrics else None,
+            "raw_outputs_example": raw_examples[:3],
+            "batch_size": BATCH_PROMPTS.get(name, 1),
+            "llm_calls_this_run": llm_calls[name],
+            "ensemble_calls_saved_this_run": calls_saved[name],
         }
+        if name in CASCADE_PROMPTS:
+            # answered by the local model, over all samples (this run and checkpointed ones)
+            results["prompts"][name].update({
+                "local_predictions": local_count,
+                "local_share": local_count / len(preds) if preds else 0.0,
+                "llm_calls_avoided": local_count * ENSEMBLE_RUNS,
+            })
         print(f"{name} -> parsed {parsed_count}/{len(preds)} ({results['prompts'][name]['parsed_percent']:.2%}) "
-              f"accuracy={acc} within±1={w1}")
+              f"accuracy={acc} within±1={w1} mae={metrics['mae'] if metrics else None} "
+              f"accuracy CI={metrics['ci']['accuracy'] if metrics else None}")
+        if name in CASCADE_PROMPTS:
+            print(f"{name} -> {local_count}/{len(preds)} answered locally, "
+                  f"{local_count * ENSEMBLE_RUNS} LLM calls avoided")
 
     # Ensure output folder exists if OUTPUT_RESULTS contains a path
     output_dir = os.path.dirname(OUTPUT_RESULTS)
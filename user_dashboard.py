@@ -2,9 +2,15 @@
 import streamlit as st
 import requests
 import json
+import time
 
 # backend submit endpoint
 BACKEND_URL = "http://127.0.0.1:8000/submit"
+# the review is queued (202) and the result is long-polled from /submissions/{id}
+SUBMISSION_URL = "http://127.0.0.1:8000/submissions/{id}"
+POLL_WAIT_SECONDS = 25
+# server-sent events: the AI reply is shown as it is generated
+STREAM_URL = "http://127.0.0.1:8000/submit/stream"
 
 st.set_page_config(page_title="Review Assistant", layout="centered")
 st.title("📝 Customer Review – AI Assistant")
@@ -15,6 +21,24 @@ if "last_response" not in st.session_state:
 # ---------------------------------------------------
 # Submit review to FastAPI backend
 # ---------------------------------------------------
+def _json_or_error(resp):
+    """Return the response JSON, or None after showing the backend's error message."""
+    # If server returned a non-2xx, try to surface useful message
+    try:
+        data = resp.json()
+    except ValueError:
+        resp.raise_for_status()  # will raise HTTPError when not 2xx
+        return None
+
+    if resp.status_code >= 400:
+        # Show backend-provided message if available
+        msg = data.get("message") or data.get("error") or f"Backend returned status {resp.status_code}"
+        st.error(f"Backend error: {msg}")
+        return None
+
+    return data
+
+
 def submit_review(rating, review, timeout_seconds=180):
     payload = {
         "rating": rating,
@@ -22,25 +46,88 @@ def submit_review(rating, review, timeout_seconds=180):
     }
 
     try:
-        resp = requests.post(
-            BACKEND_URL,
-            json=payload,
-            timeout=timeout_seconds  # increased timeout to allow LLM processing
-        )
-        # If server returned a non-2xx, try to surface useful message
-        try:
-            data = resp.json()
-        except ValueError:
-            resp.raise_for_status()  # will raise HTTPError when not 2xx
-            return None
-
-        if resp.status_code >= 400:
-            # Show backend-provided message if available
-            msg = data.get("message") or data.get("error") or f"Backend returned status {resp.status_code}"
-            st.error(f"Backend error: {msg}")
-            return None
-
-        return data
+        # async mode: the backend stores the review and answers right away
+        resp = requests.post(BACKEND_URL, params={"mode": "async"}, json=payload, timeout=10)
+        data = _json_or_error(resp)
+        if not data or data.get("status") == "ok":
+            # "ok" means the backend processed it synchronously
+            return data
+
+        # long-poll until the analysis is done (each request waits server-side)
+        deadline = time.monotonic() + timeout_seconds
+        while time.monotonic() < deadline:
+            wait = max(1, min(POLL_WAIT_SECONDS, int(deadline - time.monotonic())))
+            resp = requests.get(SUBMISSION_URL.format(id=data["id"]), params={"wait": wait}, timeout=wait + 10)
+            result = _json_or_error(resp)
+            if not result:
+                return None
+            if result.get("job_status") == "done":
+                return result
+            if result.get("job_status") == "failed":
+                st.error(f"Backend error: {result.get('error') or 'analysis failed'}")
+                return None
+        st.error("Backend took too long to respond. (Timeout)")
+        return None
+
+    except requests.exceptions.Timeout:
+        st.error("Backend took too long to respond. (Timeout)")
+        return None
+
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error connecting to backend: {str(e)}")
+        return None
+
+
+def _iter_sse(resp):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data_lines = "message", []
+    for line in resp.iter_lines(decode_unicode=True):
+        if line:
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+            continue
+        if data_lines:
+            try:
+                yield event, json.loads("\n".join(data_lines))
+            except ValueError:
+                pass
+        event, data_lines = "message", []
+
+
+def stream_review(rating, review, on_reply, timeout_seconds=180):
+    """
+    Submit via /submit/stream, calling on_reply(text_so_far) as reply tokens arrive.
+    Returns the final result dict, None on error, or False if the backend has no
+    streaming endpoint (caller falls back to submit_review).
+    """
+    payload = {
+        "rating": rating,
+        "review": review
+    }
+
+    try:
+        # (connect timeout, max silence between chunks)
+        with requests.post(STREAM_URL, json=payload, stream=True, timeout=(10, timeout_seconds)) as resp:
+            if resp.status_code in (404, 405):
+                return False
+            if resp.status_code >= 400:
+                _json_or_error(resp)
+                return None
+
+            reply = ""
+            for event, data in _iter_sse(resp):
+                if event == "reply":
+                    reply += data.get("text", "")
+                    on_reply(reply)
+                elif event == "result":
+                    return data
+                elif event == "error":
+                    st.error(f"Backend error: {data.get('message') or 'analysis failed'}")
+                    return None
+        st.error("Backend closed the stream before sending a result.")
+        return None
 
     except requests.exceptions.Timeout:
         st.error("Backend took too long to respond. (Timeout)")
@@ -70,8 +157,13 @@ if submitted:
     if not review.strip():
         st.warning("Please enter a review before submitting.")
     else:
+        # the reply is rendered token by token; the full analysis follows when the stream ends
+        live_reply = st.empty()
         with st.spinner("AI analyzing your feedback… This can take a little while for the first request."):
-            result = submit_review(rating, review, timeout_seconds=180)
+            result = stream_review(rating, review, on_reply=lambda text: live_reply.info(text), timeout_seconds=180)
+            if result is False:
+                result = submit_review(rating, review, timeout_seconds=180)
+        live_reply.empty()
 
         if result and result.get("status") == "ok":
             st.session_state.last_response = result